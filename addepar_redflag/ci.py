@@ -0,0 +1,101 @@
+import json
+from os import getenv
+from pathlib import Path
+
+from .util.ci import publish
+from .util.console import (
+    pretty_print,
+    pretty_print_results_table,
+    MessageType
+)
+from .util.credentials import GitHubPool
+from .util.report import get_record_status, get_report_pattern
+
+
+def get_latest_report(
+    output_dir: str,
+    repository_name: str,
+    number: str
+) -> Path | None:
+    """Returns the NDJSON results of the latest review of a PR in `output_dir`."""
+    # Only the results of the PR, not the errors, metrics, traces or results of other PRs
+    pattern = get_report_pattern(repository_name, str(number), extension='ndjson')
+    paths = [path for path in Path(output_dir).glob('*.ndjson') if pattern.fullmatch(path.name)]
+
+    # Report names end with the time of the run
+    return max(paths, key=lambda path: path.name, default=None)
+
+
+def load_in_scope_results(report_path: Path) -> list:
+    """Returns the in-scope results of the NDJSON results of a review."""
+    with open(report_path, 'rb') as f:
+        records = [json.loads(line) for line in f if line.strip()]
+
+    return [record for record in records if get_record_status(record) == 'in_scope']
+
+
+def write_github_output(outputs: dict) -> None:
+    """Sets the outputs of the current GitHub Actions step, if running in one."""
+    output_path = getenv('GITHUB_OUTPUT')
+    if not output_path:
+        return
+
+    with open(output_path, 'a') as f:
+        for key, value in outputs.items():
+            f.write(f'{key}={value}\n')
+
+
+def ci(
+    github: GitHubPool,
+    config: dict
+) -> bool:
+    """
+    Publishes the results of a PR review, from `ci.report` or the latest review of the PR in the
+    output directory: replaces RedFlag's comment on the PR and, if the PR is in scope, comments
+    and requests the configured reviewers. Returns True if the PR is in scope.
+    """
+    repository_name = config.get('repo')
+    number = config.get('to')
+
+    if not str(number).isdigit():
+        pretty_print(
+            f'CI mode publishes the review of a PR, "{number}" is not a PR number.',
+            MessageType.FATAL
+        )
+        exit(1)
+
+    # Only the results of the current review, older runs may have left theirs in the output directory
+    report_path = config.get('ci', {}).get('report') or get_latest_report(
+        config.get('output_dir') or '.',
+        repository_name=repository_name,
+        number=number
+    )
+    if not report_path or not Path(report_path).is_file():
+        pretty_print(
+            f'No review results of {repository_name}#{number} found, run RedFlag on the PR first.',
+            MessageType.FATAL
+        )
+        exit(1)
+
+    in_scope = load_in_scope_results(report_path)
+    if in_scope:
+        pretty_print_results_table(in_scope)
+
+    write_github_output({
+        'in_scope_results': 'true' if in_scope else 'false',
+        'in_scope_count': len(in_scope)
+    })
+
+    pull = github.get_repo(repository_name, lazy=True).get_pull(int(number))
+    publish(
+        pull,
+        in_scope=bool(in_scope),
+        config=config
+    )
+
+    pretty_print(
+        f'{repository_name}#{number} is {"in scope" if in_scope else "out of scope"}, updated the PR',
+        MessageType.SUCCESS
+    )
+
+    return bool(in_scope)
@@ -5,12 +5,8 @@ from contextlib import nullcontext
 from pathlib import Path
 
 from atlassian import Jira
-from botocore.config import Config
-from github import Github, GithubException
+from github import GithubException
 from langchain.evaluation import load_evaluator
-from langchain.output_parsers.fix import OutputFixingParser
-from langchain_community.chat_models import BedrockChat
-from langchain_core.output_parsers.pydantic import PydanticOutputParser
 from rich.progress import Progress, SpinnerColumn, BarColumn, MofNCompleteColumn
 
 from .models.prompts.response_models import Review
@@ -19,16 +15,20 @@ from .util.console import (
     pretty_print,
     MessageType
 )
+from .util.credentials import GitHubPool
 from .util.jira import get_jira_ticket_from_pr_title
 from .util.llm import (
     build_evaluation_result,
     build_file_context,
     build_jira_block,
     build_prompt,
+    count_tokens,
+    get_bedrock_llm,
+    get_output_fixing_parser,
     pretty_print_evaluation_table,
-    build_evaluation_result,
-    MAX_PARSER_RETRIES
+    build_evaluation_result
 )
+from .util.profiling import TIMELINE
 
 
 async def review_evaluation(
@@ -41,11 +41,7 @@ async def review_evaluation(
     reference: str,
     prompts: dict
 ) -> dict:
-    review_parser = OutputFixingParser.from_llm(
-        max_retries=MAX_PARSER_RETRIES,
-        llm=llm,
-        parser=PydanticOutputParser(pydantic_object=Review)
-    )
+    review_parser = get_output_fixing_parser(llm, Review)
     review_prompt = build_prompt(**prompts.get('review'))
     review_chain = review_prompt | llm | review_parser
     jira_information = build_jira_block(result=result)
@@ -65,7 +61,7 @@ async def review_evaluation(
     }
 
     # Check the token count if we pass all files in the PR.
-    result.token_count = llm.get_num_tokens(review_prompt.format(**prompt_input))
+    result.token_count = count_tokens(llm, review_prompt.format(**prompt_input))
 
     llm_response = await review_chain \
         .with_config(run_name=result.pr.title) \
@@ -107,10 +103,11 @@ async def review_evaluation(
 
 
 async def do_evaluations(
-    github: Github,
+    github: GitHubPool,
     jira: Jira,
     dataset: Path,
-    config: dict
+    config: dict,
+    llm=None
 ):    
     # Avoid WARNING messages from urllib3
     logging.getLogger("urllib3").setLevel(logging.ERROR)
@@ -136,20 +133,9 @@ async def do_evaluations(
         )
         exit(1)
 
-    # Instantiate Bedrock
-    llm = BedrockChat(
-        region_name=config.get('bedrock', {}).get('region') or None,
-        credentials_profile_name=config.get('bedrock', {}).get('profile') or None,
-        model_id=config.get('bedrock', {}).get('model_id'),
-        model_kwargs={
-            'max_tokens': 4096,
-            'temperature': 0.0
-        },
-        config=Config(
-            read_timeout=600,
-            retries={'max_attempts': 10, 'mode': 'adaptive'}
-        )
-    )
+    # Instantiate Bedrock, unless another chat model is passed in
+    if not llm:
+        llm = get_bedrock_llm(config)
 
     pretty_print(
         'Instantiated Bedrock',
@@ -204,20 +190,23 @@ async def do_evaluations(
     with progress:
         try:
             for data in dataset:
-                repository = github.get_repo(data.get('repository'))
-                
+                # Use a lazy repository so each request goes through the least used credential
+                repository_name = data.get('repository')
+                repository = github.get_repo(repository_name, lazy=True)
+
                 target = repository.get_commit(sha=data.get('commit'))
                 lines = target.commit.message.splitlines()
                 title, message = lines[0], '\n'.join(lines[2:])
 
                 pr = PullRequest(
-                    repository=repository.full_name,
+                    repository=repository_name,
                     title=title,
                     message=message,
                     url=target.html_url,
                     files=target.files,
                     strip_lines=config.get('strip_description_lines'),
-                    strip_html_comments=config.get('strip_html_comments')
+                    strip_html_comments=config.get('strip_html_comments'),
+                    sha=data.get('commit')
                 )
 
                 result = Result(pr)
@@ -232,15 +221,18 @@ async def do_evaluations(
                 prompts = config.get('prompts')
                 tasks.append(
                     asyncio.create_task(
-                        review_evaluation(
-                            result=result,
-                            llm=llm,
-                            progress=progress_llm if progress_bar else None,
-                            progress_task_id=progress_llm_task_id,
-                            evaluator=evaluator,
-                            should_review=data.get('should_review'),
-                            reference=data.get('reference'),
-                            prompts=prompts
+                        TIMELINE.run_task(
+                            review_evaluation(
+                                result=result,
+                                llm=llm,
+                                progress=progress_llm if progress_bar else None,
+                                progress_task_id=progress_llm_task_id,
+                                evaluator=evaluator,
+                                should_review=data.get('should_review'),
+                                reference=data.get('reference'),
+                                prompts=prompts
+                            ),
+                            title=pr.title
                         )
                     )
                 )
@@ -2,7 +2,16 @@ from typing import List
 
 from langchain.pydantic_v1 import BaseModel, Field, validator
 
-from ...util.llm import convert_to_string
+
+TRIAGE_DECISIONS = ['yes', 'maybe', 'no']
+
+
+# The LLM likes to use lists when asked to provide information in a detailed format, even though the field is for a string.
+# Using a validation function helps prevent retry calls
+def convert_to_string(cls, v):
+    if isinstance(v, list):
+        return '\n'.join([line.rstrip() for line in v])
+    return v
 
 
 class Review(BaseModel):
@@ -22,6 +31,39 @@ class Review(BaseModel):
     )(convert_to_string)
 
 
+class BatchReviewItem(Review):
+    id: int = Field(
+        description='The id of the pull request this review is about.'
+    )
+
+
+class BatchReview(BaseModel):
+    reviews: List[BatchReviewItem] = Field(
+        description='One review for every pull request provided.'
+    )
+
+
+class Triage(BaseModel):
+    decision: str = Field(
+        description='"yes" if the pull request should be reviewed, "no" if it should not, or "maybe" if the file changes are needed to decide.'
+    )
+    reasoning: str = Field(
+        description='The reasoning behind the decision. This should be a short step-by-step explanation of your reasoning.'
+    )
+    _convert = validator(
+        'reasoning',
+        pre=True,
+        allow_reuse=True
+    )(convert_to_string)
+
+    @validator('decision', pre=True)
+    def normalize_decision(cls, v):
+        decision = str(v).strip().strip('"').lower()
+        if decision not in TRIAGE_DECISIONS:
+            raise ValueError(f'decision must be one of {", ".join(TRIAGE_DECISIONS)}')
+        return decision
+
+
 class TestPlan(BaseModel):
     test_plan: str = Field(description='The test plan created.')
     reasoning: str = Field(
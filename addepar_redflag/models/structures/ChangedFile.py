@@ -0,0 +1,86 @@
+import json
+
+
+class ChangedFile:
+    """The changes to a single file, without the API objects they were read from."""
+    __slots__ = ('__filename', '__status', '__additions', '__deletions', '__patch')
+
+    def __init__(
+        self,
+        filename,
+        status=None,
+        additions=0,
+        deletions=0,
+        patch=None
+    ):
+        self.__filename = filename
+        self.__status = status
+        self.__additions = additions or 0
+        self.__deletions = deletions or 0
+        self.__patch = patch
+
+    @property
+    def filename(self) -> str:
+        return self.__filename
+
+    @property
+    def status(self) -> str:
+        return self.__status
+
+    @property
+    def additions(self) -> int:
+        return self.__additions
+
+    @property
+    def deletions(self) -> int:
+        return self.__deletions
+
+    @property
+    def patch(self) -> str:
+        return self.__patch
+
+    @patch.setter
+    def patch(
+        self,
+        patch: str
+    ) -> None:
+        self.__patch = patch
+
+    @classmethod
+    def from_github(
+        cls,
+        file
+    ) -> object:
+        """Builds a record from a PyGithub `File` object."""
+        return cls(
+            filename=file.filename,
+            status=file.status,
+            additions=file.additions,
+            deletions=file.deletions,
+            patch=file.patch
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            'filename': self.__filename,
+            'status': self.__status,
+            'additions': self.__additions,
+            'deletions': self.__deletions,
+            'patch': self.__patch
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict())
+
+    @classmethod
+    def from_dict(
+        cls,
+        data: dict
+    ) -> object:
+        return cls(
+            filename=data.get('filename'),
+            status=data.get('status'),
+            additions=data.get('additions'),
+            deletions=data.get('deletions'),
+            patch=data.get('patch')
+        )
@@ -1,8 +1,24 @@
 import re
 import json
+from hashlib import sha256
+
+from .ChangedFile import ChangedFile
+
+
+def _to_changed_file(file):
+    """PyGithub `File` objects keep their raw JSON and completion state, only the changes are kept."""
+    # Imported here, the models are loaded before PyGithub is needed
+    from github.File import File
+
+    return ChangedFile.from_github(file) if isinstance(file, File) else file
 
 
 class PullRequest:
+    __slots__ = (
+        '__repository', '__title', '__message', '__url', '__files', '__labels', '__sha',
+        '__patches_loaded', '__commits', '__fingerprint', '__file_names', '__file_index'
+    )
+
     def __init__(self,
         repository,
         title,
@@ -11,6 +27,11 @@ class PullRequest:
         files,
         strip_lines=None,
         strip_html_comments=False,
+        labels=None,
+        sha=None,
+        patches_loaded=True,
+        commits=None,
+        fingerprint=None
     ):
         if not strip_lines:
             strip_lines = []
@@ -19,7 +40,13 @@ class PullRequest:
         self.__title = title
         self.__message = self._strip_lines(message, strip_lines, strip_html_comments)
         self.__url = url
-        self.__files = files
+        self.files = files
+        self.__labels = labels or []
+        self.__sha = sha
+        self.__patches_loaded = patches_loaded
+        self.__commits = commits or []
+        # Kept for PRs restored from a report, which only have the file names
+        self.__fingerprint = fingerprint
 
     @property
     def repository(self) -> str:
@@ -52,7 +79,7 @@ class PullRequest:
         self,
         message: str
     ) -> None:
-        self.message = message
+        self.__message = message
 
     @property
     def url(self) -> str:
@@ -74,14 +101,103 @@ class PullRequest:
         self,
         files: list
     ) -> None:
-        self.__files = files
+        self.__files = [_to_changed_file(file) for file in files] if files else files
+        self.__file_names = None
+        self.__file_index = None
+
+    @property
+    def labels(self) -> list:
+        return self.__labels
+
+    @labels.setter
+    def labels(
+        self,
+        labels: list
+    ) -> None:
+        self.__labels = labels
+
+    @property
+    def sha(self) -> str:
+        return self.__sha
+
+    @sha.setter
+    def sha(
+        self,
+        sha: str
+    ) -> None:
+        self.__sha = sha
+
+    @property
+    def patches_loaded(self) -> bool:
+        """False when the files only hold metadata (name, status and line counts) without patches."""
+        return self.__patches_loaded
+
+    @patches_loaded.setter
+    def patches_loaded(
+        self,
+        patches_loaded: bool
+    ) -> None:
+        self.__patches_loaded = patches_loaded
+
+    @property
+    def commits(self) -> list:
+        """The commits a PR built from several commits is attributed to."""
+        return self.__commits
+
+    @commits.setter
+    def commits(
+        self,
+        commits: list
+    ) -> None:
+        self.__commits = commits
 
     @property
-    def file_names(self) -> list:
-        return [
-            file.filename if file.__class__.__name__ == 'File' else file
-            for file in self.__files
-        ]
+    def file_names(self) -> tuple:
+        """The changed file names, computed once per set of files."""
+        if self.__file_names is None:
+            self.__file_names = tuple(
+                file.filename if isinstance(file, ChangedFile) else file
+                for file in self.__files or []
+            )
+
+        return self.__file_names
+
+    def get_file(
+        self,
+        filename: str
+    ) -> ChangedFile | None:
+        """Returns the changed file with that name, None if it is not part of the PR or only its name is known."""
+        if self.__file_index is None:
+            self.__file_index = {}
+            for file in self.__files or []:
+                if isinstance(file, ChangedFile):
+                    self.__file_index.setdefault(file.filename, file)
+
+        return self.__file_index.get(filename)
+
+    @property
+    def fingerprint(self) -> str | None:
+        """
+        A stable fingerprint of the patch, similar to `git patch-id`. Only added and removed lines
+        are hashed, without whitespace or line numbers, so cherry-picks, backports and re-lands of
+        the same change share a fingerprint. None if the patches are not loaded, and the
+        stored fingerprint for PRs restored from a report.
+        """
+        if not self.__patches_loaded or not self.__files:
+            return None
+
+        if not all(hasattr(file, 'patch') for file in self.__files):
+            return self.__fingerprint
+
+        digest = sha256()
+        for file in sorted(self.__files, key=lambda file: file.filename):
+            digest.update(f'{file.filename}\n'.encode('utf-8'))
+
+            for line in (file.patch or '').splitlines():
+                if line[:1] in ('+', '-'):
+                    digest.update(f'{line[0]}{"".join(line[1:].split())}\n'.encode('utf-8'))
+
+        return digest.hexdigest()
 
     @staticmethod
     def _strip_lines(message: str, lines: list, strip_html_comments: bool = False) -> str:
@@ -98,17 +214,17 @@ class PullRequest:
         return message
 
     def to_dict(self) -> dict:
-        dictionary = {}
-
-        for key, value in vars(self).items():
-            k = key.replace(f'_{self.__class__.__name__}__', '')
-
-            if k == 'files':
-                dictionary.update({'file_names': self.file_names})
-            else:
-                dictionary.update({k: value})
-        
-        return dictionary
+        return {
+            'repository': self.__repository,
+            'title': self.__title,
+            'message': self.__message,
+            'url': self.__url,
+            'file_names': list(self.file_names),
+            'labels': self.__labels,
+            'sha': self.__sha,
+            'commits': self.__commits,
+            'fingerprint': self.fingerprint
+        }
 
     def to_json(self) -> str:
         return json.dumps(self.to_dict())
@@ -127,5 +243,9 @@ class PullRequest:
             title=data.get('title'),
             message=data.get('message'),
             url=data.get('url'),
-            files=files
+            files=files,
+            labels=data.get('labels'),
+            sha=data.get('sha'),
+            commits=data.get('commits'),
+            fingerprint=data.get('fingerprint')
         )
@@ -5,6 +5,10 @@ from .Ticket import Ticket
 
 
 class Result:
+    # The verdict attributes are only set once known, `hasattr()` tells whether a step succeeded
+    __slots__ = ('__pr', '__ticket', '__token_count', '__triage', '__review', '__test_plan', '__decided_by', '__metrics', '__trace_id')
+    FIELDS = ('pr', 'ticket', 'token_count', 'triage', 'review', 'test_plan', 'decided_by', 'metrics', 'trace_id')
+
     def __init__(
         self,
         pr: PullRequest,
@@ -46,6 +50,17 @@ class Result:
     ):
         self.__token_count = token_count
 
+    @property
+    def triage(self):
+        return self.__triage
+
+    @triage.setter
+    def triage(
+        self,
+        triage
+    ):
+        self.__triage = triage
+
     @property
     def review(self):
         return self.__review
@@ -68,18 +83,50 @@ class Result:
     ):
         self.__test_plan = test_plan
 
+    @property
+    def decided_by(self):
+        return self.__decided_by
+
+    @decided_by.setter
+    def decided_by(
+        self,
+        decided_by
+    ):
+        self.__decided_by = decided_by
+
+    @property
+    def metrics(self):
+        return self.__metrics
+
+    @metrics.setter
+    def metrics(
+        self,
+        metrics
+    ):
+        self.__metrics = metrics
+
+    @property
+    def trace_id(self):
+        return self.__trace_id
+
+    @trace_id.setter
+    def trace_id(
+        self,
+        trace_id
+    ):
+        self.__trace_id = trace_id
+
     def to_dict(self) -> dict:
         dictionary = {}
 
-        for key, value in vars(self).items():
-            k = key.replace(
-                f'_{self.__class__.__name__}__',
-                ''
-            )
+        for k in self.FIELDS:
+            if not hasattr(self, k):
+                continue
 
+            value = getattr(self, k)
             if value.__class__.__name__ in ['PullRequest', 'Ticket']:
                 dictionary.update({k: value.to_dict()})
-            elif value.__class__.__name__ in ['Review', 'TestPlan']:
+            elif value.__class__.__name__ in ['Triage', 'Review', 'TestPlan']:
                 dictionary.update({k: value.dict()})
             else:
                 dictionary.update({k: value})
@@ -2,6 +2,8 @@ import json
 
 
 class Ticket:
+    __slots__ = ('__id', '__summary', '__description')
+
     def __init__(
         self,
         id,
@@ -46,10 +48,11 @@ class Ticket:
         self.__description = description
 
     def to_dict(self) -> dict:
-        return dict(
-            (key.replace(f'_{self.__class__.__name__}__', ''), value)
-            for key, value in vars(self).items()
-        )
+        return {
+            'id': self.__id,
+            'summary': self.__summary,
+            'description': self.__description
+        }
 
     def to_json(self) -> str:
         return json.dumps(self.to_dict())
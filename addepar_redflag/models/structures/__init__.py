@@ -1,3 +1,4 @@
 from .Result import Result
 from .Ticket import Ticket
 from .PullRequest import PullRequest
+from .ChangedFile import ChangedFile
@@ -1,146 +1,486 @@
 import asyncio
-import json as jsonlib
 import logging
-from base64 import b64encode
 from contextlib import nullcontext
 from datetime import datetime
+from os import replace
 from pathlib import Path
 from re import match
+from time import perf_counter
 
 from atlassian import Jira
-from botocore.config import Config
 from botocore.exceptions import ClientError
-from github import Github, GithubException, UnknownObjectException
-from jinja2 import Environment, PackageLoader, select_autoescape
-from langchain.output_parsers.fix import OutputFixingParser
-from langchain_community.chat_models import BedrockChat
+from github import GithubException, UnknownObjectException
 from langchain_core.output_parsers.pydantic import PydanticOutputParser
 from rich.progress import Progress, SpinnerColumn, BarColumn, MofNCompleteColumn
 
-from .models.prompts.response_models import Review, TestPlan
-from .models.structures import Result, PullRequest
+from .ci import write_github_output
+from .models.prompts.response_models import BatchReview, Review, TestPlan, Triage
+from .models.structures import ChangedFile, Result, PullRequest
 from .util.console import (
     pretty_print,
     MessageType
 )
+from .util.credentials import GitHubPool
+from .util.filters import CommitFilter
 from .util.github import (
     get_pr_templates,
     get_commits_in_comparison,
-    matches_template_text,
-    filter_commit
+    hydrate_commits,
+    matches_template_text
 )
+from .util.grouping import (
+    get_ticket_key,
+    group_results_by_fingerprint,
+    group_results_by_ticket,
+    merge_files,
+    share_verdict
+)
+from .util.incremental import get_incremental_files
 from .util.jira import get_jira_ticket_from_pr_title
 from .util.llm import (
+    build_batch_item,
+    build_batch_prompt,
     build_file_context,
-    build_jira_block,
+    build_file_summary,
+    build_information_block,
+    build_pr_input,
     build_prompt,
-    MAX_PARSER_RETRIES
+    count_tokens,
+    get_bedrock_llm,
+    get_output_fixing_parser,
+    pack_review_batches
+)
+from .util.metrics import (
+    METRICS,
+    attribute_metrics,
+    write_metrics_summary,
+    write_prometheus_textfile
+)
+from .util.profiling import TIMELINE
+from .util.ranges import get_range_results
+from .util.report import (
+    ResultStream,
+    get_report_filename,
+    split_results,
+    write_reports
 )
+from .util.results_db import ResultsDatabase
+from .util.similarity import group_results_by_similarity, inherit_verdict
+from .util.tracing import (
+    SPAN_KIND_CLIENT,
+    TRACER,
+    get_trace_attributes
+)
+from .util.verdicts import VerdictStore
 
 
-async def query_model(
-    result,
-    llm,
+def _advance(
     progress: Progress,
     progress_task_id: int,
-    prompts: dict
+    count: int = 1
 ) -> None:
-    # Ignore WARNING messages from urllib3
-    logging.getLogger("urllib3").setLevel(logging.ERROR)
+    if progress:
+        progress.update(
+            progress_task_id,
+            advance = count
+        )
 
-    # Instantiate parsers
-    review_parser = OutputFixingParser.from_llm(
-        max_retries=MAX_PARSER_RETRIES,
-        llm=llm,
-        parser=PydanticOutputParser(pydantic_object=Review)
-    )
-    test_plan_parser = OutputFixingParser.from_llm(
-        max_retries=MAX_PARSER_RETRIES,
-        llm=llm,
-        parser=PydanticOutputParser(pydantic_object=TestPlan)
-    )
 
-    # Build chains
-    review_prompt = build_prompt(**prompts.get('review'))
-    test_plan_prompt = build_prompt(**prompts.get('test_plan'))
+def _get_tracking_mark(
+    processed: list,
+    errored: list,
+    target: str,
+    previous_mark: str,
+    range_review: bool = False,
+    cut_short: bool = False
+) -> str:
+    """
+    Returns the commit a tracked branch is processed up to: the commit before the first errored
+    one, so it is retried on the next run, or the previous mark if it can't be placed, e.g. for
+    a range review or a result without a commit of its own.
+    """
+    if errored:
+        errored_shas = {result.pr.sha for result in errored if result.pr.sha}
+        index = None if range_review else next(
+            (index for index, sha in enumerate(processed) if sha in errored_shas),
+            None
+        )
+        if not index:
+            return previous_mark
 
+        return processed[index - 1]
+
+    if cut_short and processed and not range_review:
+        return processed[-1]
+
+    return target
+
+
+async def _timed(
+    coroutine,
+    results: list,
+    durations: dict,
+    on_done=None
+) -> None:
+    """
+    Awaits a review and records its duration and metrics, split evenly across the results it
+    covers. Then calls `on_done` with those results, e.g. to stream them.
+    """
+    # Each result has a trace, a batch is traced with its first result and linked to the others
+    for result in results:
+        if TRACER.enabled and not hasattr(result, 'trace_id'):
+            result.trace_id = TRACER.start_trace('redflag.result')
+    trace_ids = [getattr(result, 'trace_id', None) for result in results]
+
+    start = perf_counter()
+    with METRICS.track() as review_metrics, TIMELINE.task(
+        coroutine.__name__,
+        titles=[result.pr.title for result in results]
+    ), TRACER.span(
+        coroutine.__name__,
+        trace_id=trace_ids[0],
+        links=trace_ids[1:]
+    ):
+        await coroutine
+
+    duration = (perf_counter() - start) / len(results)
+    for result in results:
+        durations[id(result)] = duration
+    attribute_metrics(results, review_metrics)
+
+    if on_done:
+        on_done(results)
+
+
+async def triage_pr(
+    result: Result,
+    llm,
+    prompts: dict
+) -> bool:
+    """Triages the PR on metadata only. Returns False if it clearly doesn't need a review."""
+    triage_parser = get_output_fixing_parser(llm, Triage)
+    triage_prompt = build_prompt(**prompts.get('triage'))
+    triage_chain = triage_prompt | llm | triage_parser
+
+    prompt_input = build_pr_input(result=result)
+    prompt_input.update({
+        'additional_information': f'{build_information_block(result=result)}\n\n{build_file_summary(result=result)}',
+        'format_instructions': triage_parser.get_format_instructions(),
+    })
+
+    try:
+        with METRICS.stage('triage'), TRACER.span('chain.triage'):
+            result.triage = await triage_chain \
+                .with_config(run_name=result.pr.title) \
+                .ainvoke(prompt_input)
+    except (ValueError, AttributeError, ClientError) as e:
+        pretty_print(
+            f'Failed to triage {result.pr.title} (URL: {result.pr.url}), falling back to a full review. '
+            f'Error: {e}',
+            MessageType.WARN
+        )
+        return True
+
+    if result.triage.decision == 'no':
+        result.token_count = count_tokens(llm, triage_prompt.format(**prompt_input))
+        result.review = Review(
+            result=False,
+            reasoning=f'Triage: {result.triage.reasoning}',
+            files=[]
+        )
+        return False
+
+    return True
+
+
+async def review_pr(
+    result: Result,
+    llm,
+    prompts: dict
+) -> None:
+    review_parser = get_output_fixing_parser(llm, Review)
+    review_prompt = build_prompt(**prompts.get('review'))
     review_chain = review_prompt | llm | review_parser
-    test_plan_chain = test_plan_prompt | llm | test_plan_parser
 
-    # Build context
-    jira_information = build_jira_block(result=result)
     file_context = build_file_context(
         result=result,
         files=result.pr.file_names
     )
 
-    # Initialize the prompt
-    prompt_input = {
-        'pr_title': result.pr.title,
-        'pr_description': result.pr.message,
-        'num_files': len(result.pr.file_names),
-        'file_names': ', '.join(result.pr.file_names),
-        'additional_information': f'{jira_information}\n\n{file_context}',
+    prompt_input = build_pr_input(result=result)
+    prompt_input.update({
+        'additional_information': f'{build_information_block(result=result)}\n\n{file_context}',
         'format_instructions': review_parser.get_format_instructions(),
-    }
+    })
 
     # Check the token count if we pass all files in the PR
-    result.token_count = llm.get_num_tokens(review_prompt.format(**prompt_input))
+    result.token_count = count_tokens(llm, review_prompt.format(**prompt_input))
 
     try:
-        review_response = await review_chain \
-            .with_config(run_name=result.pr.title) \
-            .ainvoke(prompt_input)
-
-        result.review = review_response
+        with METRICS.stage('review'), TRACER.span('chain.review', **{'redflag.prompt_tokens': result.token_count}):
+            result.review = await review_chain \
+                .with_config(run_name=result.pr.title) \
+                .ainvoke(prompt_input)
     except (ValueError, AttributeError, ClientError) as e:
         pretty_print(
             f'Failed to determine if PR should be tested for {result.pr.title} (URL: {result.pr.url}). '
             f'Please manually review. Error: {e}',
             MessageType.WARN
         )
+
+
+async def review_batch(
+    results: list,
+    llm,
+    prompts: dict
+) -> None:
+    """
+    Reviews several PRs in a single call. If the output is malformed or misses a PR, the batch
+    is split in halves which are retried, down to single PR reviews.
+    """
+    if len(results) == 1:
+        await review_pr(results[0], llm, prompts)
+        return
+
+    batch_parser = PydanticOutputParser(pydantic_object=BatchReview)
+    batch_prompt = build_batch_prompt(**prompts.get('review'))
+    batch_chain = batch_prompt | llm | batch_parser
+
+    prompt_input = {
+        'pull_requests': '\n\n'.join(
+            build_batch_item(id=index, result=result)
+            for index, result in enumerate(results)
+        ),
+        'format_instructions': batch_parser.get_format_instructions(),
+    }
+
+    try:
+        with METRICS.stage('batch_review'), TRACER.span('chain.batch_review', **{'redflag.batch_size': len(results)}):
+            response = await batch_chain \
+                .with_config(run_name=f'Batch of {len(results)} PRs') \
+                .ainvoke(prompt_input)
+
+        reviews = {review.id: review for review in response.reviews}
+        if set(reviews) != set(range(len(results))):
+            raise ValueError(f'Expected {len(results)} reviews, got ids {sorted(reviews)}')
+    except ValueError:
+        half = len(results) // 2
+        await asyncio.gather(
+            review_batch(results[:half], llm, prompts),
+            review_batch(results[half:], llm, prompts)
+        )
+        return
+    except (AttributeError, ClientError) as e:
+        pretty_print(
+            f'Failed to review a batch of {len(results)} PRs. Please manually review. Error: {e}',
+            MessageType.WARN
+        )
         return
 
-    # Only create a test plan if the PR should be reviewed
-    if result.review and result.review.result:
-        file_context = (
-            build_file_context(result=result, files=result.review.files)
-            if result.review.files
-            else ''
+    # The batch prompt is shared, attribute it evenly
+    token_count = count_tokens(llm, batch_prompt.format(**prompt_input)) // len(results)
+    for index, result in enumerate(results):
+        review = reviews[index]
+        result.token_count = token_count
+        result.review = Review(
+            result=review.result,
+            reasoning=review.reasoning,
+            files=review.files
         )
 
-        prompt_input.update({
-            'additional_information': f'{jira_information}\n\n{file_context}',
-            'format_instructions': test_plan_parser.get_format_instructions(),
-        })
 
-        try:
-            test_plan_response = await test_plan_chain \
+async def create_test_plan(
+    result: Result,
+    llm,
+    prompts: dict
+) -> None:
+    test_plan_parser = get_output_fixing_parser(llm, TestPlan)
+    test_plan_prompt = build_prompt(**prompts.get('test_plan'))
+    test_plan_chain = test_plan_prompt | llm | test_plan_parser
+
+    file_context = (
+        build_file_context(result=result, files=result.review.files)
+        if result.review.files
+        else ''
+    )
+
+    prompt_input = build_pr_input(result=result)
+    prompt_input.update({
+        'additional_information': f'{build_information_block(result=result)}\n\n{file_context}',
+        'format_instructions': test_plan_parser.get_format_instructions(),
+    })
+
+    try:
+        with METRICS.stage('test_plan'), TRACER.span('chain.test_plan'):
+            result.test_plan = await test_plan_chain \
                 .with_config(run_name=result.pr.title) \
                 .ainvoke(prompt_input)
+    except (ValueError, AttributeError, ClientError) as e:
+        pretty_print(
+            f'Failed to create a test plan for {result.pr.title} (URL: {result.pr.url}). '
+            f'Please manually review. Error: {e}',
+            MessageType.WARN
+        )
 
-            result.test_plan = test_plan_response
-        except (ValueError, AttributeError, ClientError) as e:
+
+async def review_incremental(
+    result: Result,
+    previous: Result,
+    files: list,
+    llm,
+    prompts: dict
+) -> None:
+    """
+    Reviews only the files changed since the previous review of a PR. A PR that was already in
+    scope keeps its verdict and test plan, since the changes don't touch the files it flagged, see
+    `get_incremental_files()`. Otherwise the changes are reviewed on their own.
+    """
+    result.decided_by = {
+        'reason': 'incremental',
+        'url': f'{result.pr.url}/files/{previous.pr.sha}..{result.pr.sha}',
+        'sha': previous.pr.sha
+    }
+
+    if previous.review.result and hasattr(previous, 'test_plan'):
+        result.review = previous.review
+        result.test_plan = previous.test_plan
+        return
+
+    increment = Result(
+        pr=PullRequest(
+            repository=result.pr.repository,
+            title=result.pr.title,
+            message=result.pr.message,
+            url=result.pr.url,
+            files=files,
+            labels=result.pr.labels,
+            sha=result.pr.sha
+        ),
+        ticket=result.ticket
+    )
+
+    await review_pr(increment, llm, prompts)
+    if not hasattr(increment, 'review'):
+        return
+
+    result.token_count = increment.token_count
+    result.review = increment.review
+    if increment.review.result:
+        await create_test_plan(increment, llm, prompts)
+        if hasattr(increment, 'test_plan'):
+            result.test_plan = increment.test_plan
+
+
+async def query_model(
+    result,
+    llm,
+    progress: Progress,
+    progress_task_id: int,
+    prompts: dict,
+    triage: bool = False,
+    file_loader=None,
+    verdict_store: VerdictStore | None = None
+) -> None:
+    # Ignore WARNING messages from urllib3
+    logging.getLogger("urllib3").setLevel(logging.ERROR)
+
+    # Triage on metadata only, a clear "no" skips the patches and the full review
+    if triage and not await triage_pr(result, llm, prompts):
+        _advance(progress, progress_task_id)
+        return
+
+    # Fetch the patches if only the file metadata was retrieved
+    if file_loader and not result.pr.patches_loaded:
+        try:
+            result.pr.files = await asyncio.to_thread(file_loader, result.pr)
+            result.pr.patches_loaded = True
+        except GithubException as e:
             pretty_print(
-                f'Failed to create a test plan for {result.pr.title} (URL: {result.pr.url}). '
+                f'Failed to retrieve the changes for {result.pr.title} (URL: {result.pr.url}). '
                 f'Please manually review. Error: {e}',
                 MessageType.WARN
             )
+            return
+
+        # Commits triaged before their files were listed may turn out to have none, e.g. some merges
+        if not result.pr.files:
+            result.review = Review(
+                result=False,
+                reasoning='No changed files',
+                files=[]
+            )
+            _advance(progress, progress_task_id)
+            return
 
-    if progress:
-        progress.update(
-            progress_task_id,
-            advance = 1
-        )
+        # Now that the patches are known, an earlier verdict for the same patch may apply
+        if verdict_store and verdict_store.apply(result):
+            _advance(progress, progress_task_id)
+            return
+
+    await review_pr(result, llm, prompts)
+    if not hasattr(result, 'review'):
+        return
+
+    # Only create a test plan if the PR should be reviewed
+    if result.review and result.review.result:
+        await create_test_plan(result, llm, prompts)
+
+    _advance(progress, progress_task_id)
+
+
+async def query_model_batch(
+    results: list,
+    llm,
+    progress: Progress,
+    progress_task_id: int,
+    prompts: dict,
+    triage: bool = False
+) -> None:
+    # Ignore WARNING messages from urllib3
+    logging.getLogger("urllib3").setLevel(logging.ERROR)
+
+    # PRs triaged as "no" are dropped from the batch, the others are still reviewed together
+    to_review = results
+    if triage:
+        decisions = await asyncio.gather(*[
+            triage_pr(result, llm, prompts)
+            for result in results
+        ])
+        to_review = [result for result, decision in zip(results, decisions) if decision]
+
+    if to_review:
+        await review_batch(to_review, llm, prompts)
+
+    # Test plans are still created per PR
+    await asyncio.gather(*[
+        create_test_plan(result, llm, prompts)
+        for result in to_review
+        if hasattr(result, 'review') and result.review.result
+    ])
+
+    _advance(progress, progress_task_id, len(results))
 
 
 async def redflag(
-    github: Github,
+    github: GitHubPool,
     jira: Jira,
     config: dict,
+    commit_filter: CommitFilter | None = None,
+    llm=None
 ):
+    if not commit_filter:
+        commit_filter = CommitFilter.from_config(config.get('filter_commits'))
+
+    # The LLM client, the repository and its PR templates don't depend on each other. Another chat
+    # model can be passed in place of Bedrock, e.g. by the offline benchmarks
+    llm_task = None
+    if not llm:
+        llm_task = asyncio.create_task(asyncio.to_thread(get_bedrock_llm, config))
     try:
-        repository = github.get_repo(config.get('repo'))
+        repository, template_texts = await asyncio.gather(
+            asyncio.to_thread(github.get_repo, config.get('repo')),
+            asyncio.to_thread(get_pr_templates, github.get_repo(config.get('repo'), lazy=True))
+        )
     except GithubException as e:
         pretty_print(
             f'GitHub exception occurred: {e}',
@@ -148,7 +488,7 @@ async def redflag(
         )
         exit(1)
 
-    template_texts = get_pr_templates(repository)
+    METRICS.mark('startup')
     to_commit = config.get('to')
     from_commit = config.get('from')
     max_results = config.get('max_commits')
@@ -169,33 +509,85 @@ async def redflag(
     }
 
     results = []
+    jira_cache = {}
+    results_db = ResultsDatabase.from_config(config)
 
-    # If it's a single commit
-    if not from_commit:
-        if match('^[a-f0-9]{40}$', to_commit):
-            from_commit = repository.get_commit(sha=to_commit)
-            lines = from_commit.commit.message.splitlines()
-            title, message = lines[0], '\n'.join(lines[2:])
-            pr = PullRequest(
-                repository=repository.full_name,
-                title=title,
-                message=message,
-                url=from_commit.html_url,
-                files=from_commit.files,
-                strip_lines=config.get('strip_description_lines'),
-                strip_html_comments=config.get('strip_html_comments')
+    # PRs whose changes since their previous review are small only get those reviewed
+    incremental = {}
+
+    # When tracking a branch, only the commits since the last processed one are reviewed
+    tracking = None
+    target = to_commit
+    if config.get('track'):
+        if not results_db:
+            pretty_print(
+                'Tracking a branch requires a results database (--results-db).',
+                MessageType.FATAL
             )
-        else:
-            from_commit = repository.get_pull(int(to_commit))
-            pr = PullRequest(
-                repository=repository.full_name,
-                title=from_commit.title,
-                message=from_commit.body,
-                url=from_commit.html_url,
-                files=list(from_commit.get_files()),
-                strip_lines=config.get('strip_description_lines'),
-                strip_html_comments=config.get('strip_html_comments')
+            exit(1)
+
+        tracking = results_db.get_tracking(repository.full_name, to_commit)
+        if tracking:
+            from_commit = tracking[1]
+        elif not from_commit:
+            pretty_print(
+                f'{to_commit} is not tracked yet, set --from to the commit to start tracking from.',
+                MessageType.FATAL
+            )
+            exit(1)
+
+        tracking = (tracking[0] if tracking else from_commit, from_commit)
+
+        # Pin the head, commits pushed during the run are left for the next one
+        try:
+            target = repository.get_commit(to_commit).sha
+        except UnknownObjectException as e:
+            pretty_print(
+                f'Failed to find the branch to track: {e}',
+                MessageType.FATAL
             )
+            exit(1)
+
+        pretty_print(
+            f'Tracking {to_commit} from {tracking[1][:8]} to {target[:8]}',
+            MessageType.INFO
+        )
+
+    # If it's a single commit
+    if not from_commit:
+        trace_id = TRACER.start_trace('redflag.result')
+        with METRICS.track() as fetch_metrics, METRICS.stage('github_fetch'), TRACER.span(
+            'github.hydrate',
+            trace_id=trace_id,
+            kind=SPAN_KIND_CLIENT,
+            **{'redflag.ref': to_commit}
+        ):
+            if match('^[a-f0-9]{40}$', to_commit):
+                from_commit = repository.get_commit(sha=to_commit)
+                lines = from_commit.commit.message.splitlines()
+                title, message = lines[0], '\n'.join(lines[2:])
+                pr = PullRequest(
+                    repository=repository.full_name,
+                    title=title,
+                    message=message,
+                    url=from_commit.html_url,
+                    files=from_commit.files,
+                    strip_lines=config.get('strip_description_lines'),
+                    strip_html_comments=config.get('strip_html_comments'),
+                    sha=from_commit.sha
+                )
+            else:
+                from_commit = repository.get_pull(int(to_commit))
+                pr = PullRequest(
+                    repository=repository.full_name,
+                    title=from_commit.title,
+                    message=from_commit.body,
+                    url=from_commit.html_url,
+                    files=list(from_commit.get_files()),
+                    strip_lines=config.get('strip_description_lines'),
+                    strip_html_comments=config.get('strip_html_comments'),
+                    sha=from_commit.head.sha
+                )
 
         metadata.update({
             'link_text': to_commit,
@@ -204,14 +596,37 @@ async def redflag(
         })
 
         result = Result(pr=pr)
+        if trace_id:
+            result.trace_id = trace_id
+        attribute_metrics([result], fetch_metrics)
         if jira:
-            result.ticket = get_jira_ticket_from_pr_title(
-                jira,
-                pr.title
-            )
+            with METRICS.track() as jira_metrics, TRACER.span('get_jira_ticket_from_pr_title', trace_id=trace_id):
+                result.ticket = get_jira_ticket_from_pr_title(
+                    jira,
+                    pr.title,
+                    cache=jira_cache
+                )
+            attribute_metrics([result], jira_metrics)
 
         results.append(result)
 
+        # A PR reviewed before at another head may only need its new changes reviewed
+        if results_db and not match('^[a-f0-9]{40}$', to_commit):
+            previous = results_db.get_latest(repository.full_name, pr.url)
+            if previous and previous.pr.sha and previous.pr.sha != pr.sha:
+                files = get_incremental_files(
+                    repository,
+                    previous,
+                    head_sha=pr.sha,
+                    max_changes=config.get('incremental_max_changes')
+                )
+                if files is not None:
+                    incremental[id(result)] = (previous, files)
+                    pretty_print(
+                        f'Reviewing only the {len(files)} files changed since {previous.pr.sha[:8]}',
+                        MessageType.INFO
+                    )
+
         pretty_print(
             'Retrieved PRs',
             MessageType.SUCCESS
@@ -219,11 +634,22 @@ async def redflag(
     else:
         try:
             # Get all commits between from and to
-            compare = repository.compare(from_commit, to_commit)
+            compare = repository.compare(from_commit, target)
+
+            base_ref, head_ref = from_commit, target
+
+            # A tracked branch with no new commits has nothing to do
+            if tracking and not compare.ahead_by:
+                pretty_print(
+                    f'No new commits on {to_commit} since the last run, exiting.',
+                    MessageType.SUCCESS
+                )
+                exit(0)
 
             # If there are no commits, try the other way around
             if not compare.ahead_by:
                 compare = repository.compare(to_commit, from_commit)
+                base_ref, head_ref = to_commit, from_commit
                 
                 # If we can't find anything, exit
                 if not compare.ahead_by:
@@ -255,123 +681,273 @@ async def redflag(
         # PyGithub caps at 250 commits, so we need a custom iterator
         commits = get_commits_in_comparison(
             url=compare.url,
-            token=config.get('github_token')
+            credentials=github
         )
 
-        progress_count = compare.ahead_by
-        if max_results:
-            progress_count = max_results if max_results < progress_count else progress_count
-
-        # Create progress bar
-        progress_task_id = 0
-        progress = nullcontext()
-        if progress_bar:
-            progress = Progress(
-                SpinnerColumn(),
-                "[progress.description]{task.description}",
-                BarColumn(),
-                MofNCompleteColumn(),
-                transient=True
+        if config.get('range_review'):
+            # Review the net diff of the range, one result per component
+            results = get_range_results(
+                repository,
+                compare,
+                listed_commits=list(commit_filter.filter_commits(commits)),
+                commit_filter=commit_filter,
+                depth=config.get('range_depth'),
+                base_ref=base_ref,
+                head_ref=head_ref,
+                local_path=config.get('local_repo')
             )
 
-            progress_task_id = progress.add_task(
-                f'Retrieving {progress_count} PRs',
-                total=progress_count
+            pretty_print(
+                f'Built {len(results)} component reviews from {compare.ahead_by} commits',
+                MessageType.SUCCESS
             )
+        else:
+            progress_count = compare.ahead_by
+            if max_results:
+                progress_count = max_results if max_results < progress_count else progress_count
+
+            # Create progress bar
+            progress_task_id = 0
+            progress = nullcontext()
+            if progress_bar:
+                progress = Progress(
+                    SpinnerColumn(),
+                    "[progress.description]{task.description}",
+                    BarColumn(),
+                    MofNCompleteColumn(),
+                    transient=True
+                )
 
-        # Iterate over commits and create PR objects
-        count = 0
-        with progress:
-            for commit in commits:
-                lines = commit \
-                    .get('commit') \
-                    .get('message') \
-                    .splitlines()
-
-                # Commit title is always the first line. The text, if it exists, starts from the 3rd
-                title, message = lines[0], '\n'.join(lines[2:])
-
-                # Some commits we never care about
-                if not filter_commit(
-                    title,
-                    commit,
-                    title_regexes=config.get('filter_commits').get('titles'),
-                    users=config.get('filter_commits').get('users')
-                ):
-                    continue
-
-                if template_texts and message:
-                    for template_text in template_texts:
-                        if matches_template_text(
-                            template_text,
-                            message
-                        ):
-                            # If it's using the templated message, it tells us nothing
-                            message = ''
-                            break
-
-                commit_files = repository \
-                    .get_commit(sha=commit.get('sha')) \
-                    .files
+                progress_task_id = progress.add_task(
+                    f'Retrieving {progress_count} PRs',
+                    total=progress_count
+                )
 
-                # Skip if there aren't any file changes, happens with some merges
-                if not commit_files:
-                    continue
+            # Iterate over commits and create PR objects. Commits we never care about are
+            # dropped from the listing before any per-commit request is made.
+            listed_commits = commit_filter.filter_commits(commits)
 
-                pr = PullRequest(
+            # Optionally hydrate commits with their associated PRs, 100 commits per GraphQL query
+            if config.get('github_graphql'):
+                listed_commits = hydrate_commits(
+                    listed_commits,
                     repository=repository.full_name,
-                    title=title,
-                    message=message,
-                    url=commit.get('html_url'),
-                    files=commit_files,
-                    strip_lines=config.get('strip_description_lines'),
-                    strip_html_comments=config.get('strip_html_comments')
+                    credentials=github,
+                    include_files=config.get('triage'),
+                    commit_filter=commit_filter
                 )
 
-                result = Result(pr=pr)
-                if jira:
-                    result.ticket = get_jira_ticket_from_pr_title(
-                        jira,
-                        title,
-                        progress=progress
+            count = 0
+            processed = []
+            with progress:
+                for title, message, commit in listed_commits:
+                    processed.append(commit.get('sha'))
+                    commit_metadata = commit.get('graphql') or {}
+
+                    # Apply size filters before fetching files when GraphQL already told us the size
+                    if commit_metadata and not commit_filter.matches_size(
+                        additions=commit_metadata.get('additions'),
+                        deletions=commit_metadata.get('deletions'),
+                        changed_files=commit_metadata.get('changed_files')
+                    ):
+                        commit_filter.counts['size'] += 1
+                        continue
+
+                    if template_texts and message:
+                        for template_text in template_texts:
+                            if matches_template_text(
+                                template_text,
+                                message
+                            ):
+                                # If it's using the templated message, it tells us nothing
+                                message = ''
+                                break
+
+                    # When triaging, the PR file list from GraphQL is enough until a full review is needed.
+                    # Without it, the commit is triaged on its title, message and ticket, and its files are
+                    # only fetched if needed, unless path or size filters need them first.
+                    deferred = config.get('triage') and not commit_metadata.get('files') and not commit_filter.needs_files
+                    patches_loaded = not (config.get('triage') and commit_metadata.get('files')) and not deferred
+                    trace_id = TRACER.start_trace('redflag.result')
+                    commit_metrics = {}
+                    if deferred:
+                        commit_files = []
+                    elif patches_loaded:
+                        # Use a lazy repository so each request goes through the least used credential
+                        with METRICS.track() as commit_metrics, METRICS.stage('github_fetch'), TRACER.span(
+                            'github.get_commit',
+                            trace_id=trace_id,
+                            kind=SPAN_KIND_CLIENT,
+                            **{'redflag.commit.sha': commit.get('sha')}
+                        ):
+                            commit_files = github \
+                                .get_repo(repository.full_name, lazy=True) \
+                                .get_commit(sha=commit.get('sha')) \
+                                .files
+                    else:
+                        commit_files = [ChangedFile.from_dict(file) for file in commit_metadata.get('files')]
+
+                    # Skip if there aren't any file changes (happens with some merges), or if the
+                    # changed paths or size are filtered
+                    if not deferred and not commit_filter.matches_files(commit_files):
+                        TRACER.end_trace(trace_id, **{'redflag.filtered': True})
+                        continue
+
+                    pr = PullRequest(
+                        repository=repository.full_name,
+                        title=title,
+                        message=message,
+                        url=commit.get('html_url'),
+                        files=commit_files,
+                        strip_lines=config.get('strip_description_lines'),
+                        strip_html_comments=config.get('strip_html_comments'),
+                        labels=(commit_metadata.get('pull_request') or {}).get('labels'),
+                        sha=commit.get('sha'),
+                        patches_loaded=patches_loaded
                     )
 
-                results.append(result)
-                count += 1
-                if max_results:
-                    if count == max_results:
-                        break
+                    result = Result(pr=pr)
+                    if trace_id:
+                        result.trace_id = trace_id
+                    attribute_metrics([result], commit_metrics)
+                    if jira:
+                        with METRICS.track() as jira_metrics, TRACER.span('get_jira_ticket_from_pr_title', trace_id=trace_id):
+                            result.ticket = get_jira_ticket_from_pr_title(
+                                jira,
+                                title,
+                                progress=progress,
+                                cache=jira_cache
+                            )
+                        attribute_metrics([result], jira_metrics)
+
+                    results.append(result)
+                    count += 1
+                    if max_results:
+                        if count == max_results:
+                            break
                 
-                if progress_bar:
-                    progress.update(
-                        progress_task_id,
-                        advance=1
-                    )
+                    if progress_bar:
+                        progress.update(
+                            progress_task_id,
+                            advance=1
+                        )
+
+            pretty_print(
+                f'Retrieved {progress_count} PRs',
+                MessageType.SUCCESS
+            )
 
         pretty_print(
-            f'Retrieved {progress_count} PRs',
-            MessageType.SUCCESS
+            f'GitHub usage: {github.summary()}',
+            MessageType.INFO
         )
 
+        if commit_filter.total:
+            pretty_print(
+                f'Filtered {commit_filter.total} commits ({commit_filter.summary()})',
+                MessageType.INFO
+            )
+
     # Instantiate Bedrock
-    llm = BedrockChat(
-        region_name=config.get('bedrock', {}).get('region') or None,
-        credentials_profile_name=config.get('bedrock', {}).get('profile') or None,
-        model_id=config.get('bedrock', {}).get('model_id'),
-        model_kwargs={
-            'max_tokens': 4096,
-            'temperature': 0.0
-        },
-        config=Config(
-            read_timeout=600,
-            retries={'max_attempts': 10, 'mode': 'adaptive'}
-        )
-    )
+    if llm_task:
+        llm = await llm_task
 
     pretty_print(
         'Instantiated Bedrock',
         MessageType.SUCCESS
     )
+
+    # Results are streamed to an NDJSON file as soon as they are final, the reports are built from it.
+    # The cumulative report of a tracked branch is written to a file of its own at the end of the run.
+    base_filename = to_commit if not from_commit else f'{metadata["commits"]["from"]}-{metadata["commits"]["to"]}'
+    filename = get_report_filename(repository.full_name, base_filename)
+
+    stream = ResultStream(
+        Path(config.get('output_dir') or '.') / f'{filename}.ndjson',
+        fsync=config.get('fsync')
+    )
+    report_path = stream.path
+
+    # Lets the `ci` step of the GitHub Action publish the results of this run only
+    write_github_output({'report': stream.path})
+    result_ids = {id(result) for result in results}
+
+    def stream_results(covered: list) -> None:
+        for result in covered:
+            TRACER.end_trace(getattr(result, 'trace_id', None), **get_trace_attributes(result))
+
+        # Merged units of a Jira ticket are not part of the results, their members are streamed once they share the verdict
+        stream.write_all(result for result in covered if id(result) in result_ids)
+
+    # Commits already reviewed with the same model and prompts keep their stored verdict
+    pending = results
+    if results_db:
+        pending = [result for result in results if not results_db.restore(result)]
+        pending_ids = {id(result) for result in pending}
+        stream_results([result for result in results if id(result) not in pending_ids])
+        pretty_print(
+            f'Restored {len(results) - len(pending)} results from {config.get("results_db")}',
+            MessageType.INFO
+        )
+
+    durations = {}
+    for result in pending:
+        if id(result) in incremental:
+            previous, files = incremental.get(id(result))
+            await _timed(
+                review_incremental(result, previous, files, llm, config.get('prompts')),
+                results=[result],
+                durations=durations,
+                on_done=stream_results
+            )
+
+    to_review = [result for result in pending if id(result) not in incremental]
+
+    # Each review unit is reviewed once and its verdict applies to all of its members
+    units = [(result, [result]) for result in to_review]
+    if config.get('group_by_ticket'):
+        units = group_results_by_ticket(to_review)
+
+        pretty_print(
+            f'Grouped {len(to_review)} PRs into {len(units)} review units by Jira ticket',
+            MessageType.INFO
+        )
+
+    unit_members = {id(unit.pr): members for unit, members in units if len(members) > 1}
+
+    # Identical patches (cherry-picks, backports, re-lands) are only reviewed once
+    duplicates = group_results_by_fingerprint([unit for unit, _ in units])
+    review_units = [unit for unit, _ in duplicates]
+    if len(review_units) < len(units):
+        pretty_print(
+            f'Skipped {len(units) - len(review_units)} PRs with the same patch as another PR',
+            MessageType.INFO
+        )
+
+    # Reuse verdicts from earlier runs for patches that were already reviewed
+    verdict_store = VerdictStore.from_config(config)
+    if verdict_store:
+        reused = {id(unit) for unit in review_units if verdict_store.apply(unit)}
+        stream_results([unit for unit in review_units if id(unit) in reused])
+        review_units = [unit for unit in review_units if id(unit) not in reused]
+        pretty_print(
+            f'Reused {verdict_store.hits} verdicts from {config.get("verdict_cache")}',
+            MessageType.INFO
+        )
+
+    # Near-duplicate patches are reviewed once through a representative
+    similar = []
+    similarity_scores = {}
+    if config.get('similarity_threshold'):
+        similar, similarity_scores = group_results_by_similarity(
+            review_units,
+            threshold=config.get('similarity_threshold')
+        )
+        pretty_print(
+            f'Grouped {len(review_units)} PRs into {len(similar)} review units by patch similarity',
+            MessageType.INFO
+        )
+        review_units = [unit for unit, _ in similar]
     
     # Create progress bar
     progress_task_id = 0
@@ -387,19 +963,81 @@ async def redflag(
 
         progress_task_id = progress.add_task(
             'Evaluating PRs',
-            total=len(results)
+            total=len(review_units)
+        )
+
+    def load_files(pr: PullRequest) -> list:
+        # Grouped units merge the files of their members
+        members = unit_members.get(id(pr))
+        if members:
+            for member in members:
+                if not member.pr.patches_loaded:
+                    member.pr.files = load_files(member.pr)
+                    member.pr.patches_loaded = True
+
+            return merge_files([member.pr for member in members])
+
+        with METRICS.stage('github_fetch'), TRACER.span(
+            'github.get_commit',
+            kind=SPAN_KIND_CLIENT,
+            **{'redflag.commit.sha': pr.sha}
+        ):
+            return [
+                ChangedFile.from_github(file)
+                for file in github.get_repo(pr.repository, lazy=True).get_commit(sha=pr.sha).files
+            ]
+
+    # Pack small PRs with their patches already loaded into batches, if enabled
+    batches = []
+    singles = review_units
+    batch_config = config.get('batch_review') or {}
+    if batch_config.get('max_prs', 0) > 1:
+        batches, singles = pack_review_batches(
+            [result for result in review_units if result.pr.patches_loaded],
+            llm=llm,
+            max_prs=batch_config.get('max_prs'),
+            max_tokens=batch_config.get('max_tokens'),
+            max_pr_tokens=batch_config.get('max_pr_tokens')
+        )
+        singles.extend(result for result in review_units if not result.pr.patches_loaded)
+
+        pretty_print(
+            f'Packed {sum(len(batch) for batch in batches)} PRs into {len(batches)} batches',
+            MessageType.INFO
         )
 
     # Create tasks
     prompts = config.get('prompts')
     tasks = [
-        asyncio.create_task(query_model(
-            result=result,
-            llm=llm,
-            progress=progress if progress_bar else None,
-            progress_task_id=progress_task_id,
-            prompts=prompts
-        )) for result in results
+        asyncio.create_task(_timed(
+            query_model(
+                result=result,
+                llm=llm,
+                progress=progress if progress_bar else None,
+                progress_task_id=progress_task_id,
+                prompts=prompts,
+                triage=config.get('triage'),
+                file_loader=load_files,
+                verdict_store=verdict_store
+            ),
+            results=[result],
+            durations=durations,
+            on_done=stream_results
+        )) for result in singles
+    ] + [
+        asyncio.create_task(_timed(
+            query_model_batch(
+                results=batch,
+                llm=llm,
+                progress=progress if progress_bar else None,
+                progress_task_id=progress_task_id,
+                prompts=prompts,
+                triage=config.get('triage')
+            ),
+            results=batch,
+            durations=durations,
+            on_done=stream_results
+        )) for batch in batches
     ]
     
     # Run all the tasks (blocking)
@@ -418,102 +1056,157 @@ async def redflag(
         MessageType.SUCCESS
     )
 
-    errored = []
-    in_scope = []
-    out_of_scope = []
-
-    # Work out what should and should not be in scope
-    for result in results:
-        if hasattr(result, 'review'):
-            if result.review.result:
-                if hasattr(result, 'test_plan'):
-                    in_scope.append(result)
-                else:
-                    # Test Plan failed to create
-                    errored.append(result)
-            else:
-                out_of_scope.append(result)
-        else:
-            errored.append(result)
+    if verdict_store:
+        for unit in review_units:
+            if not hasattr(unit, 'decided_by'):
+                verdict_store.put(unit)
+        verdict_store.close()
+
+    for unit, members in similar:
+        for member in members[1:]:
+            inherit_verdict(
+                unit,
+                member,
+                decided_by={
+                    'reason': 'similarity',
+                    'url': unit.pr.url,
+                    'title': unit.pr.title,
+                    'score': round(similarity_scores.get(id(member)), 2)
+                }
+            )
+        stream_results(members[1:])
+
+    for unit, members in duplicates:
+        if len(members) > 1:
+            share_verdict(
+                unit,
+                members,
+                decided_by=unit.decided_by if hasattr(unit, 'decided_by') else {
+                    'reason': 'fingerprint',
+                    'url': unit.pr.url,
+                    'title': unit.pr.title
+                }
+            )
+            stream_results(members[1:])
+
+    # The merged unit of a Jira ticket has no SHA, its verdict and duration are recorded for each of its commits
+    for unit, members in units:
+        if len(members) > 1:
+            share_verdict(
+                unit,
+                members,
+                decided_by={'reason': 'ticket', 'key': get_ticket_key(unit), 'title': unit.pr.title}
+            )
+            if id(unit) in durations:
+                for member in members:
+                    durations[id(member)] = durations.get(id(unit)) / len(members)
+            stream_results(members)
+
+    if results_db:
+        for result in pending:
+            results_db.put(
+                result,
+                duration=durations.get(id(result))
+            )
 
-    percent = (len(in_scope) / len(results)) * 100 if len(results) > 0 else 0.0
-    pretty_print(
-        f'Evaluated {len(results)} entries. {len(in_scope)} are in scope ' \
-        f'({(len(in_scope) / len(results)) * 100 if len(results) > 0 else 0}%).',
-        MessageType.SUCCESS
-    )
+    # Every result was streamed once final: reviewed, restored, or when it inherited its verdict
+    stream.close()
+
+    in_scope, out_of_scope, errored = split_results(results)
+
+    if tracking:
+        # Errored commits are retried on the next run, the commits after them are restored from
+        # the results database. A run cut short by max_commits resumes where it stopped.
+        mark = _get_tracking_mark(
+            processed,
+            errored,
+            target=target,
+            previous_mark=tracking[1],
+            range_review=config.get('range_review'),
+            cut_short=bool(max_results and count == max_results)
+        )
 
-    # Generate output
-    base_filename = to_commit if not from_commit else f'{metadata["commits"]["from"]}-{metadata["commits"]["to"]}'
-    filename = f'{repository.full_name.replace("/", "_")}-{base_filename.replace("/", "-")}-{datetime.now().strftime("%Y-%m-%d-%H-%M-%S")}'
+        errored_ids = {id(result) for result in errored}
+        results_db.track(
+            repository.full_name,
+            branch=to_commit,
+            base=tracking[0],
+            mark=mark,
+            results=[result for result in results if id(result) not in errored_ids]
+        )
 
-    jinja = Environment(
-        loader=PackageLoader("addepar_redflag"),
-        autoescape=select_autoescape()
-    )
+        pretty_print(
+            f'Moved the mark of {to_commit} to {mark[:8]}',
+            MessageType.SUCCESS
+        )
 
-    html_template = jinja.get_template('results.html.jinja2')
+        # The report covers every commit tracked so far
+        in_scope, out_of_scope, errored = split_results(results_db.select(
+            repository.full_name,
+            keys=results_db.get_tracked_keys(repository.full_name, to_commit)
+        ) + errored)
+
+        # Replaced atomically, an interrupted run keeps the previous report and its own results
+        filename = f'{repository.full_name.replace("/", "_")}-{to_commit.replace("/", "-")}-tracked'
+        report_path = stream.path.with_name(f'{filename}.ndjson')
+        tracked_stream = ResultStream(report_path.with_name(f'{filename}.ndjson.tmp'), fsync=config.get('fsync'))
+        tracked_stream.write_all(in_scope + out_of_scope + errored)
+        tracked_stream.close()
+        replace(tracked_stream.path, report_path)
+
+        short_base = tracking[0] if not match('^[a-f0-9]{40}$', tracking[0]) else tracking[0][:8]
+        metadata.update({
+            'link_text': f'{short_base}...{to_commit}',
+            'link_url': f'{repository.html_url}/compare/{tracking[0]}...{to_commit}',
+            'commits': {'from': short_base, 'to': to_commit}
+        })
 
-    # Convert results to b64 for the HTML report.
-    # Output in b64 to avoid tags like '</script>' from breaking the page.
-    results = {
-        'in_scope_b64': b64encode(jsonlib.dumps([result.to_dict() for result in in_scope]).encode('utf-8')).decode('utf-8'),
-        'out_of_scope_b64': b64encode(jsonlib.dumps([result.to_dict() for result in out_of_scope]).encode('utf-8')).decode('utf-8'),
-        'metadata_b64': b64encode(jsonlib.dumps(metadata).encode('utf-8')).decode('utf-8')
-    }
+    if results_db:
+        results_db.close()
 
     pretty_print(
-        'Compiled results',
+        f'Evaluated {len(results)} entries. {len(in_scope)} are in scope ' \
+        f'({(len(in_scope) / len(results)) * 100 if len(results) > 0 else 0}%).',
         MessageType.SUCCESS
     )
 
-    # Try to create output_dir if it doesn't exist
-    output_dir = config.get('output_dir')
-    if output_dir:
-        try:
-            Path(output_dir).mkdir(
-                exist_ok=True,
-                parents=True
-            )
-        except Exception as e:
-            pretty_print(
-                f'Could not create output directory "{output_dir}"',
-                MessageType.FATAL
-            )
-            exit(1)
-
-    # Write HTML output
-    if config.get('output_html'):
-        file_path = Path(output_dir or '.') / f'{filename}.html'
-        with open(file_path, 'w') as f:
-            f.write(html_template.render(results=results))
-
-            pretty_print(
-                f'Wrote HTML report to {file_path}',
-                MessageType.SUCCESS
-            )
-
-     # Write JSON output for in-scope items only
-    if config.get('output_json'):
-        if in_scope:
-            file_path = Path(output_dir or '.') / f'{filename}.json'
-            with open(file_path, 'w') as f:
-                f.write(jsonlib.dumps({'in_scope': [result.to_dict() for result in in_scope], 'out_of_scope': [result.to_dict() for result in out_of_scope]}))
-
-                pretty_print(
-                    f'Wrote JSON output to {file_path}',
-                    MessageType.SUCCESS
-                )
-
-    if errored:
-        file_path = Path(output_dir or '.') / f'Errors-{filename}.json'
-        with open(file_path, 'w') as f:
-            f.write(jsonlib.dumps([result.to_dict() for result in errored]))
-
+    METRICS.mark('complete')
+    metadata['metrics'] = METRICS.to_dict()
+    timings = metadata['metrics']['timings']
+    counters = metadata['metrics']['counters']
+    if 'time_to_first_llm_call' in timings:
         pretty_print(
-            f'Wrote error information to {file_path}',
-            MessageType.SUCCESS
+            f'Time to first LLM call: {timings["time_to_first_llm_call"]:.2f}s '
+            f'(startup: {timings.get("startup", 0):.2f}s)',
+            MessageType.INFO
         )
+    pretty_print(
+        f'{counters.get("llm_calls", 0)} LLM calls, {counters.get("input_tokens", 0)} input and '
+        f'{counters.get("output_tokens", 0)} output tokens, {counters.get("throttles", 0)} throttles, '
+        f'{counters.get("parser_fix_retries", 0)} parser fix retries',
+        MessageType.INFO
+    )
+
+    output_dir = Path(config.get('output_dir') or '.')
+    write_metrics_summary(
+        output_dir / f'Metrics-{filename}.json',
+        run=metadata['metrics'],
+        results=results
+    )
+    if config.get('metrics_textfile'):
+        write_prometheus_textfile(
+            config.get('metrics_textfile'),
+            run=metadata['metrics'],
+            labels={'repository': repository.full_name}
+        )
+
+    # Generate output
+    write_reports(
+        stream_path=report_path,
+        metadata=metadata,
+        filename=filename,
+        config=config
+    )
 
     pretty_print(
         'Complete!',
@@ -0,0 +1,152 @@
+from datetime import datetime
+from pathlib import Path
+from re import match
+
+from github import GithubException, UnknownObjectException
+
+from .util.console import (
+    pretty_print,
+    MessageType
+)
+from .util.credentials import GitHubPool
+from .util.filters import CommitFilter
+from .util.github import get_commits_in_comparison
+from .util.report import (
+    ResultStream,
+    get_report_filename,
+    write_reports
+)
+from .util.results_db import ResultsDatabase
+
+
+def _get_range_shas(
+    github: GitHubPool,
+    config: dict
+) -> tuple[list, str | None]:
+    """Returns the SHAs of the commits between from and to, and the URL of the comparison."""
+    repository_name = config.get('repo')
+    from_commit = config.get('from')
+    to_commit = config.get('to')
+
+    # A local clone avoids the GitHub API entirely
+    if config.get('local_repo'):
+        from git import Repo
+
+        repo = Repo(config.get('local_repo'))
+        shas = [commit.hexsha for commit in repo.iter_commits(f'{from_commit}..{to_commit}')] \
+            or [commit.hexsha for commit in repo.iter_commits(f'{to_commit}..{from_commit}')]
+
+        return shas, f'https://github.com/{repository_name}/compare/{from_commit}...{to_commit}'
+
+    repository = github.get_repo(repository_name, lazy=True)
+    compare = repository.compare(from_commit, to_commit)
+    if not compare.ahead_by:
+        compare = repository.compare(to_commit, from_commit)
+
+    return [
+        commit.get('sha')
+        for commit in get_commits_in_comparison(
+            url=compare.url,
+            credentials=github
+        )
+    ], compare.html_url
+
+
+def render(
+    github: GitHubPool,
+    config: dict,
+    commit_filter: CommitFilter | None = None
+) -> None:
+    """Renders the HTML and JSON reports of a commit range from the results database, without the LLM."""
+    results_db = ResultsDatabase.from_config(config)
+    if not results_db:
+        pretty_print(
+            'A results database (--results-db) is required to render reports.',
+            MessageType.FATAL
+        )
+        exit(1)
+
+    repository_name = config.get('repo')
+    to_commit = config.get('to')
+    from_commit = config.get('from')
+
+    metadata = {
+        'repository': repository_name,
+        'repository_url': f'https://github.com/{repository_name}',
+        'date': datetime.now().strftime('%b  %d, %Y'),
+        'jira_url': (config.get('jira') or {}).get('url') or '',
+        'link_text': None,
+        'link_url': None,
+        'commits': {
+            'from': '',
+            'to': ''
+        }
+    }
+
+    # Without a range, every stored result of the repository is rendered
+    shas = None
+    try:
+        if from_commit and to_commit:
+            shas, link_url = _get_range_shas(github, config)
+
+            short_to_name = to_commit if not match('^[a-f0-9]{40}$', to_commit) else to_commit[:8]
+            short_from_name = from_commit if not match('^[a-f0-9]{40}$', from_commit) else from_commit[:8]
+            metadata.update({
+                'link_text': f'{short_from_name}...{short_to_name}',
+                'link_url': link_url,
+                'commits': {'from': short_from_name, 'to': short_to_name}
+            })
+        elif to_commit:
+            if match('^[a-f0-9]{40}$', to_commit):
+                shas = [to_commit]
+            else:
+                pull = github.get_repo(repository_name, lazy=True).get_pull(int(to_commit))
+                shas = [pull.head.sha]
+
+            metadata.update({
+                'link_text': to_commit,
+                'commits': {'from': to_commit, 'to': to_commit}
+            })
+    except (GithubException, UnknownObjectException) as e:
+        pretty_print(
+            f'Failed to find the to and from refs: {e}',
+            MessageType.FATAL
+        )
+        exit(1)
+
+    results = results_db.select(
+        repository_name,
+        shas=shas
+    )
+    results_db.close()
+
+    if commit_filter:
+        results = [result for result in results if not commit_filter.matches_title(result.pr.title)]
+
+    pretty_print(
+        f'Loaded {len(results)} results from {config.get("results_db")}'
+        f'{f" ({len(shas)} commits in range)" if shas is not None else ""}',
+        MessageType.SUCCESS
+    )
+
+    base_filename = to_commit if not from_commit else f'{metadata["commits"]["from"]}-{metadata["commits"]["to"]}'
+    filename = get_report_filename(repository_name, base_filename or 'all')
+
+    stream = ResultStream(
+        Path(config.get('output_dir') or '.') / f'{filename}.ndjson',
+        fsync=config.get('fsync')
+    )
+    stream.write_all(results)
+    stream.close()
+
+    write_reports(
+        stream_path=stream.path,
+        metadata=metadata,
+        filename=filename,
+        config=config
+    )
+
+    pretty_print(
+        'Complete!',
+        MessageType.SUCCESS
+    )
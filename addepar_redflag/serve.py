@@ -0,0 +1,333 @@
+import asyncio
+import hmac
+import json
+import logging
+from hashlib import sha256
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+
+from atlassian import Jira
+
+from .models.structures import PullRequest, Result
+from .redflag import query_model, review_incremental
+from .util.ci import publish_result
+from .util.console import (
+    pretty_print,
+    MessageType
+)
+from .util.credentials import GitHubPool
+from .util.incremental import get_incremental_files
+from .util.jira import get_jira_ticket_from_pr_title
+from .util.jobs import Job, JobQueue
+from .util.llm import get_bedrock_llm
+from .util.report import get_status
+from .util.results_db import ResultsDatabase
+from .util.tracing import (
+    SPAN_KIND_CLIENT,
+    TRACER,
+    get_trace_attributes
+)
+from .util.verdicts import VerdictStore
+
+
+PULL_REQUEST_ACTIONS = ['opened', 'reopened', 'synchronize', 'ready_for_review']
+MAX_JOB_ATTEMPTS = 3
+# Workers also poll, so jobs queued for a retry are picked up without a new event
+POLL_INTERVAL = 5
+
+
+def verify_signature(
+    secret: str,
+    body: bytes,
+    signature: str | None
+) -> bool:
+    """Verifies the X-Hub-Signature-256 header of a webhook delivery."""
+    expected = 'sha256=' + hmac.new(secret.encode('utf-8'), body, sha256).hexdigest()
+    return hmac.compare_digest(expected, signature or '')
+
+
+def make_webhook_handler(
+    queue: JobQueue,
+    secret: str | None,
+    wake
+) -> type:
+    class WebhookHandler(BaseHTTPRequestHandler):
+        def _respond(
+            self,
+            status: int,
+            body: dict
+        ) -> None:
+            data = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path != '/health':
+                self._respond(404, {'error': 'not found'})
+                return
+
+            self._respond(200, {'jobs': queue.counts()})
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+
+            if secret and not verify_signature(secret, body, self.headers.get('X-Hub-Signature-256')):
+                self._respond(401, {'error': 'invalid signature'})
+                return
+
+            event = self.headers.get('X-GitHub-Event')
+            if event == 'ping':
+                self._respond(200, {'status': 'pong'})
+                return
+
+            if event != 'pull_request':
+                self._respond(202, {'status': 'ignored', 'reason': f'event {event}'})
+                return
+
+            try:
+                payload = json.loads(body)
+                action = payload['action']
+                pull = payload['pull_request']
+                repository = payload['repository']['full_name']
+            except (ValueError, KeyError, TypeError) as e:
+                self._respond(400, {'error': f'invalid payload: {e}'})
+                return
+
+            if action not in PULL_REQUEST_ACTIONS or pull.get('draft'):
+                self._respond(202, {'status': 'ignored', 'reason': f'action {action}'})
+                return
+
+            queued = queue.enqueue(
+                delivery=self.headers.get('X-GitHub-Delivery') or f'{repository}#{pull["number"]}@{pull["head"]["sha"]}',
+                repository=repository,
+                number=pull['number'],
+                sha=pull['head']['sha']
+            )
+            if queued:
+                wake()
+
+            self._respond(202, {'status': 'queued' if queued else 'duplicate'})
+
+        def log_message(self, format, *args):
+            # Deliveries are logged by the workers
+            pass
+
+    return WebhookHandler
+
+
+async def review_job(
+    job: Job,
+    github: GitHubPool,
+    jira: Jira,
+    llm,
+    config: dict,
+    jira_cache: dict,
+    verdict_store: VerdictStore | None,
+    results_db: ResultsDatabase | None
+) -> tuple:
+    """Reviews the PR of a job with the shared clients. Returns the PR and its result."""
+    repository = github.get_repo(job.repository, lazy=True)
+    with TRACER.span('github.hydrate', kind=SPAN_KIND_CLIENT):
+        pull = await asyncio.to_thread(repository.get_pull, job.number)
+        files = await asyncio.to_thread(lambda: list(pull.get_files()))
+
+    pr = PullRequest(
+        repository=job.repository,
+        title=pull.title,
+        message=pull.body or '',
+        url=pull.html_url,
+        files=files,
+        strip_lines=config.get('strip_description_lines'),
+        strip_html_comments=config.get('strip_html_comments'),
+        labels=[label.name for label in pull.labels],
+        sha=pull.head.sha
+    )
+
+    result = Result(pr=pr)
+    if TRACER.enabled:
+        result.trace_id = TRACER.current_trace_id()
+    if jira:
+        with TRACER.span('get_jira_ticket_from_pr_title'):
+            result.ticket = await asyncio.to_thread(
+                get_jira_ticket_from_pr_title,
+                jira,
+                pr.title,
+                cache=jira_cache
+            )
+
+    # The same head was already reviewed, e.g. a reopened PR
+    if results_db and results_db.restore(result):
+        return pull, result
+
+    # Only the changes since the previous review of the PR may need a review
+    previous = results_db.get_latest(job.repository, pr.url) if results_db else None
+    incremental_files = None
+    if previous and previous.pr.sha and previous.pr.sha != pr.sha:
+        incremental_files = await asyncio.to_thread(
+            get_incremental_files,
+            repository,
+            previous,
+            head_sha=pr.sha,
+            max_changes=config.get('incremental_max_changes')
+        )
+
+    if incremental_files is not None:
+        await review_incremental(result, previous, incremental_files, llm, config.get('prompts'))
+    elif not (verdict_store and verdict_store.apply(result)):
+        await query_model(
+            result=result,
+            llm=llm,
+            progress=None,
+            progress_task_id=0,
+            prompts=config.get('prompts')
+        )
+
+        if verdict_store:
+            verdict_store.put(result)
+            verdict_store.commit()
+
+    return pull, result
+
+
+async def process_job(
+    name: str,
+    job: Job,
+    queue: JobQueue,
+    context: dict
+) -> None:
+    """Reviews and publishes a claimed job, then completes it, or fails it for a retry."""
+    config = context.get('config')
+    results_db = context.get('results_db')
+
+    pretty_print(
+        f'{name}: Reviewing {job.repository}#{job.number} at {(job.sha or "")[:8]} (attempt {job.attempts})',
+        MessageType.INFO
+    )
+
+    try:
+        # Each job is a trace of its own
+        with TRACER.span(
+            'review_job',
+            **{'github.repository': job.repository, 'github.pr.number': job.number, 'redflag.attempt': job.attempts}
+        ):
+            pull, result = await review_job(job, **context)
+            TRACER.set_attributes(**get_trace_attributes(result))
+            if get_status(result) == 'errored':
+                raise RuntimeError('the review or test plan could not be created')
+
+            in_scope = await asyncio.to_thread(publish_result, pull, result, config)
+
+        # Committed per job, so the result survives a crash and `render` sees it
+        if results_db:
+            results_db.put(result)
+            results_db.commit()
+
+        queue.complete(job)
+        pretty_print(
+            f'{name}: {job.repository}#{job.number} is {"in scope" if in_scope else "out of scope"}',
+            MessageType.SUCCESS
+        )
+    # A failed review must not stop the worker
+    except Exception as e:
+        retry = job.attempts < MAX_JOB_ATTEMPTS
+        queue.fail(job, str(e), retry=retry)
+        pretty_print(
+            f'{name}: Failed to review {job.repository}#{job.number}: {e}'
+            f'{" Retrying." if retry else ""}',
+            MessageType.WARN
+        )
+
+
+async def worker(
+    name: str,
+    queue: JobQueue,
+    wake_event: asyncio.Event,
+    context: dict
+) -> None:
+    while True:
+        wake_event.clear()
+        job = queue.claim()
+        if not job:
+            try:
+                await asyncio.wait_for(wake_event.wait(), timeout=POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            continue
+
+        await process_job(name, job, queue, context)
+
+
+async def serve(
+    github: GitHubPool,
+    jira: Jira,
+    config: dict
+):
+    """Receives pull_request webhooks and reviews them with warm workers that share clients and caches."""
+    # Ignore WARNING messages from urllib3
+    logging.getLogger("urllib3").setLevel(logging.ERROR)
+
+    serve_config = config.get('serve') or {}
+    queue = JobQueue(serve_config.get('queue'))
+    recovered = queue.recover()
+    if recovered:
+        pretty_print(
+            f'Queued {recovered} reviews left running by a previous process again',
+            MessageType.INFO
+        )
+
+    secret = serve_config.get('webhook_secret')
+    if not secret:
+        pretty_print(
+            'No webhook secret is set, deliveries are not verified. Only expose the server to trusted networks.',
+            MessageType.WARN
+        )
+
+    loop = asyncio.get_running_loop()
+    wake_event = asyncio.Event()
+
+    server = ThreadingHTTPServer(
+        (serve_config.get('host'), int(serve_config.get('port'))),
+        make_webhook_handler(
+            queue,
+            secret=secret,
+            wake=lambda: loop.call_soon_threadsafe(wake_event.set)
+        )
+    )
+    Thread(target=server.serve_forever, daemon=True).start()
+
+    pretty_print(
+        f'Listening for webhooks on http://{serve_config.get("host")}:{serve_config.get("port")} '
+        f'with {serve_config.get("workers")} workers',
+        MessageType.SUCCESS
+    )
+
+    # Clients and caches are created once and shared by every review
+    context = {
+        'github': github,
+        'jira': jira,
+        'llm': get_bedrock_llm(config),
+        'config': config,
+        'jira_cache': {},
+        'verdict_store': VerdictStore.from_config(config),
+        'results_db': ResultsDatabase.from_config(config)
+    }
+
+    try:
+        await asyncio.gather(*[
+            worker(
+                f'worker-{index + 1}',
+                queue,
+                wake_event,
+                context=context
+            )
+            for index in range(int(serve_config.get('workers')))
+        ])
+    finally:
+        server.shutdown()
+        queue.close()
+        for store in (context.get('verdict_store'), context.get('results_db')):
+            if store:
+                store.close()
@@ -0,0 +1,679 @@
+const HTMLHelper = {
+    __showdown: null,
+
+    find: function(container, selector) {
+        return selector.length == 0 ? $(container) : $(container).find(selector);
+    },
+
+    attr: function(container, selector, name, value) {
+        $(this.find(container, selector)).attr(name, value);
+    },
+
+    text: function(container, selector, value) {
+        $(this.find(container, selector)).text(value);
+    },
+
+    data: function(container, selector, name, value) {
+        $(this.find(container, selector)).data(name, value);
+    },
+
+    html: function(container, selector, value) {
+        $(this.find(container, selector)).html(value);
+    },
+
+    addClasses: function(container, selector, classes) {
+        $(this.find(container, selector)).addClass(this.__mergeClasses(classes));
+    },
+
+    removeClasses: function(container, selector, classes) {
+        $(this.find(container, selector)).removeClass(this.__mergeClasses(classes));
+    },
+
+    __mergeClasses: function(classes) {
+        return Array.isArray(classes) ? classes.join(' ') : classes;
+    },
+
+    markdownToHtml: function(markdown) {
+        if (this.__showdown == null) {
+            this.__showdown = new showdown.Converter();
+        }
+        return this.__showdown.makeHtml(markdown);
+    }
+};
+
+const ReportLocalStorage = {
+    __reportKey: null,
+
+    __data: {},
+
+    init: function(reportKey) {
+        this.__reportKey = reportKey;
+        this.__load();
+    },
+
+    __load: function() {
+        try {
+            this.__data = JSON.parse(localStorage.getItem(this.__reportKey));
+            if (!this.__data) {
+                this.__data = {};
+            }
+        } catch (err) {
+            this.__data = {};
+        }
+    },
+
+    get: function(name) {
+        return (name in this.__data) ? this.__data[name] : null;
+    },
+
+    set: function(name, value) {
+        this.__data[name] = value;
+        localStorage.setItem(this.__reportKey, JSON.stringify(this.__data));
+    }
+};
+
+const ReportDataConverter = {
+    process: function(data, in_scope) {
+        converted = [];
+
+        for (let i = 0; i < data.length; i++) {
+            let reportItem = data[i];
+
+            let item = {
+                title: "",
+                url: "",
+                description: "",
+                files: "",
+                in_scope: in_scope,
+                commit: "",
+                testplan: {
+                    description: "",
+                    reasoning: "",
+                    exists: false
+                },
+                debug: {
+                    tokens: "",
+                    shouldtest: "",
+                    files: "",
+                    exists: false
+                },
+                jira: {
+                    ticket: "",
+                    title: "",
+                    description: "",
+                    exists: false
+                },
+                decidedBy: ""
+            };
+
+            if ('pr' in reportItem && reportItem.pr) {
+                item.title = ('title' in reportItem.pr) ? reportItem.pr.title : '';
+                item.url = ('url' in reportItem.pr) ? reportItem.pr.url : '';
+                item.commit = (item.url.length > 0) ? this.__getCommitFromUrl(item.url) : '';
+                item.description = ('message' in reportItem.pr) ? HTMLHelper.markdownToHtml(reportItem.pr.message) : '';
+                item.files = ('file_names' in reportItem.pr) ? reportItem.pr.file_names : [];
+            }
+
+            if ('test_plan' in reportItem && reportItem.test_plan) {
+                item.testplan.description = ('test_plan' in reportItem.test_plan) ? reportItem.test_plan.test_plan : '';
+                item.testplan.reasoning = ('reasoning' in reportItem.test_plan) ? reportItem.test_plan.reasoning : '';
+                item.testplan.exists = true;
+            }
+
+            if ('token_count' in reportItem && reportItem.token_count) {
+                item.debug.tokens = reportItem.token_count;
+            }
+
+            if ('review' in reportItem && reportItem.review) {
+                item.debug.shouldtest = ('reasoning' in reportItem.review) ? reportItem.review.reasoning : '';
+                item.debug.files = ('files' in reportItem.review) ? reportItem.review.files : [];
+                item.debug.exists = true;
+            }
+
+            if ('ticket' in reportItem && reportItem.ticket) {
+                item.jira.ticket = ('id' in reportItem.ticket) ? reportItem.ticket.id : '';
+                item.jira.title = ('summary' in reportItem.ticket) ? reportItem.ticket.summary : '';;
+                item.jira.description = ('description' in reportItem.ticket) ? HTMLHelper.markdownToHtml(reportItem.ticket.description) : '';;
+                item.jira.exists = true;
+            }
+
+            if ('decided_by' in reportItem && reportItem.decided_by) {
+                item.decidedBy = this.__getDecidedByText(reportItem.decided_by);
+            }
+
+            converted.push(item);
+        }
+
+        return converted;
+    },
+
+    __getDecidedByText: function(decidedBy) {
+        if (decidedBy.reason == 'ticket') {
+            return 'Reviewed together with the other commits of ' + decidedBy.key + ' (' + decidedBy.title + ').';
+        }
+        if (decidedBy.reason == 'incremental') {
+            return 'Only the changes since ' + decidedBy.sha.substring(0, 8) + ' were reviewed: ' + decidedBy.url;
+        }
+        if (decidedBy.reason == 'similarity') {
+            return 'Verdict reused from ' + decidedBy.url + ', a ' + Math.round(decidedBy.score * 100) + '% similar patch (' + decidedBy.title + ').';
+        }
+        return 'Verdict reused from ' + (decidedBy.url || 'an earlier review') + ' (' + decidedBy.reason + ').';
+    },
+
+    __getCommitFromUrl: function(url) {
+        let commitSha = url.split('/').pop();
+        return commitSha.substring(0, 7);
+    }
+};
+
+const ReportInfoManager = {
+    __reportInfo: null,
+
+    init: function(reportInfo) {
+        this.__reportInfo = reportInfo;
+        this.populate();
+    },
+
+    populate: function() {
+        HTMLHelper.text($('.report-title'), '', this.__reportInfo.repository);
+        HTMLHelper.attr($('.github-diff-url'), '', 'href', this.__reportInfo.link_url);
+        HTMLHelper.text($('.commit-info'), '', this.__reportInfo.link_text);
+        HTMLHelper.text($('.report-date'), '', this.__reportInfo.date);
+        this.populateMetrics(this.__reportInfo.metrics);
+    },
+
+    populateMetrics: function(metrics) {
+        // Reports generated before the metrics were nested only have timings
+        if (!metrics || !metrics.counters) {
+            return;
+        }
+
+        const counters = metrics.counters;
+        const parts = [];
+        if (metrics.timings.complete !== undefined) {
+            parts.push(`${metrics.timings.complete.toFixed(1)}s`);
+        }
+        parts.push(`${counters.llm_calls || 0} LLM calls`);
+        parts.push(`${counters.input_tokens || 0} in / ${counters.output_tokens || 0} out tokens`);
+        parts.push(`${counters.throttles || 0} throttles`);
+        parts.push(`${counters.parser_fix_retries || 0} parser fixes`);
+
+        const hits = (counters.verdict_cache_hits || 0) + (counters.results_db_hits || 0) + (counters.jira_cache_hits || 0);
+        parts.push(`${hits} cache hits`);
+
+        HTMLHelper.text($('.report-metrics'), '', parts.join(' · '));
+        $('.report-metrics').removeClass('d-none');
+    }
+};
+
+const ReportData = {
+    __manifest: null,
+    __inline: null,
+    __scripts: {},
+    __resolvers: {},
+
+    // Every result is embedded in the page.
+    initInline: function(inScopeData, outOfScopeData, index) {
+        this.__inline = {in_scope: inScopeData, out_of_scope: outOfScopeData, index: index};
+        this.__manifest = {
+            page_size: Math.max(inScopeData.length, outOfScopeData.length, 1),
+            in_scope: {count: inScopeData.length},
+            out_of_scope: {count: outOfScopeData.length}
+        };
+    },
+
+    // Results are split into gzipped shards, loaded when one of their results is first shown.
+    initSharded: function(manifest) {
+        this.__manifest = manifest;
+    },
+
+    getStatus: function(inScope) {
+        return inScope ? 'in_scope' : 'out_of_scope';
+    },
+
+    getCount: function(inScope) {
+        return this.__manifest[this.getStatus(inScope)].count;
+    },
+
+    getIndex: function() {
+        if (this.__inline) {
+            return Promise.resolve(this.__inline.index);
+        }
+        return this.__loadScript('index', 0, this.__manifest.index);
+    },
+
+    getResult: function(inScope, id) {
+        let status = this.getStatus(inScope);
+        if (this.__inline) {
+            return Promise.resolve(this.__inline[status][id]);
+        }
+
+        let page = Math.floor(id / this.__manifest.page_size);
+        return this.__loadScript(status, page, this.__manifest[status].shards[page]).then(results => {
+            return results[id - page * this.__manifest.page_size];
+        });
+    },
+
+    // Shards are scripts rather than fetched files, as browsers block fetch() on file:// pages.
+    __loadScript: function(name, page, src) {
+        let key = name + '-' + page;
+        if (!(key in this.__scripts)) {
+            this.__scripts[key] = new Promise((resolve, reject) => {
+                let script = document.createElement('script');
+                script.src = src;
+                script.onerror = () => {
+                    delete this.__scripts[key];
+                    reject(new Error('Could not load ' + src));
+                };
+                this.__resolvers[key] = resolve;
+                document.body.appendChild(script);
+            });
+        }
+        return this.__scripts[key];
+    },
+
+    // Called by the shards with their gzipped, b64 encoded data.
+    loadShard: function(name, page, data) {
+        let bytes = Uint8Array.from(atob(data), c => c.charCodeAt(0));
+        let stream = new Blob([bytes]).stream().pipeThrough(new DecompressionStream('gzip'));
+        new Response(stream).text().then(text => {
+            this.__resolvers[name + '-' + page](JSON.parse(text));
+            delete this.__resolvers[name + '-' + page];
+        });
+    }
+};
+
+const ReportSearch = {
+    // Per scope, the title of each result, and the search terms of all results, sorted, with the
+    // ids of the results they appear in. Built when the report is written, see `get_search_index()`.
+    __index: {},
+
+    init: function(index) {
+        this.__index = index;
+    },
+
+    getTitle: function(inScope, id) {
+        return this.__index[ReportData.getStatus(inScope)].titles[id];
+    },
+
+    // Tokenized the same way as the terms, see `get_search_terms()`.
+    __tokenize: function(text) {
+        return text.toLowerCase().match(/[a-z0-9]+/g) || [];
+    },
+
+    // Returns the ids of the results matching every word of the query, as a prefix of a term.
+    search: function(inScope, query) {
+        let index = this.__index[ReportData.getStatus(inScope)];
+        let words = this.__tokenize(query);
+        if (words.length == 0) {
+            return Array.from(index.titles.keys());
+        }
+
+        let matches = null;
+        for (let word of words) {
+            let ids = new Set();
+            for (let i = this.__findFirst(index.terms, word); i < index.terms.length && index.terms[i].startsWith(word); i++) {
+                index.postings[i].forEach(id => ids.add(id));
+            }
+            matches = (matches == null) ? ids : new Set([...matches].filter(id => ids.has(id)));
+        }
+        return Array.from(matches).sort((a, b) => a - b);
+    },
+
+    __findFirst: function(terms, word) {
+        let low = 0;
+        let high = terms.length;
+        while (low < high) {
+            let middle = (low + high) >> 1;
+            if (terms[middle] < word) {
+                low = middle + 1;
+            } else {
+                high = middle;
+            }
+        }
+        return low;
+    }
+};
+
+const ReportManager = {
+    // Index rows have a fixed height, so only the visible ones are rendered.
+    __rowHeight: 42,
+    __views: {},
+
+    init: function() {
+        this.__views = {};
+    },
+
+    __bind: function() {
+        $('#toggle-flagged').change(function () {
+            ReportManager.toggleVisibility(ReportManager.getCurrentView());
+        });
+
+        // Rows and findings are rendered on demand, so events are delegated.
+        $(document).on('click', '.toggle-status', function() {
+            let action = $(this).data('action');
+            let id = $(this).data('id');
+            let scope = $(this).data('scope');
+            ReportManager.updateCompletionStatus(action, id, scope);
+
+            ReportManager.__next(action, id, scope);
+
+            return false;
+        });
+
+        $(document).on('click', '.index-row', function() {
+            ReportManager.select($(this).data('scope'), $(this).data('id'));
+
+            return false;
+        });
+
+        $(document).on('input', '.report-search', function() {
+            ReportManager.filter($(this).data('scope'), $(this).val());
+        });
+
+        $('.report-index').on('scroll', function() {
+            let inScope = $(this).data('scope');
+            window.requestAnimationFrame(() => ReportManager.renderIndex(inScope));
+        });
+    },
+
+    __next: function(action, id, inScope) {
+        if (action != 'complete') {
+            return false;
+        }
+
+        let ids = this.__views[inScope].ids;
+        let position = ids.indexOf(id);
+        if (position < 0 || position + 1 >= ids.length) {
+            return false;
+        }
+
+        this.select(inScope, ids[position + 1]);
+        this.__scrollTo(inScope, position + 1);
+        return true;
+    },
+
+    populateAll: function() {
+        return ReportData.getIndex().then(function(index) {
+            ReportSearch.init(index);
+
+            ReportManager.__createContainer(false);
+            ReportManager.__createContainer(true);
+            ReportManager.__bind();
+
+            ReportManager.toggleVisibility(ReportManager.getCurrentView());
+            for (let inScope of [false, true]) {
+                ReportManager.updateProgressBar(inScope);
+                if (ReportData.getCount(inScope) > 0) {
+                    ReportManager.select(inScope, 0);
+                }
+            }
+        });
+    },
+
+    filter: function(inScope, query) {
+        let view = this.__views[inScope];
+        view.ids = ReportSearch.search(inScope, query);
+
+        let container = this.__getContainer(inScope);
+        HTMLHelper.text(container, '.search-count', view.ids.length + ' of ' + ReportData.getCount(inScope));
+        $(container).find('.index-spacer').css('height', view.ids.length * this.__rowHeight + 'px');
+        $(container).find('.report-index').scrollTop(0);
+        this.renderIndex(inScope);
+    },
+
+    renderIndex: function(inScope) {
+        let view = this.__views[inScope];
+        let scopePrefix = this.__getScopePrefix(inScope);
+        let index = this.__getContainer(inScope).find('.report-index');
+        let first = Math.floor($(index).scrollTop() / this.__rowHeight);
+        let last = Math.min(view.ids.length, first + Math.ceil($(index).innerHeight() / this.__rowHeight) + 1);
+
+        let rows = [];
+        for (let position = first; position < last; position++) {
+            let id = view.ids[position];
+
+            let row = $('<a href="#" class="list-group-item list-group-item-action index-row"></a>');
+            HTMLHelper.attr(row, '', 'id', scopePrefix + 'index-' + id);
+            HTMLHelper.data(row, '', 'id', id);
+            HTMLHelper.data(row, '', 'scope', inScope);
+            HTMLHelper.text(row, '', ReportSearch.getTitle(inScope, id));
+            $(row).css('top', position * this.__rowHeight + 'px');
+            if (ReportLocalStorage.get(scopePrefix + 'entry-' + id) == 'complete') {
+                HTMLHelper.addClasses(row, '', 'text-bg-success');
+            }
+            if (id == view.selected) {
+                HTMLHelper.addClasses(row, '', 'active');
+            }
+            rows.push(row);
+        }
+
+        $(index).find('.index-spacer').empty().append(rows);
+    },
+
+    __scrollTo: function(inScope, position) {
+        let index = this.__getContainer(inScope).find('.report-index');
+        let top = position * this.__rowHeight;
+        if (top < $(index).scrollTop() || top + this.__rowHeight > $(index).scrollTop() + $(index).innerHeight()) {
+            $(index).scrollTop(top);
+        }
+        this.renderIndex(inScope);
+    },
+
+    select: function(inScope, id) {
+        this.__views[inScope].selected = id;
+        this.renderIndex(inScope);
+
+        return ReportData.getResult(inScope, id).then(function(rawData) {
+            // Another result was selected while this one was loading
+            if (ReportManager.__views[inScope].selected != id) {
+                return;
+            }
+
+            let container = ReportManager.__getContainer(inScope);
+            let finding = ReportDataConverter.process([rawData], inScope)[0];
+            $(container).find('.report-findings').children(':not(.template)').remove();
+            ReportManager.populateFinding(container, finding, inScope, id);
+            $(container).find('.report-findings').scrollTop(0);
+            ReportManager.__showCompletionStatus(ReportLocalStorage.get(ReportManager.__getScopePrefix(inScope) + 'entry-' + id), id, inScope);
+        });
+    },
+
+    toggleVisibility: function(showFlagged) {
+        let inScopeBox = this.__getContainer(true);
+        let outOfScopeBox = this.__getContainer(false);
+
+        if (showFlagged) {
+            $(inScopeBox).show();
+            $(outOfScopeBox).hide();
+            $('.unflagged-count').hide();
+            $('.flagged-count').show();
+        } else {
+            $(outOfScopeBox).show();
+            $(inScopeBox).hide();
+            $('.flagged-count').hide();
+            $('.unflagged-count').show();
+        }
+
+        // Hidden lists have no height, render the visible rows now
+        this.renderIndex(showFlagged);
+    },
+
+    getCurrentView: function() {
+        return $('#toggle-flagged').is(':checked');
+    },
+
+    __getScopePrefix: function(inScope) {
+        return inScope ? 'in-scope-' : 'out-of-scope-';
+    },
+
+    __getContainer: function(inScope) {
+        return $('.' + this.__getScopePrefix(inScope) + 'report-container');
+    },
+
+    __getReportContainer: function(inScope) {
+        let scopePrefix = this.__getScopePrefix(inScope);
+
+        let reportContainer = $('.report-container-template').clone();
+        HTMLHelper.removeClasses(reportContainer, '', ['report-container-template', 'd-none']);
+        HTMLHelper.addClasses(reportContainer, '', scopePrefix + 'report-container');
+
+        HTMLHelper.data(reportContainer, '.report-index, .report-search', 'scope', inScope);
+
+        return reportContainer;
+    },
+
+    __createContainer: function(inScope) {
+        let reportContainer = this.__getReportContainer(inScope);
+
+        $('.report-container-template').after(reportContainer);
+
+        if (inScope) {
+            $('.flagged-count .count').text(ReportData.getCount(inScope));
+            $(reportContainer).find('.progress-bar').removeClass('bg-success').addClass('bg-red-flag');
+        } else {
+            $('.unflagged-count .count').text(ReportData.getCount(inScope));
+            // Change progres bar colour.
+            $(reportContainer).find('.progress-bar').removeClass('bg-success').addClass('bg-secondary');
+        }
+
+        this.__views[inScope] = {ids: [], selected: null};
+        this.filter(inScope, '');
+    },
+
+    populateFinding: function(container, finding, inScope, id) {
+        let scopePrefix = this.__getScopePrefix(inScope);
+
+        let findingsContainer = HTMLHelper.find(container, '.report-findings');
+        let findingTemplate = $(findingsContainer).find('.template');
+
+        let entryId = scopePrefix + 'entry-' + id;
+        let entryDescriptionId = scopePrefix +'entry-description-' + id;
+        let entryFilesChangedId = scopePrefix + 'entry-files-changed-' + id;
+        let entryTestPlanId = scopePrefix + 'entry-test-plan-' + id;
+        let entrySummaryId = scopePrefix + 'entry-summary-' + id;
+        let entryJiraId = scopePrefix + 'entry-jira-' + id;
+
+        let findingItem = $(findingTemplate).clone();
+        HTMLHelper.removeClasses(findingItem, '', ['template', 'd-none']);
+        HTMLHelper.attr(findingItem, '', 'id', entryId);
+        HTMLHelper.data(findingItem, '', 'id', id);
+        HTMLHelper.data(findingItem, '.toggle-status', 'id', id);
+        HTMLHelper.data(findingItem, '.toggle-status', 'scope', inScope);
+
+        // Set title & url.
+        HTMLHelper.text(findingItem, '.card-header .title', finding.title + " (" + finding.commit + ")");
+        HTMLHelper.attr(findingItem, '.card-header .link', 'href', finding.url);
+
+        // Set all tab href.
+        HTMLHelper.attr(findingItem, '.nav-description', 'href', '#' + entryDescriptionId);
+        HTMLHelper.attr(findingItem, '.nav-test-plan', 'href', '#' + entryTestPlanId);
+        HTMLHelper.attr(findingItem, '.nav-summary', 'href', '#' + entrySummaryId);
+        HTMLHelper.attr(findingItem, '.nav-jira', 'href', '#' + entryJiraId);
+        HTMLHelper.attr(findingItem, '.nav-files-changed', 'href', '#' + entryFilesChangedId);
+        // Add files changed count.
+        HTMLHelper.text(findingItem, '.nav-files-changed .count', finding.files.length);
+
+        // Set description.
+        if (finding.description.length > 0) {
+            HTMLHelper.attr(findingItem, '.tab-description', 'id', entryDescriptionId);
+            HTMLHelper.html(findingItem, '.tab-description .contents', finding.description);
+        } else {
+            HTMLHelper.addClasses($(findingItem).find('.nav-description').parent(), '', 'd-none');
+        }
+
+        // Set test plan.
+        if (finding.testplan.exists) {
+            HTMLHelper.attr(findingItem, '.tab-test-plan', 'id', entryTestPlanId);
+            HTMLHelper.text(findingItem, '.tab-test-plan .description', finding.testplan.description);
+            HTMLHelper.text(findingItem, '.tab-test-plan .reasoning', finding.testplan.reasoning);
+
+            let listTemplate = $(findingItem).find('.tab-test-plan .list-template');
+            for (let k = 0; k < finding.debug.files.length; k++) {
+                let listItem = $(listTemplate).clone();
+                HTMLHelper.removeClasses(listItem, '', ['d-none', 'list-template']);
+                HTMLHelper.text(listItem, '', finding.debug.files[k]);
+                $(findingItem).find('.tab-test-plan ol').append(listItem);
+            }
+        } else {
+            HTMLHelper.addClasses($(findingItem).find('.nav-test-plan').parent(), '', 'd-none');
+        }
+
+        // Set files flagged.
+        HTMLHelper.attr(findingItem, '.tab-files-changed', 'id', entryFilesChangedId);
+
+        listTemplate = $(findingItem).find('.tab-files-changed .list-template');
+        for (let k = 0; k < finding.files.length; k++) {
+            let listItem = $(listTemplate).clone();
+            HTMLHelper.removeClasses(listItem, '', ['d-none', 'list-template']);
+            HTMLHelper.text(listItem, '', finding.files[k]);
+            $(findingItem).find('.tab-files-changed ol').append(listItem);
+        }
+
+        // Set debug/review/summary.
+        if (finding.debug.exists) {
+            HTMLHelper.attr(findingItem, '.tab-summary', 'id', entrySummaryId);
+            HTMLHelper.text(findingItem, '.tab-summary .shouldtest', finding.debug.shouldtest);
+
+            if (finding.decidedBy.length > 0) {
+                HTMLHelper.text(findingItem, '.tab-summary .decided-by', finding.decidedBy);
+                HTMLHelper.removeClasses(findingItem, '.tab-summary .decided-by', 'd-none');
+            }
+        } else {
+            HTMLHelper.addClasses($(findingItem).find('.nav-summary').parent(), '', 'd-none');
+        }
+
+        // Set jira.
+        if (finding.jira.exists) {
+            HTMLHelper.attr(findingItem, '.tab-jira', 'id', entryJiraId);
+            HTMLHelper.text(findingItem, '.tab-jira .title .ticket', finding.jira.ticket);
+            HTMLHelper.text(findingItem, '.tab-jira .title .summary', finding.jira.title);
+            HTMLHelper.html(findingItem, '.tab-jira .description', finding.jira.description);
+        } else {
+            HTMLHelper.addClasses($(findingItem).find('.nav-jira').parent(), '', 'd-none');
+        }
+
+        $(findingsContainer).append(findingItem);
+
+        return container;
+    },
+
+    updateCompletionStatus: function(action, id, inScope) {
+        let findingId = this.__getScopePrefix(inScope) + 'entry-' + id;
+
+        ReportLocalStorage.set(findingId, action == 'complete' ? 'complete' : '');
+        this.__showCompletionStatus(action, id, inScope);
+        this.renderIndex(inScope);
+        this.updateProgressBar(inScope);
+    },
+
+    __showCompletionStatus: function(action, id, inScope) {
+        let findingItem = $('#' + this.__getScopePrefix(inScope) + 'entry-' + id);
+        if (action == 'complete') {
+            HTMLHelper.addClasses(findingItem, '.card-header', 'text-bg-success');
+            HTMLHelper.addClasses(findingItem, '.card-header a', 'text-white');
+            HTMLHelper.addClasses(findingItem, '.action-complete', 'd-none');
+            HTMLHelper.removeClasses(findingItem, '.action-reset', 'd-none');
+        } else {
+            HTMLHelper.removeClasses(findingItem, '.card-header', 'text-bg-success');
+            HTMLHelper.removeClasses(findingItem, '.action-complete', 'd-none');
+            HTMLHelper.removeClasses(findingItem, '.card-header a', 'text-white');
+            HTMLHelper.addClasses(findingItem, '.action-reset', 'd-none');
+        }
+    },
+
+    updateProgressBar: function(inScope) {
+        let scopePrefix = this.__getScopePrefix(inScope);
+        let completed = 0;
+        let totalFindings = ReportData.getCount(inScope);
+        for (let i = 0; i < totalFindings; i++) {
+            if (ReportLocalStorage.get(scopePrefix + 'entry-' + i) == 'complete') {
+                completed++;
+            }
+        }
+        let percent = totalFindings > 0 ? Math.ceil(completed / totalFindings * 100) : 0;
+        let progressBar = $('.' + scopePrefix + 'report-container').find('.total-progress');
+        HTMLHelper.attr(progressBar, '', 'aria-valuenow', percent);
+        $(progressBar).find('.progress-bar').css('width', percent + '%');
+    }
+};
@@ -1,4 +1,11 @@
-from boto3 import Session, client
+import json
+from datetime import datetime
+from hashlib import sha256
+from os import getenv
+from pathlib import Path
+from time import time
+
+from boto3 import Session
 from botocore.exceptions import ProfileNotFound
 
 from .console import (
@@ -7,11 +14,87 @@ from .console import (
 )
 
 
-def validate_aws_credentials(profile: str) -> str:
+VALIDATION_CACHE_PATH = Path('~/.cache/redflag/aws-credentials.json')
+
+
+def _get_cache_key(profile: str) -> str:
+    """
+    Identifies the credentials of a profile, or of the environment, without storing them. The
+    session token is part of the key, temporary credentials keep their access key ID when renewed.
+    """
+    return sha256(
+        f'{profile}:{getenv("AWS_PROFILE")}:{getenv("AWS_ACCESS_KEY_ID")}:{getenv("AWS_SESSION_TOKEN")}'.encode('utf-8')
+    ).hexdigest()
+
+
+def _get_expiry(session: Session) -> float | None:
+    """Returns when temporary credentials expire, as a timestamp, or None if they don't."""
+    # Assumed roles and SSO get refreshable credentials, which keep their expiry time
+    expiry = getattr(session.get_credentials(), '_expiry_time', None)
+    if isinstance(expiry, datetime):
+        return expiry.timestamp()
+
+    try:
+        return datetime.fromisoformat(getenv('AWS_CREDENTIAL_EXPIRATION')).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def _read_cache() -> dict:
+    try:
+        return json.loads(VALIDATION_CACHE_PATH.expanduser().read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_cache(
+    key: str,
+    profile: str,
+    expires_at: float | None
+) -> None:
+    cache = _read_cache()
+    cache[key] = {
+        'profile': profile,
+        'validated_at': time(),
+        'expires_at': expires_at
+    }
+
+    # The cache only saves a few STS calls, it is not worth failing for
+    try:
+        path = VALIDATION_CACHE_PATH.expanduser()
+        path.parent.mkdir(
+            exist_ok=True,
+            parents=True
+        )
+        path.write_text(json.dumps(cache))
+    except OSError:
+        pass
+
+
+def validate_aws_credentials(
+    profile: str,
+    ttl: int = 0
+) -> str:
+    """
+    Validates the AWS credentials of a profile, falling back to the environment if the profile
+    does not exist. Returns the profile to use. Successful validations are cached for `ttl`
+    seconds, or until temporary credentials expire, so back-to-back runs skip STS.
+    """
+    key = _get_cache_key(profile or '')
+    if ttl:
+        cached = _read_cache().get(key)
+        if (
+            cached
+            and time() - cached.get('validated_at', 0) < ttl
+            and time() < (cached.get('expires_at') or float('inf'))
+        ):
+            pretty_print('AWS credentials validated (cached)', MessageType.SUCCESS)
+            return cached.get('profile')
+
     if profile:
         try:
-            sts = Session(profile_name=profile).client('sts')
-            sts.get_caller_identity()
+            session = Session(profile_name=profile)
+            session.client('sts').get_caller_identity()
         except ProfileNotFound as e:
             pretty_print(f'Failed to validate AWS credentials: {e}. Retrying using environment variables.', MessageType.WARN)
             profile = ''
@@ -21,11 +104,14 @@ def validate_aws_credentials(profile: str) -> str:
 
     if not profile:
         try:
-            sts = client('sts')
-            sts.get_caller_identity()
+            session = Session()
+            session.client('sts').get_caller_identity()
         except Exception as e:
             pretty_print(f'Failed to validate AWS credentials: {e}', MessageType.FATAL)
             exit(1)
 
+    if ttl:
+        _write_cache(key, profile, expires_at=_get_expiry(session))
+
     pretty_print('AWS credentials validated', MessageType.SUCCESS)
     return profile
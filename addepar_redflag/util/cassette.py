@@ -0,0 +1,331 @@
+import gzip
+import json
+from base64 import b64decode, b64encode
+from contextlib import contextmanager
+from hashlib import sha256
+from io import BytesIO
+from pathlib import Path
+from threading import Lock
+from typing import Generator
+
+from .console import (
+    pretty_print,
+    MessageType
+)
+
+
+CASSETTE_VERSION = 1
+
+# Headers that change on every request or no longer apply to the decoded body
+DROPPED_HEADERS = {
+    'content-encoding',
+    'content-length',
+    'date',
+    'set-cookie',
+    'transfer-encoding',
+    'x-amzn-requestid',
+    'x-github-request-id'
+}
+
+
+class CassetteMissError(Exception):
+    """A request that isn't in the cassette being replayed, which can't go to the network."""
+
+
+def _get_key(
+    method: str,
+    url: str,
+    body
+) -> str:
+    """Identifies a request by its method, URL and body. Credentials in headers are never stored."""
+    key = f'{method.upper()} {url}'
+    if body:
+        if not isinstance(body, bytes):
+            body = str(body).encode('utf-8')
+        key = f'{key} {sha256(body).hexdigest()[:16]}'
+
+    return key
+
+
+def _encode_body(body: bytes) -> dict:
+    try:
+        return {'body': body.decode('utf-8')}
+    except UnicodeDecodeError:
+        return {'body_base64': b64encode(body).decode('ascii')}
+
+
+def _decode_body(interaction: dict) -> bytes:
+    if 'body_base64' in interaction:
+        return b64decode(interaction.get('body_base64'))
+
+    return interaction.get('body', '').encode('utf-8')
+
+
+def _filter_headers(headers) -> dict:
+    return {
+        key: value
+        for key, value in headers.items()
+        if key.lower() not in DROPPED_HEADERS
+    }
+
+
+class Cassette:
+    """
+    Records the responses of every GitHub, Jira and Bedrock request of a run, and replays them in
+    a later run. GitHub and Jira requests are intercepted in `requests`, which PyGithub and the
+    Jira client are built on, and Bedrock calls through botocore events, before they are signed.
+    Responses to the same request are replayed in the order they were recorded.
+    """
+    def __init__(self):
+        self.__lock = Lock()
+        self.enabled = False
+        self.__recorded = None
+        self.__replayed = {}
+        self.__positions = {}
+        self.__passthrough = ()
+        self.__send = None
+
+    def start(
+        self,
+        record: str | None = None,
+        replay: str | None = None,
+        passthrough: tuple = ()
+    ) -> None:
+        """
+        Starts recording to `record`, replaying from `replay`, or both, in which case the requests
+        missing from `replay` go to the network and the new cassette has every request. Requests to
+        URLs starting with one of `passthrough`, e.g. span exports, are neither recorded nor replayed.
+        """
+        import requests
+
+        self.__replayed = self.read(replay) if replay else {}
+        self.__recorded = {} if record else None
+        self.__positions = {}
+        self.__passthrough = tuple(passthrough)
+
+        self.__send = requests.Session.send
+        cassette = self
+
+        def send(session, request, **kwargs):
+            return cassette.send(session, request, **kwargs)
+
+        requests.Session.send = send
+        self.enabled = True
+
+    def stop(self, record: str | None = None) -> None:
+        import requests
+
+        if self.__send:
+            requests.Session.send = self.__send
+            self.__send = None
+        self.enabled = False
+
+        if record and self.__recorded is not None:
+            self.write(record)
+
+    def read(self, path: str) -> dict:
+        path = Path(path).expanduser()
+        try:
+            opener = gzip.open if path.suffix == '.gz' else open
+            with opener(path, 'rt') as f:
+                cassette = json.load(f)
+        except (OSError, ValueError) as e:
+            pretty_print(
+                f'Failed to read the cassette {path}: {e}',
+                MessageType.FATAL
+            )
+            exit(1)
+
+        if cassette.get('version') != CASSETTE_VERSION:
+            pretty_print(
+                f'Unsupported cassette version {cassette.get("version")} in {path}',
+                MessageType.FATAL
+            )
+            exit(1)
+
+        return cassette.get('interactions')
+
+    def write(self, path: str) -> None:
+        """Writes the recorded interactions, gzipped if the path ends with `.gz`."""
+        path = Path(path).expanduser()
+        path.parent.mkdir(
+            exist_ok=True,
+            parents=True
+        )
+
+        with self.__lock:
+            cassette = {
+                'version': CASSETTE_VERSION,
+                'interactions': dict(sorted(self.__recorded.items()))
+            }
+
+        opener = gzip.open if path.suffix == '.gz' else open
+        with opener(path, 'wt') as f:
+            json.dump(
+                cassette,
+                f,
+                separators=(',', ':'),
+                default=str
+            )
+
+        pretty_print(
+            f'Recorded {sum(len(responses) for responses in cassette["interactions"].values())} responses to {path}',
+            MessageType.SUCCESS
+        )
+
+    def __replay(self, key: str) -> dict | None:
+        """Returns the next recorded response to a request, the last one once they are all used."""
+        with self.__lock:
+            responses = self.__replayed.get(key)
+            if not responses:
+                return None
+
+            position = self.__positions.get(key, 0)
+            self.__positions[key] = position + 1
+            return responses[min(position, len(responses) - 1)]
+
+    def __record(
+        self,
+        key: str,
+        interaction: dict
+    ) -> None:
+        if self.__recorded is None:
+            return
+
+        with self.__lock:
+            self.__recorded.setdefault(key, []).append(interaction)
+
+    def send(
+        self,
+        session,
+        request,
+        **kwargs
+    ):
+        """Replaces `requests.Session.send` while the cassette is started."""
+        from requests import Response
+        from requests.structures import CaseInsensitiveDict
+        from requests.utils import get_encoding_from_headers
+
+        if self.__passthrough and request.url.startswith(self.__passthrough):
+            return self.__send(session, request, **kwargs)
+
+        key = _get_key(request.method, request.url, request.body)
+        interaction = self.__replay(key)
+        if interaction:
+            response = Response()
+            response.status_code = interaction.get('status')
+            response.reason = interaction.get('reason')
+            response.headers = CaseInsensitiveDict(interaction.get('headers'))
+            response.encoding = get_encoding_from_headers(response.headers)
+            response.url = request.url
+            response.request = request
+            response._content = _decode_body(interaction)
+            response._content_consumed = True
+        elif self.__recorded is None:
+            raise CassetteMissError(f'No recorded response to {key}')
+        else:
+            response = self.__send(session, request, **kwargs)
+
+        self.__record(key, {
+            'status': response.status_code,
+            'reason': response.reason,
+            'headers': _filter_headers(response.headers),
+            **_encode_body(response.content)
+        })
+
+        return response
+
+    def before_bedrock_call(
+        self,
+        params: dict,
+        context: dict,
+        **kwargs
+    ):
+        """Replays a Bedrock call, registered on the `before-call` event of the client."""
+        if not self.enabled:
+            return None
+
+        from botocore.awsrequest import AWSResponse, HeadersDict
+        from botocore.response import StreamingBody
+
+        key = _get_key(params.get('method'), params.get('url'), params.get('body'))
+        context['cassette_key'] = key
+
+        interaction = self.__replay(key)
+        if not interaction:
+            if self.__recorded is None:
+                raise CassetteMissError(f'No recorded response to {key}')
+            return None
+
+        body = _decode_body(interaction)
+        headers = HeadersDict(interaction.get('headers'))
+        http = AWSResponse(
+            url=params.get('url'),
+            status_code=interaction.get('status'),
+            headers=headers,
+            raw=BytesIO(body)
+        )
+        parsed = dict(interaction.get('parsed'))
+        parsed['ResponseMetadata'] = {
+            **parsed.get('ResponseMetadata', {}),
+            'HTTPStatusCode': interaction.get('status'),
+            'HTTPHeaders': dict(headers)
+        }
+        if 'body' in interaction or 'body_base64' in interaction:
+            parsed['body'] = StreamingBody(BytesIO(body), len(body))
+
+        return http, parsed
+
+    def after_bedrock_call(
+        self,
+        http_response=None,
+        parsed=None,
+        context=None,
+        **kwargs
+    ) -> None:
+        """Records a Bedrock call, registered on the `after-call` event of the client."""
+        if not self.enabled or self.__recorded is None or http_response is None:
+            return
+
+        from botocore.response import StreamingBody
+
+        interaction = {
+            'status': http_response.status_code,
+            'headers': _filter_headers(http_response.headers),
+            'parsed': {
+                key: value
+                for key, value in parsed.items()
+                if key != 'body'
+            }
+        }
+        interaction['parsed']['ResponseMetadata'] = {
+            key: value
+            for key, value in parsed.get('ResponseMetadata', {}).items()
+            if key not in ('HTTPHeaders', 'HTTPStatusCode', 'RequestId')
+        }
+
+        # The body can only be read once, it is put back for LangChain to parse
+        if hasattr(parsed.get('body'), 'read'):
+            body = parsed.get('body').read()
+            parsed['body'] = StreamingBody(BytesIO(body), len(body))
+            interaction.update(_encode_body(body))
+
+        self.__record(context.get('cassette_key'), interaction)
+
+
+@contextmanager
+def use_cassette(
+    record: str | None = None,
+    replay: str | None = None,
+    passthrough: tuple = ()
+) -> Generator[None, None, None]:
+    """Records or replays the GitHub, Jira and Bedrock requests made inside, see `Cassette.start()`."""
+    CASSETTE.start(record, replay, passthrough)
+    try:
+        yield
+    finally:
+        CASSETTE.stop(record)
+
+
+# Shared by the CLI and the clients of a process, only records or replays once started
+CASSETTE = Cassette()
@@ -0,0 +1,140 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from github import GithubException, UnknownObjectException
+
+from ..models.structures import Result
+from .console import (
+    pretty_print,
+    MessageType
+)
+from .report import get_status
+
+
+COMMENT_MARKER = '<!-- RedFlag-Comment -->'
+COMMENT_HEADER = '${{\\textbf{\\color{red}\\Large{\\textsf{RedFlag :triangular_flag_on_post:}}}}}$'
+DEFAULT_COMMENT_MESSAGE = (
+    '**This PR has been flagged for review and appropriate approvers have been added.**\n'
+    'Please reach out if you have any questions.'
+)
+
+# Comments are deleted and updated with a few requests in flight, well below the secondary rate limits
+MAX_CONCURRENT_REQUESTS = 8
+
+
+def _split(value: str | list | None) -> list:
+    """Reviewers can be configured as a list or a comma-separated string."""
+    if isinstance(value, str):
+        value = value.split(',')
+
+    return [item.strip() for item in value or [] if item and item.strip()]
+
+
+def get_previous_comments(pull) -> list:
+    """Returns the comments previously posted by RedFlag on the PR, from every page, oldest first."""
+    return [
+        comment
+        for comment in pull.get_issue_comments()
+        if COMMENT_MARKER in (comment.body or '')
+    ]
+
+
+def get_comment_body(config: dict) -> str:
+    ci_config = config.get('ci') or {}
+
+    # Action inputs can only pass line breaks as "\n"
+    message = (ci_config.get('comment_message') or DEFAULT_COMMENT_MESSAGE).replace('\\n', '\n')
+
+    return f'{COMMENT_MARKER}\n{COMMENT_HEADER}\n\n{message}'
+
+
+def delete_comment(comment) -> None:
+    try:
+        comment.delete()
+    except UnknownObjectException:
+        # Already deleted, e.g. by a concurrent run on the same PR
+        pass
+
+
+def run_concurrently(calls: list) -> None:
+    """Runs independent GitHub API calls concurrently, raising the first error once all are done."""
+    if not calls:
+        return
+
+    with ThreadPoolExecutor(max_workers=min(len(calls), MAX_CONCURRENT_REQUESTS)) as executor:
+        futures = [executor.submit(call) for call in calls]
+
+    for future in futures:
+        future.result()
+
+
+def request_reviewers(
+    pull,
+    users: list,
+    teams: list
+) -> None:
+    for reviewers, kwargs, hint in (
+        (users, {'reviewers': users}, 'Check the users exist and have access to the repository.'),
+        (
+            teams,
+            {'team_reviewers': teams},
+            'Check the teams exist, have access to the repository, and that you are using a PAT '
+            'for authentication, not a workflow provided GITHUB_TOKEN.'
+        )
+    ):
+        if not reviewers:
+            continue
+
+        try:
+            pull.create_review_request(**kwargs)
+        except GithubException as e:
+            pretty_print(
+                f'Error adding reviewers "{", ".join(reviewers)}" to #{pull.number}. {hint} Error: {e}',
+                MessageType.WARN
+            )
+
+
+def publish(
+    pull,
+    in_scope: bool,
+    config: dict
+) -> None:
+    """
+    Replaces RedFlag's comment on the PR and, if the PR is in scope, comments and requests the
+    configured reviewers. With `ci.update_comment`, the existing comment is edited in place
+    instead of being deleted and posted again.
+    """
+    ci_config = config.get('ci') or {}
+    comments = get_previous_comments(pull)
+    body = get_comment_body(config)
+
+    calls = []
+    if in_scope:
+        if ci_config.get('update_comment') and comments:
+            current, comments = comments[0], comments[1:]
+            if current.body != body:
+                calls.append(partial(current.edit, body))
+        else:
+            calls.append(partial(pull.create_issue_comment, body))
+
+        calls.append(partial(
+            request_reviewers,
+            pull,
+            users=_split(ci_config.get('reviewer_users')),
+            teams=_split(ci_config.get('reviewer_teams'))
+        ))
+
+    calls.extend(partial(delete_comment, comment) for comment in comments)
+    run_concurrently(calls)
+
+
+def publish_result(
+    pull,
+    result: Result,
+    config: dict
+) -> bool:
+    """Publishes the result of a PR review. Returns True if the PR is in scope."""
+    in_scope = get_status(result) == 'in_scope'
+    publish(pull, in_scope, config)
+
+    return in_scope
@@ -1,15 +1,15 @@
 import argparse
 import asyncio
+import re
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from datetime import datetime
 from pathlib import Path
 from sys import exit
-from atlassian import Jira
 from dotenv import load_dotenv
-from github import Auth, Github
-from langchain.globals import set_debug
 
-from ..evaluate import do_evaluations
-from ..redflag import redflag
-from .aws import validate_aws_credentials
+# Heavy dependencies (LangChain, boto3, PyGithub, Jira) are imported once the arguments are
+# parsed and validated, by the command that needs them, so --help and config errors are instant
 from .config import (
     get_default_config,
     get_final_config
@@ -20,23 +20,86 @@ from .console import (
     pretty_print_traceback,
     MessageType
 )
+from .filters import CommitFilter
+from .metrics import METRICS
+from .cassette import use_cassette
+from .profiling import TIMELINE, profile_run
+from .tracing import trace_run
+from .report import FSYNC_POLICIES, REPORT_FORMATS
 
 
 def common_arguments(parser, default_config):
     parser.add_argument('--config', help='The path to the configuration file.')
     parser.add_argument('--debug-llm', action='store_true', dest='debug_llm', help=f'Flag to enable debug LLM output.')
-    parser.add_argument('--github-token', help='GitHub PAT to authenticate to the GitHub API.')
+    parser.add_argument('--otlp-traces', help='Record a trace per result, with a span per GitHub, Jira and LLM call, and export it in the OTLP JSON format to this file or to a collector URL, e.g. http://localhost:4318.')
+    parser.add_argument('--profile', action='store_true', dest='profile', help='Flag to write a CPU profile (Profile-*.prof) and a timeline of the tasks and external calls in the Chrome trace format (Trace-*.json) to the output directory.')
+    parser.add_argument('--record-cassette', help='Record the GitHub, Jira and Bedrock responses of the run to this file, gzipped if it ends with .gz.')
+    parser.add_argument('--replay-cassette', help='Serve the GitHub, Jira and Bedrock responses recorded in this file instead of calling them. Requests that were not recorded fail, unless --record-cassette is also set, in which case they go to the network and both are recorded.')
+    parser.add_argument('--github-token', help='GitHub PAT to authenticate to the GitHub API. Separate multiple PATs with commas.')
     parser.add_argument('--jira-user', help='Jira Username to authenticate to the Jira API.')
     parser.add_argument('--jira-token', help='Jira PAT to authenticate to the Jira API.')
     parser.add_argument('--jira-url', help='The URL for the Jira API.')
     parser.add_argument('--bedrock-region', help='The AWS Region to use for Bedrock. If not set, will fall back to AWS defaults.')
     parser.add_argument('--bedrock-profile', help='The AWS Profile to use for Bedrock. If not set, will fall back to AWS defaults.')
     parser.add_argument('--bedrock-model-id', help=f'The Bedrock model to use. (default: {default_config["bedrock"]["model_id"]})')
+    parser.add_argument('--bedrock-validation-ttl', type=int, help=f'Seconds to reuse a successful AWS credential validation across runs, 0 to always validate. (default: {default_config["bedrock"]["validation_ttl"]})')
     parser.add_argument('--no-progress-bar', action='store_false', dest='progress_bar', help='Flag to not display a progress bar.')
     parser.add_argument('--no-strip-html-comments', action='store_false', dest='strip_html_comments', help='Flag to not strip HTML comments from PR descriptions.')
 
 
+def _validate_bedrock(config: dict) -> str:
+    from .aws import validate_aws_credentials
+
+    with TIMELINE.span('aws_validation'):
+        return validate_aws_credentials(
+            config['bedrock']['profile'],
+            ttl=config['bedrock']['validation_ttl']
+        )
+
+
+def _get_github(config: dict):
+    """Instantiates the GitHub credential pool, shared by every mode."""
+    from .credentials import GitHubPool
+
+    try:
+        with TIMELINE.span('github_auth'):
+            return GitHubPool.from_config(config['github_token'])
+    except Exception as e:
+        pretty_print(
+            f'Failed to load GitHub credentials: {e}',
+            MessageType.FATAL
+        )
+        exit(1)
+
+
+def _get_jira(config: dict):
+    """Instantiates the Jira client and opens its session, failing fast on invalid credentials."""
+    if not config['jira']['url']:
+        return None
+
+    from atlassian import Jira
+
+    jira = Jira(
+        url=config['jira']['url'],
+        username=config['jira']['user'],
+        password=config['jira']['token']
+    )
+
+    try:
+        with TIMELINE.span('jira_auth'):
+            jira.myself()
+    except Exception as e:
+        pretty_print(
+            f'Failed to authenticate to Jira: {e}',
+            MessageType.FATAL
+        )
+        exit(1)
+
+    return jira
+
+
 def cli():
+    METRICS.start()
     pretty_print_header()
 
     # Load env var file, if present
@@ -51,7 +114,22 @@ def cli():
     parser.add_argument('--repo', help='The GitHub repository to test against.')
     parser.add_argument('--to', help='The target commit SHA, branch, or tag to compare against.')
     parser.add_argument('--from', help='The source commit SHA, branch, or tag to compare from.')
+    parser.add_argument('--github-graphql', action='store_true', dest='github_graphql', help='Flag to hydrate commits with their associated PRs using the GitHub GraphQL API.')
     parser.add_argument('--max-commits', type=int, help=f'The max number of commits to feed to the LLM. (default: {default_config["max_commits"]})')
+    parser.add_argument('--triage', action='store_true', dest='triage', help='Flag to triage PRs on metadata first and only fetch patches for PRs that may need a review.')
+    parser.add_argument('--group-by-ticket', action='store_true', dest='group_by_ticket', help='Flag to review all commits of the same Jira ticket as a single unit.')
+    parser.add_argument('--range-review', action='store_true', dest='range_review', help='Flag to review the net diff of the range once per component instead of commit by commit.')
+    parser.add_argument('--range-depth', type=int, help=f'The directory depth that defines a component in range review. (default: {default_config["range_depth"]})')
+    parser.add_argument('--local-repo', help='Path to a local clone used to compute the net diff in range review.')
+    parser.add_argument('--verdict-cache', help='Path to a SQLite file storing verdicts by patch fingerprint, reused across runs.')
+    parser.add_argument('--results-db', help='Path to a SQLite file storing every result. Commits already reviewed with the same prompts are not reviewed again.')
+    parser.add_argument('--track', action='store_true', dest='track', help='Flag to track the --to branch, reviewing only the commits since the last run and updating its cumulative report. Requires --results-db.')
+    parser.add_argument('--incremental-max-changes', type=int, help=f'When a PR was reviewed before, only review the new changes if they are up to this many lines or only touch reviewed files. Requires --results-db. (default: {default_config["incremental_max_changes"]})')
+    parser.add_argument('--similarity-threshold', type=float, help='Review PRs whose patches are at least this similar (0 to 1) once, through a representative. (default: off)')
+    parser.add_argument('--fsync', choices=FSYNC_POLICIES, help=f'When results streamed to the NDJSON file are synced to disk: after each result, at most once per second, or never. (default: {default_config["fsync"]})')
+    parser.add_argument('--report-format', choices=REPORT_FORMATS, help=f'Embed the results in the HTML report, or write them to gzipped shards loaded on demand, with the CSS/JS shared by the reports of the output directory. (default: {default_config["report_format"]})')
+    parser.add_argument('--shard-size', type=int, help=f'The number of results per shard of a sharded report. (default: {default_config["shard_size"]})')
+    parser.add_argument('--metrics-textfile', help='Also write the run metrics to this file in the Prometheus text format, e.g. for the node_exporter textfile collector.')
     parser.add_argument('--no-output-html', action='store_false', dest='output_html', help='Flag to not output the results as HTML.')
     parser.add_argument('--no-output-json',  action='store_false', dest='output_json', help='Flag to not output the results as JSON.')
     common_arguments(parser, default_config)
@@ -62,66 +140,171 @@ def cli():
     evaluate_parser.add_argument('--dataset', help=f'The path to a file containing the dataset to use for evaluation.')
     common_arguments(evaluate_parser, default_config)
 
+    # Render subparser
+    render_parser = subparsers.add_parser('render', help='Render reports from the results database, without the LLM.')
+    render_parser.add_argument('--results-db', help='Path to the SQLite file storing the results.')
+    render_parser.add_argument('--output-dir', help=f'The output directory for reports. (default: {default_config["output_dir"]})')
+    render_parser.add_argument('--repo', help='The GitHub repository to render results for.')
+    render_parser.add_argument('--to', help='The target commit SHA, branch, or tag of the range to render.')
+    render_parser.add_argument('--from', help='The source commit SHA, branch, or tag of the range to render.')
+    render_parser.add_argument('--local-repo', help='Path to a local clone used to list the commits of the range.')
+    render_parser.add_argument('--report-format', choices=REPORT_FORMATS, help=f'Embed the results in the HTML report, or write them to gzipped shards loaded on demand, with the CSS/JS shared by the reports of the output directory. (default: {default_config["report_format"]})')
+    render_parser.add_argument('--shard-size', type=int, help=f'The number of results per shard of a sharded report. (default: {default_config["shard_size"]})')
+    render_parser.add_argument('--no-output-html', action='store_false', dest='output_html', help='Flag to not output the results as HTML.')
+    render_parser.add_argument('--no-output-json',  action='store_false', dest='output_json', help='Flag to not output the results as JSON.')
+    common_arguments(render_parser, default_config)
+
+    # CI subparser
+    ci_parser = subparsers.add_parser('ci', help='Comment on a reviewed PR and request reviewers, from the reports of the review.')
+    ci_parser.add_argument('--repo', help='The GitHub repository of the PR.')
+    ci_parser.add_argument('--to', help='The number of the PR.')
+    ci_parser.add_argument('--output-dir', help=f'The directory with the reports of the review. (default: {default_config["output_dir"]})')
+    ci_parser.add_argument('--ci-comment-message', help='Message to add to the PR when flagged.')
+    ci_parser.add_argument('--ci-reviewer-users', help='Comma-separated string of users to request to review the PR.')
+    ci_parser.add_argument('--ci-reviewer-teams', help='Comma-separated string of teams to request to review the PR.')
+    ci_parser.add_argument('--ci-update-comment', action='store_true', default=None, help='Flag to edit the existing RedFlag comment instead of deleting it and commenting again.')
+    ci_parser.add_argument('--ci-report', help='The NDJSON results of the review to publish. (default: the latest review of the PR in the output directory)')
+    common_arguments(ci_parser, default_config)
+
+    # Serve subparser
+    serve_parser = subparsers.add_parser('serve', help='Run a webhook server reviewing PRs as they are opened or updated.')
+    serve_parser.add_argument('--serve-host', help=f'The address to listen on. (default: {default_config["serve"]["host"]})')
+    serve_parser.add_argument('--serve-port', type=int, help=f'The port to listen on. (default: {default_config["serve"]["port"]})')
+    serve_parser.add_argument('--serve-workers', type=int, help=f'The number of PRs reviewed concurrently. (default: {default_config["serve"]["workers"]})')
+    serve_parser.add_argument('--serve-queue', help=f'Path to the SQLite file of the review queue. (default: {default_config["serve"]["queue"]})')
+    serve_parser.add_argument('--serve-webhook-secret', help='The secret of the GitHub webhook, used to verify deliveries.')
+    serve_parser.add_argument('--ci-comment-message', help='Message to add to the PR when flagged.')
+    serve_parser.add_argument('--ci-reviewer-users', help='Comma-separated string of users to request to review flagged PRs.')
+    serve_parser.add_argument('--ci-reviewer-teams', help='Comma-separated string of teams to request to review flagged PRs.')
+    serve_parser.add_argument('--ci-update-comment', action='store_true', default=None, help='Flag to edit the existing RedFlag comment instead of deleting it and commenting again.')
+    serve_parser.add_argument('--verdict-cache', help='Path to a SQLite file storing verdicts by patch fingerprint, reused across runs.')
+    serve_parser.add_argument('--results-db', help='Path to a SQLite file storing every result.')
+    serve_parser.add_argument('--incremental-max-changes', type=int, help=f'When a PR was reviewed before, only review the new changes if they are up to this many lines or only touch reviewed files. (default: {default_config["incremental_max_changes"]})')
+    common_arguments(serve_parser, default_config)
+
     # Parse args and get final config dict
     args = parser.parse_args()
     final_config = get_final_config(args)
 
-    # Validate Bedrock configuration
-    final_config['bedrock']['profile'] = validate_aws_credentials(final_config['bedrock']['profile'])
-    
-    # Instantiate GitHub object
-    github_token = final_config['github_token']
-    auth = Auth.Token(github_token) if github_token else None
-    github = Github(
-        auth=auth,
-        per_page=100
-    )
-
-    # Instantiate jira object
-    jira = None
-    if final_config['jira']['url']:
-        jira_user = final_config['jira']['user']
-        jira_token = final_config['jira']['token']
-
-        if not (jira_user and jira_token):
-            pretty_print(
-                'Jira credentials are required for this operation. To skip the Jira integration, leave --jira-url blank.',
-                MessageType.FATAL
-            )
-            exit(1)
-            
-        jira = Jira(
-            url=final_config['jira']['url'],
-            username=jira_user,
-            password=jira_token
+    # Compile commit filters once, failing fast on invalid patterns
+    try:
+        commit_filter = CommitFilter.from_config(final_config['filter_commits'])
+    except re.error as e:
+        pretty_print(
+            f'Invalid commit filter pattern "{e.pattern}": {e}',
+            MessageType.FATAL
         )
+        exit(1)
 
-    # Debug LLM output
-    if final_config['debug_llm']:
-        set_debug(True)
+    # Rendering and publishing don't call the LLM or Jira
+    reviews = args.command not in ('render', 'ci')
 
-    # Run the desired command
-    try:
-        if args.command == 'eval':
-            dataset = Path(final_config['dataset'])
-            asyncio.run(do_evaluations(
-                github=github,
-                jira=jira,
-                dataset=dataset,
-                config=final_config
-            ))
-        else:
-            asyncio.run(redflag(
-                github=github,
-                jira=jira,
-                config=final_config
-            ))
-
-    # Unhandled exception handler
-    except Exception as e:
+    if reviews and final_config['jira']['url'] and not (final_config['jira']['user'] and final_config['jira']['token']):
         pretty_print(
-            f'An unhandled exception occurred: {e}',
+            'Jira credentials are required for this operation. To skip the Jira integration, leave --jira-url blank.',
             MessageType.FATAL
         )
-        pretty_print_traceback()
         exit(1)
+
+    # Profile the setup of the clients and the command, the profile and timeline are written on exit
+    profiler = nullcontext()
+    if final_config['profile']:
+        profiler = profile_run(
+            output_dir=final_config.get('output_dir') or '.',
+            name=f'{args.command or "review"}-{datetime.now().strftime("%Y-%m-%d-%H-%M-%S")}'
+        )
+
+    # Trace the calls made for each result, spans are exported as the run goes and on exit
+    tracer = nullcontext()
+    if final_config['otlp_traces']:
+        tracer = trace_run(
+            destination=final_config['otlp_traces'],
+            resource={
+                'service.name': 'redflag',
+                'redflag.command': args.command or 'review',
+                'redflag.repository': final_config.get('repo')
+            }
+        )
+
+    # Record or replay the GitHub, Jira and Bedrock requests, including those checking the credentials
+    cassette = nullcontext()
+    if final_config['record_cassette'] or final_config['replay_cassette']:
+        cassette = use_cassette(
+            record=final_config['record_cassette'],
+            replay=final_config['replay_cassette'],
+            passthrough=(final_config['otlp_traces'],) if final_config['otlp_traces'] else ()
+        )
+
+    with profiler, tracer, cassette:
+        # AWS validation, GitHub and Jira clients are independent round trips, set them up concurrently.
+        # Replays don't need AWS credentials.
+        offline = final_config['replay_cassette'] and not final_config['record_cassette']
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            aws_future = executor.submit(_validate_bedrock, final_config) if reviews and not offline else None
+            github_future = executor.submit(_get_github, final_config)
+            jira_future = executor.submit(_get_jira, final_config) if reviews else None
+
+        if aws_future:
+            final_config['bedrock']['profile'] = aws_future.result()
+        github = github_future.result()
+        jira = jira_future.result() if jira_future else None
+
+        # Debug LLM output
+        if final_config['debug_llm']:
+            from langchain.globals import set_debug
+
+            set_debug(True)
+
+        # Run the desired command
+        try:
+            if args.command == 'eval':
+                from ..evaluate import do_evaluations
+
+                dataset = Path(final_config['dataset'])
+                asyncio.run(do_evaluations(
+                    github=github,
+                    jira=jira,
+                    dataset=dataset,
+                    config=final_config
+                ))
+            elif args.command == 'serve':
+                from ..serve import serve
+
+                asyncio.run(serve(
+                    github=github,
+                    jira=jira,
+                    config=final_config
+                ))
+            elif args.command == 'ci':
+                from ..ci import ci
+
+                ci(
+                    github=github,
+                    config=final_config
+                )
+            elif args.command == 'render':
+                from ..render import render
+
+                render(
+                    github=github,
+                    config=final_config,
+                    commit_filter=commit_filter
+                )
+            else:
+                from ..redflag import redflag
+
+                asyncio.run(redflag(
+                    github=github,
+                    jira=jira,
+                    config=final_config,
+                    commit_filter=commit_filter
+                ))
+
+        # Unhandled exception handler
+        except Exception as e:
+            pretty_print(
+                f'An unhandled exception occurred: {e}',
+                MessageType.FATAL
+            )
+            pretty_print_traceback()
+            exit(1)
@@ -5,12 +5,14 @@ from pathlib import Path
 from .console import (
     pretty_print,
     pretty_print_config_table,
+    str2bool,
     MessageType
 )
-from .llm import (
+from .prompts import (
     DEFAULT_ROLE,
     DEFAULT_REVIEW_QUESTION,
-    DEFAULT_TEST_PLAN_QUESTION
+    DEFAULT_TEST_PLAN_QUESTION,
+    DEFAULT_TRIAGE_QUESTION
 )
 
 def _update_nested_dict(
@@ -50,8 +52,13 @@ def _update_nested_dict(
 def get_default_config():
     return {
         'github_token': None,
+        'github_graphql': False,
         'output_dir': 'results',
+        'fsync': 'interval',
+        'report_format': 'inline',
+        'shard_size': 100,
         'debug_llm': False,
+        'profile': False,
         'progress_bar': True,
         'output_html': True,
         'output_json': True,
@@ -62,6 +69,34 @@ def get_default_config():
         'from': None,
         'strip_html_comments': True,
         'strip_description_lines': None,
+        'triage': False,
+        'group_by_ticket': False,
+        'range_review': False,
+        'range_depth': 2,
+        'local_repo': None,
+        'verdict_cache': None,
+        'results_db': None,
+        'track': False,
+        'incremental_max_changes': 50,
+        'metrics_textfile': None,
+        'otlp_traces': None,
+        'record_cassette': None,
+        'replay_cassette': None,
+        'serve': {
+            'host': '127.0.0.1',
+            'port': 8080,
+            'workers': 2,
+            'queue': 'redflag-queue.db',
+            'webhook_secret': None
+        },
+        'ci': {
+            'comment_message': None,
+            'reviewer_users': None,
+            'reviewer_teams': None,
+            'update_comment': False,
+            'report': None
+        },
+        'similarity_threshold': 0,
         'jira': {
             'url': None,
             'user': None,
@@ -70,9 +105,14 @@ def get_default_config():
         'bedrock': {
             'region': 'us-west-2',
             'profile': None,
-            'model_id': 'anthropic.claude-3-sonnet-20240229-v1:0'
+            'model_id': 'anthropic.claude-3-sonnet-20240229-v1:0',
+            'validation_ttl': 900
         },
         'prompts': {
+            'triage': {
+                'role': DEFAULT_ROLE,
+                'question': DEFAULT_TRIAGE_QUESTION,
+            },
             'review': {
                 'role': DEFAULT_ROLE,
                 'question': DEFAULT_REVIEW_QUESTION,
@@ -82,9 +122,18 @@ def get_default_config():
                 'question': DEFAULT_TEST_PLAN_QUESTION,
             }
         },
+        'batch_review': {
+            'max_prs': 0,
+            'max_tokens': 8000,
+            'max_pr_tokens': 1500
+        },
         'filter_commits': {
             'title': None,
-            'user': None
+            'user': None,
+            'path': None,
+            'min_changes': 0,
+            'max_changes': 0,
+            'max_files': 0
         }
     }
 
@@ -135,11 +184,43 @@ def get_final_config(cli_args):
     # Override current config with values from the environment variables
     env_overrides = {
         'github_token': getenv('RF_GITHUB_TOKEN'),
+        'github_graphql': str2bool(getenv('RF_GITHUB_GRAPHQL')) if getenv('RF_GITHUB_GRAPHQL') else None,
         'output_dir': getenv('RF_OUTPUT_DIR'),
+        'fsync': getenv('RF_FSYNC'),
+        'report_format': getenv('RF_REPORT_FORMAT'),
+        'shard_size': int(getenv('RF_SHARD_SIZE')) if getenv('RF_SHARD_SIZE') else None,
         'dataset': getenv('RF_DATASET'),
         'repo': getenv('RF_REPO'),
         'max_commits': int(getenv('RF_MAX_COMMITS')) if getenv('RF_MAX_COMMITS') else None,
         'to': getenv('RF_TO'),
+        'triage': str2bool(getenv('RF_TRIAGE')) if getenv('RF_TRIAGE') else None,
+        'group_by_ticket': str2bool(getenv('RF_GROUP_BY_TICKET')) if getenv('RF_GROUP_BY_TICKET') else None,
+        'range_review': str2bool(getenv('RF_RANGE_REVIEW')) if getenv('RF_RANGE_REVIEW') else None,
+        'range_depth': int(getenv('RF_RANGE_DEPTH')) if getenv('RF_RANGE_DEPTH') else None,
+        'local_repo': getenv('RF_LOCAL_REPO'),
+        'verdict_cache': getenv('RF_VERDICT_CACHE'),
+        'results_db': getenv('RF_RESULTS_DB'),
+        'track': str2bool(getenv('RF_TRACK')) if getenv('RF_TRACK') else None,
+        'incremental_max_changes': int(getenv('RF_INCREMENTAL_MAX_CHANGES')) if getenv('RF_INCREMENTAL_MAX_CHANGES') else None,
+        'metrics_textfile': getenv('RF_METRICS_TEXTFILE'),
+        'otlp_traces': getenv('RF_OTLP_TRACES'),
+        'record_cassette': getenv('RF_RECORD_CASSETTE'),
+        'replay_cassette': getenv('RF_REPLAY_CASSETTE'),
+        'serve': {
+            'host': getenv('RF_SERVE_HOST'),
+            'port': int(getenv('RF_SERVE_PORT')) if getenv('RF_SERVE_PORT') else None,
+            'workers': int(getenv('RF_SERVE_WORKERS')) if getenv('RF_SERVE_WORKERS') else None,
+            'queue': getenv('RF_SERVE_QUEUE'),
+            'webhook_secret': getenv('RF_WEBHOOK_SECRET')
+        },
+        'ci': {
+            'comment_message': getenv('RF_CI_COMMENT_MESSAGE'),
+            'reviewer_users': getenv('RF_CI_REVIEWER_USERS'),
+            'reviewer_teams': getenv('RF_CI_REVIEWER_TEAMS'),
+            'update_comment': str2bool(getenv('RF_CI_UPDATE_COMMENT')) if getenv('RF_CI_UPDATE_COMMENT') else None,
+            'report': getenv('RF_CI_REPORT')
+        },
+        'similarity_threshold': float(getenv('RF_SIMILARITY_THRESHOLD')) if getenv('RF_SIMILARITY_THRESHOLD') else None,
         'from': getenv('RF_FROM'),
         'jira': {
             'url': getenv('RF_JIRA_URL'),
@@ -149,7 +230,8 @@ def get_final_config(cli_args):
         'bedrock': {
             'region': getenv('RF_BEDROCK_REGION'),
             'profile': getenv('RF_BEDROCK_PROFILE'),
-            'model_id': getenv('RF_BEDROCK_MODEL_ID')
+            'model_id': getenv('RF_BEDROCK_MODEL_ID'),
+            'validation_ttl': int(getenv('RF_BEDROCK_VALIDATION_TTL')) if getenv('RF_BEDROCK_VALIDATION_TTL') else None
         }
     }
 
@@ -163,7 +245,7 @@ def get_final_config(cli_args):
     
     # Override current config with values from the CLI args
     cli_dict = dict()
-    nested_keys = ['jira', 'bedrock']
+    nested_keys = ['jira', 'bedrock', 'serve', 'ci']
     default_config = get_default_config()
     for key, value in vars(cli_args).items():
         if value is not None:
@@ -204,8 +286,20 @@ def _validate_config(command, config):
     derived from multiple sources they may not be specified through the CLI."""
     required = [('github_token', 'GitHub PAT'), ('bedrock.model_id', 'Bedrock Model ID'), ('bedrock.region', 'Bedrock Region')]
     
+    # "Render" mode reads the results database and doesn't call the LLM
+    if command == 'render':
+        required = [('repo', 'Repository'), ('results_db', 'Results Database')]
+
+    # "CI" mode publishes the reports of a PR review and doesn't call the LLM
+    elif command == 'ci':
+        required = [('github_token', 'GitHub PAT'), ('repo', 'Repository'), ('to', 'To')]
+
+    # "Serve" mode gets the repository and PR from each webhook
+    elif command == 'serve':
+        pass
+
     # "Eval" mode
-    if command == 'eval':
+    elif command == 'eval':
         required.extend([('dataset', 'Dataset')])
 
     # Default mode
@@ -89,7 +89,7 @@ def pretty_print_config_table(
     table.add_column("Value")
     table.add_column("Source")
 
-    secret_keys = ["github_token", "jira.token"]
+    secret_keys = ["github_token", "jira.token", "serve.webhook_secret"]
     hidden_items = ["command"]
 
     def add_row(table, key, value, parent_key = None):
@@ -154,3 +154,22 @@ def pretty_print_dict_as_table(
         add_row(table, key, value, '')
 
     rprint(table)
+
+
+def pretty_print_results_table(
+    results: list,
+    title: str = "In Scope"
+):
+    table = Table(title=title, show_lines=True)
+    table.add_column("PR", style="cyan")
+    table.add_column("Reasoning")
+    table.add_column("Test Plan")
+
+    for result in results:
+        table.add_row(
+            (result.get("pr") or {}).get("title") or "-",
+            (result.get("review") or {}).get("reasoning") or "-",
+            (result.get("test_plan") or {}).get("test_plan") or "-"
+        )
+
+    rprint(table)
@@ -0,0 +1,206 @@
+from math import inf
+from pathlib import Path
+from threading import Lock
+from time import time, sleep
+
+from github import Auth, Github
+
+from .console import (
+    pretty_print,
+    MessageType
+)
+
+
+class GitHubCredential:
+    """A single PAT or GitHub App installation, with its own client and rate limit tracking."""
+    def __init__(
+        self,
+        name: str,
+        auth
+    ):
+        self.name = name
+        self.client = Github(
+            auth=auth,
+            per_page=100
+        )
+        self.remaining = None
+        self.reset = 0
+        self.requests = 0
+        self.__auth = auth
+
+    @property
+    def token(self) -> str:
+        # App installation tokens are refreshed by PyGithub when they are about to expire
+        return self.__auth.token if self.__auth else None
+
+    @property
+    def available(self) -> bool:
+        return self.remaining is None or self.remaining > 0 or time() >= self.reset
+
+    def update(
+        self,
+        headers: dict
+    ) -> None:
+        """Updates the quota from the headers of a raw REST or GraphQL response."""
+        remaining = headers.get('X-RateLimit-Remaining')
+        reset = headers.get('X-RateLimit-Reset')
+
+        if remaining is not None:
+            self.remaining = int(remaining)
+        if reset:
+            self.reset = int(reset)
+
+    def sync(self) -> None:
+        """
+        Syncs the quota with the latest response seen by the PyGithub client. Reads the requester
+        rather than `Github.rate_limiting`, which requests /rate_limit when the client has made no
+        request yet, and skips such clients.
+        """
+        remaining, limit = self.client.requester.rate_limiting
+        reset = self.client.requester.rate_limiting_resettime
+        if limit < 0 or not reset:
+            return
+
+        # Both sources share the same quota. A later reset starts a new window, within the same
+        # window the lowest value is the latest. Values from an earlier window are stale.
+        if reset > self.reset:
+            self.remaining = remaining
+            self.reset = reset
+        elif reset == self.reset and (self.remaining is None or remaining < self.remaining):
+            self.remaining = remaining
+
+
+class PooledRepository:
+    """
+    A repository whose API calls each go through the credential with the most remaining quota,
+    e.g. `compare()`, `get_pull()` and `get_commit()`. The objects a call returns, such as
+    paginated lists, keep the credential that fetched them.
+    """
+    def __init__(
+        self,
+        pool: 'GitHubPool',
+        full_name: str,
+        repository
+    ):
+        self.__pool = pool
+        self.__full_name = full_name
+        self.__repository = repository
+
+    def __getattr__(
+        self,
+        name: str
+    ):
+        attribute = getattr(self.__repository, name)
+        if not callable(attribute):
+            return attribute
+
+        def call(*args, **kwargs):
+            repository = self.__pool.client.get_repo(self.__full_name, lazy=True)
+            return getattr(repository, name)(*args, **kwargs)
+
+        return call
+
+
+class GitHubPool:
+    """
+    Rotates GitHub API requests across several credentials, always picking the one with the most
+    remaining quota. Exposes `get_repo` so it can be used in place of a `Github` client.
+    """
+    def __init__(
+        self,
+        credentials: list[GitHubCredential]
+    ):
+        self.credentials = credentials
+        self.__lock = Lock()
+
+    @classmethod
+    def from_config(
+        cls,
+        token_config: str | list | dict
+    ) -> 'GitHubPool':
+        """
+        Builds a pool from `github_token`, which can be a PAT, a comma-separated string of PATs,
+        or a list of PATs and GitHub App installations (`app_id`, `installation_id` and either
+        `private_key` or `private_key_path`).
+        """
+        if isinstance(token_config, str):
+            token_config = token_config.split(',')
+        elif isinstance(token_config, dict):
+            token_config = [token_config]
+
+        credentials = []
+        for index, item in enumerate(token_config or []):
+            if isinstance(item, dict):
+                private_key = item.get('private_key')
+                if not private_key and item.get('private_key_path'):
+                    private_key = Path(item.get('private_key_path')).expanduser().read_text()
+
+                app_auth = Auth.AppAuth(
+                    app_id=item.get('app_id'),
+                    private_key=private_key
+                )
+                credentials.append(GitHubCredential(
+                    name=f'App {item.get("app_id")}/{item.get("installation_id")}',
+                    auth=app_auth.get_installation_auth(int(item.get('installation_id')))
+                ))
+            elif item and item.strip():
+                credentials.append(GitHubCredential(
+                    name=f'PAT {index + 1}',
+                    auth=Auth.Token(item.strip())
+                ))
+
+        if not credentials:
+            # Unauthenticated access, subject to the lowest rate limits
+            credentials.append(GitHubCredential(
+                name='Anonymous',
+                auth=None
+            ))
+
+        return cls(credentials)
+
+    def acquire(self) -> GitHubCredential:
+        """Returns the credential with the most remaining quota, waiting if all are exhausted."""
+        while True:
+            for credential in self.credentials:
+                credential.sync()
+
+            with self.__lock:
+                available = [credential for credential in self.credentials if credential.available]
+                if available:
+                    credential = max(
+                        available,
+                        key=lambda c: (c.remaining if c.remaining is not None else inf, -c.requests)
+                    )
+                    credential.requests += 1
+                    return credential
+
+                retry_at = min(credential.reset for credential in self.credentials)
+
+            pretty_print(
+                f'GitHub rate limit on all {len(self.credentials)} credentials, retrying at [{retry_at}]',
+                MessageType.WARN
+            )
+
+            while time() < retry_at:
+                sleep(1)
+
+    @property
+    def client(self) -> Github:
+        return self.acquire().client
+
+    def get_repo(
+        self,
+        full_name: str,
+        lazy: bool = False
+    ) -> PooledRepository:
+        return PooledRepository(
+            self,
+            full_name,
+            repository=self.client.get_repo(full_name, lazy=lazy)
+        )
+
+    def summary(self) -> str:
+        return ', '.join(
+            f'{credential.name}: {credential.requests} requests, {credential.remaining} remaining'
+            for credential in self.credentials
+        )
@@ -0,0 +1,170 @@
+import re
+from collections import Counter
+from fnmatch import fnmatch
+from typing import Generator, Iterable
+
+
+FILTER_RULES = ['title', 'user', 'path', 'size', 'empty']
+
+
+class CommitFilter:
+    """
+    Commit filters compiled once from the `filter_commits` configuration.
+
+    Title and user rules only need the commit listing, so they are applied with `filter_commits()`
+    before any per-commit request is made. Path and size rules need the changed files and are
+    applied with `matches_files()`.
+    """
+    def __init__(
+        self,
+        titles: list = None,
+        users: list = None,
+        paths: list = None,
+        min_changes: int = 0,
+        max_changes: int = 0,
+        max_files: int = 0
+    ):
+        # Compiled one by one rather than joined into a single regex, so inline flags such as `(?i)`
+        # and numbered backreferences keep working, and a bad pattern is reported on its own
+        self.title_patterns = tuple(re.compile(title) for title in titles or [] if title)
+        self.users = frozenset(user.lower() for user in users or [] if user)
+        self.paths = tuple(path for path in paths or [] if path)
+        self.min_changes = min_changes or 0
+        self.max_changes = max_changes or 0
+        self.max_files = max_files or 0
+        self.counts = Counter()
+
+    @classmethod
+    def from_config(
+        cls,
+        config: dict | None
+    ) -> 'CommitFilter':
+        config = config or {}
+
+        # `titles` and `users` are accepted for backwards compatibility
+        return cls(
+            titles=(config.get('title') or []) + (config.get('titles') or []),
+            users=(config.get('user') or []) + (config.get('users') or []),
+            paths=config.get('path'),
+            min_changes=config.get('min_changes'),
+            max_changes=config.get('max_changes'),
+            max_files=config.get('max_files')
+        )
+
+    def matches_title(
+        self,
+        title: str
+    ) -> bool:
+        return any(pattern.match(title) for pattern in self.title_patterns)
+
+    def matches_user(
+        self,
+        commit: dict
+    ) -> bool:
+        if not self.users:
+            return False
+
+        email = ((commit.get('commit') or {}).get('author') or {}).get('email')
+        login = (commit.get('author') or {}).get('login')
+
+        return any(
+            identity and identity.lower() in self.users
+            for identity in (email, login)
+        )
+
+    def matches_metadata(
+        self,
+        title: str,
+        commit: dict
+    ) -> bool:
+        """Returns True if the commit should be kept based on the commit listing alone."""
+        if self.matches_title(title):
+            self.counts['title'] += 1
+            return False
+
+        if self.matches_user(commit):
+            self.counts['user'] += 1
+            return False
+
+        return True
+
+    def matches_size(
+        self,
+        additions: int,
+        deletions: int,
+        changed_files: int
+    ) -> bool:
+        """Returns True if the commit is within the configured size limits."""
+        changes = (additions or 0) + (deletions or 0)
+
+        if self.min_changes and changes < self.min_changes:
+            return False
+
+        if self.max_changes and changes > self.max_changes:
+            return False
+
+        if self.max_files and (changed_files or 0) > self.max_files:
+            return False
+
+        return True
+
+    def matches_files(
+        self,
+        files: Iterable
+    ) -> bool:
+        """Returns True if the commit should be kept based on its changed files."""
+        # PyGithub pages the files of a commit lazily, the size rules need their count
+        files = list(files)
+        if not files:
+            self.counts['empty'] += 1
+            return False
+
+        if self.paths and all(
+            any(fnmatch(file.filename, path) for path in self.paths)
+            for file in files
+        ):
+            self.counts['path'] += 1
+            return False
+
+        if not self.matches_size(
+            additions=sum(file.additions for file in files),
+            deletions=sum(file.deletions for file in files),
+            changed_files=len(files)
+        ):
+            self.counts['size'] += 1
+            return False
+
+        return True
+
+    def filter_commits(
+        self,
+        commits: Iterable[dict]
+    ) -> Generator[tuple[str, str, dict], None, None]:
+        """Yields (title, message, commit) for every listed commit that passes the metadata rules."""
+        for commit in commits:
+            lines = commit \
+                .get('commit') \
+                .get('message') \
+                .splitlines() or ['']
+
+            # Commit title is always the first line. The text, if it exists, starts from the 3rd
+            title, message = lines[0], '\n'.join(lines[2:])
+
+            if self.matches_metadata(title, commit):
+                yield title, message, commit
+
+    @property
+    def needs_files(self) -> bool:
+        """True if path or size rules are configured, which can only be applied to the changed files."""
+        return bool(self.paths or self.min_changes or self.max_changes or self.max_files)
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts.values())
+
+    def summary(self) -> str:
+        return ', '.join(
+            f'{rule}: {self.counts[rule]}'
+            for rule in FILTER_RULES
+            if self.counts[rule]
+        )
@@ -1,8 +1,7 @@
-import re
-from requests import get
+from concurrent.futures import ThreadPoolExecutor
+from requests import request
 from requests.exceptions import HTTPError
-from time import time, sleep
-from typing import Generator
+from typing import Generator, Iterable
 
 from github import GithubException, UnknownObjectException
 
@@ -10,44 +9,79 @@ from .console import (
     pretty_print,
     MessageType
 )
+from .credentials import GitHubPool
+
+
+GITHUB_GRAPHQL_URL = 'https://api.github.com/graphql'
+# GitHub caps the number of nodes a single GraphQL query may request
+GRAPHQL_MAX_COMMITS = 100
+GRAPHQL_COMMIT_FRAGMENT = '''
+fragment CommitFields on Commit {
+  oid
+  message
+  additions
+  deletions
+  changedFilesIfAvailable
+  author { name email user { login } }
+  associatedPullRequests(first: 1) {
+    nodes {
+      number
+      title
+      body
+      url
+      labels(first: 20) { nodes { name } }
+      mergeCommit { oid }%s
+    }
+  }
+}'''
+# Changed files of the associated PR, without patches
+GRAPHQL_PR_FILES = '''
+      changedFiles
+      files(first: 100) { nodes { path additions deletions changeType } }'''
+
+
+class GitHubRequestError(Exception):
+    """A GitHub REST or GraphQL request that failed for another reason than the rate limit."""
 
 
 def _github_request(
     url: str,
-    token: str | None = None,
+    credentials: GitHubPool,
     params=None,
-    accepted_codes=[]
+    accepted_codes=[],
+    method: str = 'GET',
+    json: dict | None = None
 ):
-    """Returns response for GET request to GitHub."""
-
-    headers = {
-        'Accept': 'application/vnd.github.v3+json'
-    }
-    if token:
-        headers.update({'Authorization': f'token {token}'})
+    """Returns response for a request to GitHub, using the credential with the most remaining quota."""
 
     while True:
+        credential = credentials.acquire()
+        headers = {
+            'Accept': 'application/vnd.github.v3+json'
+        }
+        if credential.token:
+            headers.update({'Authorization': f'token {credential.token}'})
+
         try:
-            response = get(
+            response = request(
+                method,
                 url,
                 params=params,
-                headers=headers
+                headers=headers,
+                json=json
             )
+            credential.update(response.headers)
 
             if (
-                response.status_code == 403
-                and response.headers['X-RateLimit-Remaining'] == '0'
+                response.status_code in (403, 429)
+                and response.headers.get('X-RateLimit-Remaining') == '0'
             ):
-                retry_at = int(response.headers['X-RateLimit-Reset'])
-
+                # The pool picks another credential, or waits for the earliest reset
                 pretty_print(
-                    f'GitHub rate limit, retrying at [{retry_at}]',
+                    f'GitHub rate limit for {credential.name}, reset at [{response.headers.get("X-RateLimit-Reset")}]',
                     MessageType.WARN
                 )
 
-                while time() < retry_at:
-                    sleep(1)
-
                 continue
 
             response.raise_for_status()
@@ -66,7 +100,7 @@ def _github_request(
                 f'Unexpected error occurred: {err}',
                 MessageType.WARN
             )
-        raise Exception('REST API request failed')
+        raise GitHubRequestError(f'GitHub request failed: {method} {url}')
 
 
 def get_pr_templates(
@@ -77,9 +111,9 @@ def get_pr_templates(
     # GitHub supports multiple templates within this directory in any of the locations
     TEMPLATE_DIRECTORY = 'PULL_REQUEST_TEMPLATE'
 
-    templates = []
-    for location in LOCATIONS:
-        try: 
+    def list_templates(location: str) -> list:
+        templates = []
+        try:
             for file in repository.get_contents(location):
                 path = f'{location}/{file.name}'
                 if file.name.lower() == FILE_NAME:
@@ -90,8 +124,16 @@ def get_pr_templates(
         except UnknownObjectException:
             pass
 
+        return templates
+
+    # Each location and template is a separate request, they are fetched concurrently
     try:
-        template_texts = [repository.get_contents(template).decoded_content.decode() for template in templates]
+        with ThreadPoolExecutor(max_workers=len(LOCATIONS)) as executor:
+            templates = [path for paths in executor.map(list_templates, LOCATIONS) for path in paths]
+            template_texts = list(executor.map(
+                lambda template: repository.get_contents(template).decoded_content.decode(),
+                templates
+            ))
     except GithubException as e:
         pretty_print(
             f'GitHub exception occurred: {e}',
@@ -103,11 +145,11 @@ def get_pr_templates(
 
 def get_commits_in_comparison(
     url: str,
-    token: str | None,
+    credentials: GitHubPool,
 ) -> Generator[dict, None, None]:
     results = _github_request(
         url=url,
-        token=token,
+        credentials=credentials,
         params={"page": 1, "per_page": 100}
     )
 
@@ -117,7 +159,7 @@ def get_commits_in_comparison(
     while 'next' in results.links.keys():
         results = _github_request(
             url=results.links['next']['url'],
-            token=token
+            credentials=credentials
         )
 
         for commit in results.json().get('commits'):
@@ -172,23 +214,161 @@ def matches_template_text(
         return False
 
 
-def filter_commit(
-    title: str,
-    commit: dict,
-    title_regexes: list = None,
-    users: list = None
-) -> bool:
-    if not title_regexes:
-        title_regexes = []
+def _chunks(
+    iterable: Iterable,
+    size: int
+) -> Generator[list, None, None]:
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
 
-    if not users:
-        users = []
+    if chunk:
+        yield chunk
 
-    for regex in title_regexes:
-        if re.match(regex, title):
-            return False
 
-    if commit.get('commit').get('author').get('email') in users:
-        return False
+def get_commit_metadata(
+    repository: str,
+    shas: list,
+    credentials: GitHubPool,
+    include_files: bool = False
+) -> dict:
+    """
+    Fetches commit metadata and the associated pull request for up to 100 commits in a single
+    GraphQL query. Returns a dictionary keyed by commit SHA.
+
+    With `include_files`, the changed files of the associated PR (name, status and line counts,
+    no patches) are included when the commit is the PR's merge or squash commit.
+    """
+    if not shas:
+        return {}
+
+    owner, name = repository.split('/', 1)
+    aliases = '\n'.join(
+        f'    c{index}: object(oid: "{sha}") {{ ...CommitFields }}'
+        for index, sha in enumerate(shas[:GRAPHQL_MAX_COMMITS])
+    )
+    query = (
+        'query($owner: String!, $name: String!) {\n'
+        '  repository(owner: $owner, name: $name) {\n'
+        f'{aliases}\n'
+        '  }\n'
+        '}\n'
+        f'{GRAPHQL_COMMIT_FRAGMENT % (GRAPHQL_PR_FILES if include_files else "")}'
+    )
+
+    response = _github_request(
+        url=GITHUB_GRAPHQL_URL,
+        credentials=credentials,
+        method='POST',
+        json={'query': query, 'variables': {'owner': owner, 'name': name}}
+    ).json()
+
+    if response.get('errors'):
+        pretty_print(
+            f'GitHub GraphQL returned errors: {response.get("errors")[0].get("message")}',
+            MessageType.WARN
+        )
+
+    nodes = ((response.get('data') or {}).get('repository') or {}).values()
+    metadata = {}
+    for node in nodes:
+        if not node:
+            continue
+
+        pull_requests = node.get('associatedPullRequests', {}).get('nodes') or []
+        pull_request = pull_requests[0] if pull_requests else None
+        author = node.get('author') or {}
+
+        # PR files only describe this commit if it's the PR's merge or squash commit, and
+        # only if the list isn't truncated
+        files = None
+        merge_commit = (pull_request.get('mergeCommit') or {}).get('oid') if pull_request else None
+        if pull_request and pull_request.get('files'):
+            file_nodes = pull_request.get('files').get('nodes') or []
+            if merge_commit == node.get('oid') and len(file_nodes) == pull_request.get('changedFiles'):
+                files = [
+                    {
+                        'filename': file.get('path'),
+                        'status': file.get('changeType', '').lower(),
+                        'additions': file.get('additions'),
+                        'deletions': file.get('deletions')
+                    }
+                    for file in file_nodes
+                ]
+
+        metadata[node.get('oid')] = {
+            'message': node.get('message'),
+            'author': {
+                'name': author.get('name'),
+                'email': author.get('email'),
+                'login': (author.get('user') or {}).get('login')
+            },
+            'additions': node.get('additions'),
+            'deletions': node.get('deletions'),
+            'changed_files': node.get('changedFilesIfAvailable'),
+            'files': files,
+            'pull_request': {
+                'number': pull_request.get('number'),
+                'title': pull_request.get('title'),
+                'body': pull_request.get('body'),
+                'url': pull_request.get('url'),
+                'labels': [label.get('name') for label in pull_request.get('labels', {}).get('nodes') or []],
+                'is_merge_commit': merge_commit == node.get('oid')
+            } if pull_request else None
+        }
+
+    return metadata
+
+
+def hydrate_commits(
+    commits: Iterable[tuple[str, str, dict]],
+    repository: str,
+    credentials: GitHubPool,
+    include_files: bool = False,
+    commit_filter=None
+) -> Generator[tuple[str, str, dict], None, None]:
+    """
+    Hydrates (title, message, commit) tuples with GraphQL metadata, 100 commits per query.
+    The metadata is stored under the `graphql` key of the commit. When the commit is the merge
+    or squash commit of a pull request, the PR title and body replace the commit title and
+    message, and the title rules of `commit_filter` are applied again to the PR title. Other
+    commits of the PR keep their own title and message.
+
+    Hydration is optional: if a query fails, the remaining commits are yielded without metadata,
+    as if GraphQL was disabled, and get their files from the REST API.
+    """
+    hydrate = True
+    for chunk in _chunks(commits, GRAPHQL_MAX_COMMITS):
+        metadata = {}
+        if hydrate:
+            try:
+                metadata = get_commit_metadata(
+                    repository=repository,
+                    shas=[commit.get('sha') for _, _, commit in chunk],
+                    credentials=credentials,
+                    include_files=include_files
+                )
+            except (GitHubRequestError, ValueError) as e:
+                pretty_print(
+                    f'GitHub GraphQL hydration failed, continuing without it: {e}',
+                    MessageType.WARN
+                )
+                hydrate = False
+
+        for title, message, commit in chunk:
+            commit_metadata = metadata.get(commit.get('sha'))
+            commit['graphql'] = commit_metadata
+
+            pull_request = commit_metadata.get('pull_request') if commit_metadata else None
+            if pull_request and pull_request.get('is_merge_commit'):
+                title = pull_request.get('title') or title
+                message = pull_request.get('body') or message
+
+                if commit_filter and commit_filter.matches_title(title):
+                    commit_filter.counts['title'] += 1
+                    continue
 
-    return True
+            yield title, message, commit
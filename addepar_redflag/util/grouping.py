@@ -0,0 +1,141 @@
+from ..models.structures import ChangedFile, PullRequest, Result
+from .jira import JIRA_REGEX
+
+
+def get_ticket_key(result: Result) -> str | None:
+    if result.ticket:
+        return result.ticket.id
+
+    match = JIRA_REGEX.search(result.pr.title or '')
+    return match.group(0) if match else None
+
+
+def merge_files(prs: list) -> list:
+    """Merges the changed files of several PRs, concatenating the patches of files changed more than once."""
+    merged = {}
+
+    for pr in prs:
+        for file in pr.files:
+            current = merged.get(file.filename)
+            if not current:
+                merged[file.filename] = ChangedFile(
+                    filename=file.filename,
+                    status=file.status,
+                    additions=file.additions,
+                    deletions=file.deletions,
+                    patch=file.patch
+                )
+                continue
+
+            patches = [patch for patch in (current.patch, file.patch) if patch]
+            merged[file.filename] = ChangedFile(
+                filename=file.filename,
+                status=file.status,
+                additions=current.additions + file.additions,
+                deletions=current.deletions + file.deletions,
+                patch='\n'.join(patches) if patches else None
+            )
+
+    return list(merged.values())
+
+
+def merge_results(
+    key: str,
+    members: list
+) -> Result:
+    """
+    Builds a single review unit for all commits of a Jira ticket. The unit has no SHA of its own,
+    it lists the commits it stands for, and its verdict is recorded for each of them.
+    """
+    prs = [member.pr for member in members]
+    labels = []
+    for pr in prs:
+        labels.extend(label for label in pr.labels if label not in labels)
+
+    pr = PullRequest(
+        repository=prs[0].repository,
+        title=f'{key}: {len(prs)} commits',
+        message='\n\n'.join(
+            f'{pr.title}\n{pr.message or ""}'.strip()
+            for pr in prs
+        ),
+        url=prs[0].url,
+        files=merge_files(prs),
+        labels=labels,
+        patches_loaded=all(pr.patches_loaded for pr in prs),
+        commits=[
+            {'sha': pr.sha, 'title': pr.title, 'url': pr.url}
+            for pr in prs
+        ]
+    )
+
+    return Result(
+        pr=pr,
+        ticket=next((member.ticket for member in members if member.ticket), None)
+    )
+
+
+def group_results_by_ticket(results: list) -> list[tuple[Result, list]]:
+    """
+    Clusters results by the Jira key in their title. Returns (unit, members) pairs, where the unit
+    is the result to review. Results without a key, or alone in their cluster, are their own unit.
+    """
+    clusters = {}
+    units = []
+
+    for result in results:
+        key = get_ticket_key(result)
+        if not key:
+            units.append((result, [result]))
+            continue
+
+        if key not in clusters:
+            clusters[key] = []
+            units.append((key, clusters[key]))
+        clusters[key].append(result)
+
+    return [
+        (unit, [unit]) if isinstance(unit, Result)
+        else (members[0], members) if len(members) == 1
+        else (merge_results(unit, members), members)
+        for unit, members in units
+    ]
+
+
+def group_results_by_fingerprint(results: list) -> list[tuple[Result, list]]:
+    """
+    Clusters results with identical patches, such as cherry-picks, backports and re-lands. Returns
+    (unit, members) pairs where the unit is the first result with that fingerprint.
+    """
+    clusters = {}
+    units = []
+
+    for result in results:
+        fingerprint = result.pr.fingerprint
+        if fingerprint in clusters:
+            clusters[fingerprint].append(result)
+            continue
+
+        members = [result]
+        if fingerprint:
+            clusters[fingerprint] = members
+        units.append((result, members))
+
+    return units
+
+
+def share_verdict(
+    unit: Result,
+    members: list,
+    decided_by: dict
+) -> None:
+    """Copies the verdict of a review unit to the results it stands for."""
+    for member in members:
+        if member is unit:
+            continue
+
+        for attribute in ('triage', 'review', 'test_plan'):
+            if hasattr(unit, attribute):
+                setattr(member, attribute, getattr(unit, attribute))
+
+        member.decided_by = decided_by
@@ -0,0 +1,38 @@
+from ..models.structures import ChangedFile, Result
+
+
+def get_incremental_files(
+    repository,
+    previous: Result,
+    head_sha: str,
+    max_changes: int
+) -> list | None:
+    """
+    Returns the files changed on a PR since its previous review, if the change is small enough to
+    only review it: up to `max_changes` changed lines, or only files the previous review covered.
+    Returns None when the PR needs a full review, which is always the case when the new changes
+    touch the files the previous review flagged, since its test plan has to cover them.
+    """
+    review = getattr(previous, 'review', None)
+    if not review:
+        return None
+
+    compare = repository.compare(previous.pr.sha, head_sha)
+
+    # A force push rewrites the history the previous verdict was based on
+    if compare.status != 'ahead':
+        return None
+
+    files = [ChangedFile.from_github(file) for file in compare.files]
+    if set(review.files) & {file.filename for file in files}:
+        return None
+
+    covered = set(previous.pr.file_names)
+
+    if all(file.filename in covered for file in files):
+        return files
+
+    if max_changes and sum(file.additions + file.deletions for file in files) <= max_changes:
+        return files
+
+    return None
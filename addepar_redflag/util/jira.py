@@ -8,6 +8,8 @@ from .console import (
     pretty_print,
     MessageType
 )
+from .metrics import METRICS
+from .tracing import SPAN_KIND_CLIENT, TRACER
 
 
 JIRA_REGEX = re.compile(r'[A-Z][A-Z]+-\d+')
@@ -17,22 +19,36 @@ def get_jira_ticket_from_pr_title(
     client,
     title: str,
     progress: Progress | None = None,
+    cache: dict | None = None
 ):
     # Try to fetch Jira ticket information from the PR title
     match = JIRA_REGEX.search(title)
 
     if match:
         jira_id = match.group(0)
+        TRACER.set_attributes(**{'jira.issue.key': jira_id})
+
+        # Commits of the same ticket only need one lookup
+        if cache is not None and jira_id in cache:
+            METRICS.count('jira_cache_hits')
+            TRACER.set_attributes(**{'redflag.cache_hit': True})
+            return cache[jira_id]
 
         # If there's a match, validate it exists
         try:
-            jira_ticket = client.get_issue(jira_id)
+            METRICS.count('jira_cache_misses')
+            with METRICS.stage('jira_lookup'), TRACER.span('jira.get_issue', kind=SPAN_KIND_CLIENT, **{'jira.issue.key': jira_id}):
+                jira_ticket = client.get_issue(jira_id)
 
-            return Ticket(
+            ticket = Ticket(
                 id=jira_id,
                 summary=jira_ticket.get('fields').get('summary'),
                 description=jira_ticket.get('fields').get('description')
             )
+            if cache is not None:
+                cache[jira_id] = ticket
+
+            return ticket
         except HTTPError:
             pretty_print(
                 'Failed to access Jira ticket.',
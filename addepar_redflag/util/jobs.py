@@ -0,0 +1,166 @@
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+from threading import Lock
+
+
+class Job:
+    """A queued review of a PR, at the head SHA of the webhook event that queued it."""
+    def __init__(
+        self,
+        id: int,
+        delivery: str,
+        repository: str,
+        number: int,
+        sha: str,
+        attempts: int
+    ):
+        self.id = id
+        self.delivery = delivery
+        self.repository = repository
+        self.number = number
+        self.sha = sha
+        self.attempts = attempts
+
+
+class JobQueue:
+    """
+    A durable queue of PR reviews backed by SQLite. Jobs survive restarts: jobs left running by a
+    previous process are queued again on startup. Only the latest job of a PR is reviewed, older
+    queued jobs of the same PR are superseded when it is claimed. A PR is reviewed by one worker at
+    a time, its new jobs wait until the running one is done.
+    """
+    def __init__(
+        self,
+        path: str
+    ):
+        path = Path(path).expanduser()
+        path.parent.mkdir(
+            exist_ok=True,
+            parents=True
+        )
+
+        # Shared by the HTTP server threads and the workers
+        self.__lock = Lock()
+        self.__connection = sqlite3.connect(
+            path,
+            check_same_thread=False,
+            isolation_level=None
+        )
+        self.__connection.executescript(
+            'PRAGMA journal_mode=WAL;'
+            'CREATE TABLE IF NOT EXISTS jobs ('
+            'id INTEGER PRIMARY KEY AUTOINCREMENT, '
+            'delivery TEXT UNIQUE, '
+            'repository TEXT NOT NULL, '
+            'number INTEGER NOT NULL, '
+            'sha TEXT, '
+            'status TEXT NOT NULL, '
+            'attempts INTEGER NOT NULL DEFAULT 0, '
+            'error TEXT, '
+            'created_at TEXT NOT NULL, '
+            'updated_at TEXT NOT NULL);'
+            'CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id);'
+        )
+
+    def __execute(
+        self,
+        query: str,
+        parameters: tuple = ()
+    ):
+        with self.__lock:
+            return self.__connection.execute(query, parameters)
+
+    def enqueue(
+        self,
+        delivery: str,
+        repository: str,
+        number: int,
+        sha: str
+    ) -> bool:
+        """Queues a review. Returns False if the delivery was already queued (GitHub redeliveries)."""
+        now = datetime.now().isoformat()
+        cursor = self.__execute(
+            'INSERT OR IGNORE INTO jobs (delivery, repository, number, sha, status, created_at, updated_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (delivery, repository, number, sha, 'queued', now, now)
+        )
+        return cursor.rowcount > 0
+
+    def recover(self) -> int:
+        """Queues jobs left running by a previous process again. Returns how many."""
+        return self.__execute(
+            'UPDATE jobs SET status = ?, updated_at = ? WHERE status = ?',
+            ('queued', datetime.now().isoformat(), 'running')
+        ).rowcount
+
+    def claim(self) -> Job | None:
+        """
+        Claims the oldest queued job of a PR that isn't being reviewed, superseding older queued
+        jobs of the same PR.
+        """
+        with self.__lock:
+            self.__connection.execute('BEGIN IMMEDIATE')
+            try:
+                row = self.__connection.execute(
+                    'SELECT repository, number FROM jobs AS queued WHERE status = ? AND NOT EXISTS ('
+                    'SELECT 1 FROM jobs AS running WHERE running.status = ? '
+                    'AND running.repository = queued.repository AND running.number = queued.number) '
+                    'ORDER BY id LIMIT 1',
+                    ('queued', 'running')
+                ).fetchone()
+
+                if not row:
+                    self.__connection.execute('COMMIT')
+                    return None
+
+                # The latest event of the PR has its current head
+                job = self.__connection.execute(
+                    'SELECT id, delivery, repository, number, sha, attempts FROM jobs '
+                    'WHERE status = ? AND repository = ? AND number = ? ORDER BY id DESC LIMIT 1',
+                    ('queued', *row)
+                ).fetchone()
+
+                now = datetime.now().isoformat()
+                self.__connection.execute(
+                    'UPDATE jobs SET status = ?, updated_at = ? '
+                    'WHERE status = ? AND repository = ? AND number = ? AND id < ?',
+                    ('superseded', now, 'queued', *row, job[0])
+                )
+                self.__connection.execute(
+                    'UPDATE jobs SET status = ?, attempts = attempts + 1, updated_at = ? WHERE id = ?',
+                    ('running', now, job[0])
+                )
+                self.__connection.execute('COMMIT')
+            except Exception:
+                self.__connection.execute('ROLLBACK')
+                raise
+
+        return Job(*job[:5], attempts=job[5] + 1)
+
+    def complete(
+        self,
+        job: Job
+    ) -> None:
+        self.__execute(
+            'UPDATE jobs SET status = ?, error = NULL, updated_at = ? WHERE id = ?',
+            ('done', datetime.now().isoformat(), job.id)
+        )
+
+    def fail(
+        self,
+        job: Job,
+        error: str,
+        retry: bool
+    ) -> None:
+        self.__execute(
+            'UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE id = ?',
+            ('queued' if retry else 'failed', error, datetime.now().isoformat(), job.id)
+        )
+
+    def counts(self) -> dict:
+        return dict(self.__execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall())
+
+    def close(self) -> None:
+        with self.__lock:
+            self.__connection.close()
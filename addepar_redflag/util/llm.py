@@ -1,37 +1,32 @@
 from itertools import zip_longest
 from textwrap import dedent
+from time import perf_counter
 
+from botocore.config import Config
+from langchain.chains.llm import LLMChain
+from langchain.output_parsers.fix import OutputFixingParser
+from langchain.output_parsers.prompts import NAIVE_FIX_PROMPT
 from langchain.prompts import PromptTemplate
+from langchain_community.chat_models import BedrockChat
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.output_parsers.pydantic import PydanticOutputParser
 from rich.table import Column, Table
 from rich.text import Text
 
 from ..models.structures import Result
+from .cassette import CASSETTE
 from .console import CONSOLE
+from .metrics import METRICS
+from .profiling import TIMELINE
+from .tracing import SPAN_KIND_CLIENT, TRACER
 
 
 MAX_PARSER_RETRIES = 5
 
-# Claude was trained on XML formatted data.  
-# Using XML-style tags significantly increases its ability to interpret what data is where.
-DEFAULT_ROLE = (
-    'You are an application security engineer subject matter expert. '
-    'You are tasked with determining what functionality should be penetration tested by our offensive security team for the next application version. '
-    'Read the following information carefully, because you will be asked questions about it.'
-)
-DEFAULT_REVIEW_QUESTION = (
-    'Tell me if this pull request should be included in an offensive security penetration test, or if it can be ignored. '
-    'If the pull request should be included in the penetration test, include a list of files chosen from the ones in the pull request, that should be included in the penetration test. '
-    'Use the information provided when making your decisions, do not make assumptions. '
-    'Pull requests that only have minor changes to database schema, infrastructure, build processes, or code/unit testing can be ignored. '
-    'Pull requests that add new API routes should always be reviewed to ensure that they have proper controls. '
-    'The offensive security team has limited resources, so make your recommendation carefully.'
-)
-DEFAULT_TEST_PLAN_QUESTION = (
-    'Create a penetration testing plan for the offensive security team. '
-    'The plan should consist of step-by-step instructions based on the information provided that the offensive security team can use to identify vulnerabilities. '
-    'Include specific details about what to test, such as HTTP methods, API routes, function/class names, and areas of interest. '
-    'Do not include instructions that would be handled by the developers or quality assurance team, such as verifying that a feature works as expected or validating unit tests.'
-)
+# Tags the LLM calls made to fix malformed output, so they are counted as retries
+PARSER_FIX_TAG = 'parser_fix'
+THROTTLING_ERROR_CODES = {'ThrottlingException', 'TooManyRequestsException', 'Throttling'}
+
 PR_BLOCK = dedent(
     '''\
         Here is a single pull request, inside <pr></pr> XML tags:
@@ -43,6 +38,21 @@ PR_BLOCK = dedent(
 
         {additional_information}'''
 )
+BATCH_PR_BLOCK = dedent(
+    '''\
+        Here is a pull request with the id {id}, inside <pr></pr> XML tags:
+        <pr id="{id}">
+        <title>{pr_title}</title>
+        <description>{pr_description}</description>
+        {num_files} total changed files: <file_names>{file_names}</file_names>
+
+        {additional_information}
+        </pr>'''
+)
+BATCH_INSTRUCTIONS = (
+    'Answer the question separately for every pull request above. '
+    'Each answer must include the id of the pull request it is about.'
+)
 
 
 def build_question(question: str) -> str:
@@ -78,6 +88,49 @@ def build_jira_block(result: Result) -> str:
     return info
 
 
+def build_labels_block(result: Result) -> str:
+    info = ''
+
+    if result.pr.labels:
+        info = f'The pull request has the following labels: <labels>{", ".join(result.pr.labels)}</labels>'
+
+    return info
+
+
+def build_information_block(result: Result) -> str:
+    return '\n\n'.join(
+        block
+        for block in (build_jira_block(result=result), build_labels_block(result=result))
+        if block
+    )
+
+
+def build_pr_input(result: Result) -> dict:
+    return {
+        'pr_title': result.pr.title,
+        'pr_description': result.pr.message,
+        'num_files': len(result.pr.file_names),
+        'file_names': ', '.join(result.pr.file_names),
+    }
+
+
+def build_file_summary(result: Result) -> str:
+    summary = ''
+
+    if result.pr.files:
+        summary = (
+            'Here are the changed files with the number of added and removed lines, included between <file_summary></file_summary> tags:\n\n'
+            '<file_summary>\n'
+        )
+
+        for file in result.pr.files:
+            summary = f'{summary}{file.filename} (+{file.additions}/-{file.deletions})\n'
+
+        summary = f'{summary}</file_summary>'
+
+    return summary
+
+
 def build_file_context(result: Result, files: list) -> str:
     context = ''
 
@@ -89,11 +142,10 @@ def build_file_context(result: Result, files: list) -> str:
 
         for file in files:
             # Make sure the file requested exists
-            if file in result.pr.file_names:
-                index = result.pr.file_names.index(file)
-                patch = result.pr.files[index].patch
+            changed_file = result.pr.get_file(file)
+            if changed_file:
                 context = (
-                    f'{context}<file_name>{file}</file_name><patch>{patch}</patch>\n'
+                    f'{context}<file_name>{file}</file_name><patch>{changed_file.patch}</patch>\n'
                 )
         
         context = f'{context}</changes>'
@@ -109,12 +161,223 @@ def build_prompt(role: str, question):
         '{format_instructions}'
     )
 
-# The LLM likes to use lists when asked to provide information in a detailed format, even though the field is for a string.
-# Using a validation function helps prevent retry calls
-def convert_to_string(cls, v):
-    if isinstance(v, list):
-        return '\n'.join([line.rstrip() for line in v])
-    return v
+def build_batch_item(id: int, result: Result) -> str:
+    information = build_information_block(result=result)
+    file_context = build_file_context(result=result, files=result.pr.file_names)
+
+    return BATCH_PR_BLOCK.format(
+        id=id,
+        additional_information=f'{information}\n\n{file_context}',
+        **build_pr_input(result=result)
+    )
+
+
+def build_batch_prompt(role: str, question):
+    return PromptTemplate.from_template(
+        f'{role}\n\n'
+        '{pull_requests}\n\n'
+        f'{question}\n{BATCH_INSTRUCTIONS}\n\n'
+        '{format_instructions}'
+    )
+
+
+def count_tokens(llm, text: str) -> int:
+    """Counts the tokens of a prompt, timed as its own stage since large prompts are slow to tokenize."""
+    with METRICS.stage('tokenize'):
+        return llm.get_num_tokens(text)
+
+
+def pack_review_batches(
+    results: list,
+    llm,
+    max_prs: int,
+    max_tokens: int,
+    max_pr_tokens: int
+) -> tuple[list, list]:
+    """
+    Greedily packs small PRs into batches of up to `max_prs` PRs and `max_tokens` tokens.
+    Returns (batches, singles), where singles are the PRs to review on their own.
+    """
+    batches = []
+    singles = []
+    batch = []
+    batch_tokens = 0
+
+    for result in results:
+        tokens = count_tokens(llm, build_batch_item(0, result))
+
+        if tokens > max_pr_tokens or tokens > max_tokens:
+            singles.append(result)
+            continue
+
+        if batch and (len(batch) == max_prs or batch_tokens + tokens > max_tokens):
+            batches.append(batch)
+            batch = []
+            batch_tokens = 0
+
+        batch.append(result)
+        batch_tokens += tokens
+
+    if batch:
+        batches.append(batch)
+
+    # A batch of one is just a regular review
+    singles.extend(batch[0] for batch in batches if len(batch) == 1)
+    batches = [batch for batch in batches if len(batch) > 1]
+
+    return batches, singles
+
+
+def get_output_fixing_parser(
+    llm,
+    pydantic_object
+) -> OutputFixingParser:
+    """`OutputFixingParser.from_llm()`, with its fix calls tagged."""
+    return OutputFixingParser(
+        parser=PydanticOutputParser(pydantic_object=pydantic_object),
+        # Tags of the chain are not passed down to the LLM, those of the LLM binding are
+        retry_chain=LLMChain(
+            llm=llm.with_config(tags=[PARSER_FIX_TAG]),
+            prompt=NAIVE_FIX_PROMPT
+        ),
+        max_retries=MAX_PARSER_RETRIES
+    )
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """
+    Records when the first LLM call of the run starts, the number and latency of LLM calls, and
+    the parser fix retries. Runs inline, so calls count towards the result of the current task.
+    """
+    run_inline = True
+
+    def __init__(self):
+        self.__started_at = {}
+
+    def __start(
+        self,
+        run_id,
+        tags: list | None
+    ) -> None:
+        METRICS.mark('time_to_first_llm_call')
+        METRICS.count('llm_calls')
+        if tags and PARSER_FIX_TAG in tags:
+            METRICS.count('parser_fix_retries')
+
+        self.__started_at[run_id] = perf_counter()
+
+    def __end(self, run_id) -> None:
+        started_at = self.__started_at.pop(run_id, None)
+        if started_at is not None:
+            METRICS.observe('llm_call', perf_counter() - started_at)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, tags=None, **kwargs) -> None:
+        self.__start(run_id, tags)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, tags=None, **kwargs) -> None:
+        self.__start(run_id, tags)
+
+    def on_llm_end(self, response, *, run_id, **kwargs) -> None:
+        self.__end(run_id)
+
+    def on_llm_error(self, error, *, run_id, **kwargs) -> None:
+        METRICS.count('llm_errors')
+        self.__end(run_id)
+
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """
+    Records a span for each LLM call, as a child of the span of the chain that made it. The span
+    stays current until the call ends, so the Bedrock hooks add its tokens and retries to it.
+    """
+    run_inline = True
+
+    def __init__(self, model_id: str):
+        self.__model_id = model_id
+        self.__spans = {}
+
+    def __start(
+        self,
+        run_id,
+        tags: list | None
+    ) -> None:
+        span = TRACER.start_span(
+            'output_fixing_parser.fix' if tags and PARSER_FIX_TAG in tags else 'bedrock.invoke_model',
+            kind=SPAN_KIND_CLIENT,
+            **{
+                'gen_ai.system': 'aws.bedrock',
+                'gen_ai.request.model': self.__model_id
+            }
+        )
+        if span:
+            TRACER.activate(span)
+            self.__spans[run_id] = span
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, tags=None, **kwargs) -> None:
+        self.__start(run_id, tags)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, tags=None, **kwargs) -> None:
+        self.__start(run_id, tags)
+
+    def on_llm_end(self, response, *, run_id, **kwargs) -> None:
+        TRACER.end_span(self.__spans.pop(run_id, None))
+
+    def on_llm_error(self, error, *, run_id, **kwargs) -> None:
+        TRACER.end_span(self.__spans.pop(run_id, None), error)
+
+
+def _count_throttles(response=None, **kwargs) -> None:
+    """Counts the throttled Bedrock requests, including those retried by botocore."""
+    if response and response[1].get('Error', {}).get('Code') in THROTTLING_ERROR_CODES:
+        METRICS.count('throttles')
+        TIMELINE.instant('throttle')
+        TRACER.add_to_attribute('aws.throttles', 1)
+
+
+def _count_reported_tokens(http_response=None, parsed=None, **kwargs) -> None:
+    """Counts the tokens Bedrock reports in its response headers."""
+    if http_response is None:
+        return
+
+    for name, attribute, header in (
+        ('input_tokens', 'gen_ai.usage.input_tokens', 'x-amzn-bedrock-input-token-count'),
+        ('output_tokens', 'gen_ai.usage.output_tokens', 'x-amzn-bedrock-output-token-count')
+    ):
+        if header in http_response.headers:
+            METRICS.count(name, int(http_response.headers[header]))
+            TRACER.add_to_attribute(attribute, int(http_response.headers[header]))
+
+    if parsed:
+        TRACER.set_attributes(**{'aws.retry_attempts': parsed.get('ResponseMetadata', {}).get('RetryAttempts', 0)})
+
+
+def get_bedrock_llm(config: dict) -> BedrockChat:
+    llm = BedrockChat(
+        callbacks=[
+            MetricsCallbackHandler(),
+            TracingCallbackHandler(config.get('bedrock', {}).get('model_id'))
+        ],
+        region_name=config.get('bedrock', {}).get('region') or None,
+        credentials_profile_name=config.get('bedrock', {}).get('profile') or None,
+        model_id=config.get('bedrock', {}).get('model_id'),
+        model_kwargs={
+            'max_tokens': 4096,
+            'temperature': 0.0
+        },
+        config=Config(
+            read_timeout=600,
+            retries={'max_attempts': 10, 'mode': 'adaptive'}
+        )
+    )
+
+    # Registered first, as the retry handler stops the event once it decides to retry
+    llm.client.meta.events.register_first('needs-retry.bedrock-runtime', _count_throttles)
+    llm.client.meta.events.register('after-call.bedrock-runtime', _count_reported_tokens)
+    # Record or replay the calls when a cassette is started
+    llm.client.meta.events.register('before-call.bedrock-runtime', CASSETTE.before_bedrock_call)
+    llm.client.meta.events.register('after-call.bedrock-runtime', CASSETTE.after_bedrock_call)
+
+    return llm
 
 
 def build_evaluation_result(result, response, should_print: bool = False):
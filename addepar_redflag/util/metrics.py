@@ -0,0 +1,202 @@
+import json
+import os
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from threading import Lock
+from time import perf_counter, time
+from typing import Generator
+
+from .profiling import TIMELINE
+
+
+# The metrics of the result being processed by the current task or thread, see `Metrics.track()`.
+# Tasks and `asyncio.to_thread()` copy the context, so concurrent reviews don't mix.
+RESULT_METRICS = ContextVar('result_metrics', default=None)
+
+
+def _summarize(durations: list) -> dict:
+    durations = sorted(durations)
+    return {
+        'count': len(durations),
+        'total': round(sum(durations), 3),
+        'p50': round(durations[len(durations) // 2], 3),
+        'p95': round(durations[min(int(len(durations) * 0.95), len(durations) - 1)], 3),
+        'max': round(durations[-1], 3)
+    }
+
+
+class Metrics:
+    """
+    Metrics of a run: when events first happen, the latency of each stage (GitHub fetches, Jira
+    lookups, LLM calls...) and counters (tokens, throttles, cache hits...). Stage latencies and
+    counters are also added to the metrics of the result being processed, if any.
+    """
+    def __init__(self):
+        self.__lock = Lock()
+        self.start()
+
+    def start(self) -> None:
+        self.started_at = perf_counter()
+        self.timings = {}
+        self.stages = {}
+        self.counters = Counter()
+
+    def mark(
+        self,
+        name: str
+    ) -> None:
+        """Records the first time an event happens, e.g. the first LLM call."""
+        if name not in self.timings:
+            self.timings[name] = round(perf_counter() - self.started_at, 3)
+
+    def count(
+        self,
+        name: str,
+        value: int = 1
+    ) -> None:
+        with self.__lock:
+            self.counters[name] += value
+
+        result_metrics = RESULT_METRICS.get()
+        if result_metrics is not None:
+            result_metrics[name] = result_metrics.get(name, 0) + value
+
+    def observe(
+        self,
+        stage: str,
+        seconds: float
+    ) -> None:
+        with self.__lock:
+            self.stages.setdefault(stage, []).append(seconds)
+        TIMELINE.add(stage, perf_counter() - seconds, seconds)
+
+        result_metrics = RESULT_METRICS.get()
+        if result_metrics is not None:
+            key = f'{stage}_seconds'
+            result_metrics[key] = round(result_metrics.get(key, 0) + seconds, 3)
+
+    @contextmanager
+    def stage(
+        self,
+        name: str
+    ) -> Generator[None, None, None]:
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, perf_counter() - start)
+
+    @contextmanager
+    def track(self) -> Generator[dict, None, None]:
+        """Collects the stage latencies and counters of the code run inside, e.g. for one result."""
+        result_metrics = {}
+        token = RESULT_METRICS.set(result_metrics)
+        try:
+            yield result_metrics
+        finally:
+            RESULT_METRICS.reset(token)
+
+    def to_dict(self) -> dict:
+        with self.__lock:
+            return {
+                'timings': dict(self.timings),
+                'stages': {
+                    stage: _summarize(durations)
+                    for stage, durations in sorted(self.stages.items())
+                },
+                'counters': dict(sorted(self.counters.items()))
+            }
+
+
+def attribute_metrics(
+    results: list,
+    metrics: dict
+) -> None:
+    """Adds metrics to those of the results they were collected for, split evenly between them."""
+    for result in results:
+        current = result.metrics if hasattr(result, 'metrics') else {}
+        for name, value in metrics.items():
+            share = value / len(results) if len(results) > 1 else value
+            current[name] = round(current.get(name, 0) + share, 3)
+        result.metrics = current
+
+
+def write_metrics_summary(
+    path: Path,
+    run: dict,
+    results: list
+) -> None:
+    with open(path, 'w') as f:
+        json.dump(
+            {
+                'run': run,
+                'results': [
+                    {'url': result.pr.url, 'title': result.pr.title, **result.metrics}
+                    for result in results
+                    if hasattr(result, 'metrics')
+                ]
+            },
+            f,
+            indent=2
+        )
+
+
+def _escape_label(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels: dict) -> str:
+    return '{' + ','.join(f'{key}="{_escape_label(value)}"' for key, value in labels.items()) + '}'
+
+
+def write_prometheus_textfile(
+    path: Path,
+    run: dict,
+    labels: dict
+) -> None:
+    """
+    Writes the run metrics in the Prometheus text format, for the node_exporter textfile
+    collector. The file is replaced atomically so the collector never reads a partial file.
+    """
+    lines = [
+        '# HELP redflag_last_run_timestamp_seconds When the last run completed.',
+        '# TYPE redflag_last_run_timestamp_seconds gauge',
+        f'redflag_last_run_timestamp_seconds{_format_labels(labels)} {time():.0f}',
+        '# HELP redflag_stage_seconds Latency of each stage of the last run.',
+        '# TYPE redflag_stage_seconds summary'
+    ]
+    for stage, summary in run.get('stages').items():
+        stage_labels = {**labels, 'stage': stage}
+        lines.extend([
+            f'redflag_stage_seconds{_format_labels({**stage_labels, "quantile": "0.5"})} {summary["p50"]}',
+            f'redflag_stage_seconds{_format_labels({**stage_labels, "quantile": "0.95"})} {summary["p95"]}',
+            f'redflag_stage_seconds_sum{_format_labels(stage_labels)} {summary["total"]}',
+            f'redflag_stage_seconds_count{_format_labels(stage_labels)} {summary["count"]}'
+        ])
+
+    for name, value in run.get('counters').items():
+        lines.extend([
+            f'# TYPE redflag_{name}_total counter',
+            f'redflag_{name}_total{_format_labels(labels)} {value}'
+        ])
+
+    for name, seconds in run.get('timings').items():
+        lines.extend([
+            f'# TYPE redflag_{name}_seconds gauge',
+            f'redflag_{name}_seconds{_format_labels(labels)} {seconds}'
+        ])
+
+    path = Path(path)
+    path.parent.mkdir(
+        exist_ok=True,
+        parents=True
+    )
+    temporary_path = path.with_suffix(f'{path.suffix}.tmp')
+    temporary_path.write_text('\n'.join(lines) + '\n')
+    os.replace(temporary_path, path)
+
+
+# Shared by the CLI, the commands and the LLM callbacks of a process
+METRICS = Metrics()
@@ -0,0 +1,212 @@
+import json
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from threading import Lock
+from time import perf_counter
+from typing import Generator
+
+from .console import (
+    pretty_print,
+    MessageType
+)
+
+
+# The timeline lane of the task being run, see `Timeline.task()`. Threads started with
+# `asyncio.to_thread()` and LangChain's executors copy the context, so their calls land on it too.
+TIMELINE_LANE = ContextVar('timeline_lane', default=None)
+
+# Stages that wait on another service rather than on RedFlag itself
+EXTERNAL_STAGES = ('github_fetch', 'jira_lookup', 'llm_call', 'aws_validation', 'github_auth', 'jira_auth')
+
+
+class Timeline:
+    """
+    Timeline of a run in the Chrome trace event format, viewable in Perfetto or chrome://tracing.
+    Each review task gets a lane, reused once the task is done, and the stages and external calls
+    it makes are drawn on it, so the lanes show how many reviews really run at once.
+    """
+    def __init__(self):
+        self.__lock = Lock()
+        self.enabled = False
+        self.events = []
+        self.__lanes = {}
+        self.__free_lanes = []
+
+    def start(self) -> None:
+        self.enabled = True
+        self.started_at = perf_counter()
+        self.events = []
+        self.__lanes = {}
+        self.__free_lanes = []
+
+    def __get_lane(self) -> int:
+        lane = TIMELINE_LANE.get()
+        if lane is not None:
+            return lane
+
+        # Outside of a task, each thread has its own lane
+        thread = threading.current_thread()
+        name = 'main' if thread is threading.main_thread() else thread.name
+        with self.__lock:
+            if name not in self.__lanes:
+                self.__lanes[name] = len(self.__lanes)
+            return self.__lanes[name]
+
+    def add(
+        self,
+        name: str,
+        start: float,
+        duration: float,
+        args: dict | None = None
+    ) -> None:
+        if not self.enabled:
+            return
+
+        event = {
+            'name': name,
+            'cat': 'external' if name in EXTERNAL_STAGES else 'stage',
+            'ph': 'X',
+            'ts': round((start - self.started_at) * 1e6),
+            'dur': round(duration * 1e6),
+            'pid': 1,
+            'tid': self.__get_lane()
+        }
+        if args:
+            event['args'] = args
+
+        with self.__lock:
+            self.events.append(event)
+
+    def instant(
+        self,
+        name: str,
+        args: dict | None = None
+    ) -> None:
+        """Records an event without a duration, e.g. a throttled request."""
+        if not self.enabled:
+            return
+
+        event = {
+            'name': name,
+            'cat': 'event',
+            'ph': 'i',
+            's': 't',
+            'ts': round((perf_counter() - self.started_at) * 1e6),
+            'pid': 1,
+            'tid': self.__get_lane()
+        }
+        if args:
+            event['args'] = args
+
+        with self.__lock:
+            self.events.append(event)
+
+    @contextmanager
+    def span(
+        self,
+        name: str,
+        **args
+    ) -> Generator[None, None, None]:
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, start, perf_counter() - start, args)
+
+    @contextmanager
+    def task(
+        self,
+        name: str,
+        **args
+    ) -> Generator[None, None, None]:
+        """
+        Draws a task, and everything it calls, on a lane of its own. Must be entered from within
+        the task, so the lane doesn't leak to other tasks.
+        """
+        if not self.enabled:
+            yield
+            return
+
+        with self.__lock:
+            if self.__free_lanes:
+                lane = self.__free_lanes.pop()
+            else:
+                lane = f'task {len(self.__lanes)}'
+                self.__lanes[lane] = len(self.__lanes)
+        token = TIMELINE_LANE.set(self.__lanes[lane])
+
+        try:
+            with self.span(name, **args):
+                yield
+        finally:
+            TIMELINE_LANE.reset(token)
+            with self.__lock:
+                self.__free_lanes.append(lane)
+
+    async def run_task(
+        self,
+        coroutine,
+        **args
+    ):
+        """Awaits a coroutine as a task of the timeline, see `task()`."""
+        with self.task(coroutine.__name__, **args):
+            return await coroutine
+
+    def write(self, path: Path) -> None:
+        with self.__lock:
+            lanes = [
+                {'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': tid, 'args': {'name': name}}
+                for name, tid in self.__lanes.items()
+            ]
+            events = lanes + sorted(self.events, key=lambda event: event.get('ts'))
+
+        with open(path, 'w') as f:
+            json.dump(
+                {
+                    'traceEvents': events,
+                    'displayTimeUnit': 'ms'
+                },
+                f
+            )
+
+
+@contextmanager
+def profile_run(
+    output_dir: Path,
+    name: str
+) -> Generator[None, None, None]:
+    """
+    Profiles the CPU time of the code run inside with cProfile and records its timeline. Writes
+    `Profile-<name>.prof` and `Trace-<name>.json` to the output directory, even if it fails.
+    """
+    import cProfile
+
+    profiler = cProfile.Profile()
+    TIMELINE.start()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        TIMELINE.enabled = False
+
+        output_dir = Path(output_dir)
+        output_dir.mkdir(
+            exist_ok=True,
+            parents=True
+        )
+        profile_path = output_dir / f'Profile-{name}.prof'
+        trace_path = output_dir / f'Trace-{name}.json'
+        profiler.dump_stats(profile_path)
+        TIMELINE.write(trace_path)
+
+        pretty_print(
+            f'Wrote CPU profile to {profile_path} and timeline to {trace_path}',
+            MessageType.SUCCESS
+        )
+
+
+# Shared by the CLI, the commands and the metrics of a process, only records once started
+TIMELINE = Timeline()
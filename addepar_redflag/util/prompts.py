@@ -0,0 +1,55 @@
+import json
+from hashlib import sha256
+
+
+# Claude was trained on XML formatted data.  
+# Using XML-style tags significantly increases its ability to interpret what data is where.
+DEFAULT_ROLE = (
+    'You are an application security engineer subject matter expert. '
+    'You are tasked with determining what functionality should be penetration tested by our offensive security team for the next application version. '
+    'Read the following information carefully, because you will be asked questions about it.'
+)
+DEFAULT_REVIEW_QUESTION = (
+    'Tell me if this pull request should be included in an offensive security penetration test, or if it can be ignored. '
+    'If the pull request should be included in the penetration test, include a list of files chosen from the ones in the pull request, that should be included in the penetration test. '
+    'Use the information provided when making your decisions, do not make assumptions. '
+    'Pull requests that only have minor changes to database schema, infrastructure, build processes, or code/unit testing can be ignored. '
+    'Pull requests that add new API routes should always be reviewed to ensure that they have proper controls. '
+    'The offensive security team has limited resources, so make your recommendation carefully.'
+)
+DEFAULT_TEST_PLAN_QUESTION = (
+    'Create a penetration testing plan for the offensive security team. '
+    'The plan should consist of step-by-step instructions based on the information provided that the offensive security team can use to identify vulnerabilities. '
+    'Include specific details about what to test, such as HTTP methods, API routes, function/class names, and areas of interest. '
+    'Do not include instructions that would be handled by the developers or quality assurance team, such as verifying that a feature works as expected or validating unit tests.'
+)
+DEFAULT_TRIAGE_QUESTION = (
+    'Tell me if this pull request could need an offensive security penetration test, based only on its title, description, and the list of changed files. '
+    'Answer "yes" if it clearly needs one, "no" if it clearly does not, and "maybe" if the file changes would have to be read to decide. '
+    'Pull requests that only have minor changes to database schema, infrastructure, build processes, documentation, or code/unit testing can be answered with "no". '
+    'When in doubt, answer "maybe".'
+)
+
+
+def get_prompt_hash(config: dict) -> str:
+    """
+    Identifies the model, prompts and review modes that produce a verdict, so verdicts are only
+    reused with the same ones. Grouping by ticket, range reviews and similarity decide which
+    verdict a commit gets, e.g. one shared with other commits. The triage prompt and the batch
+    and range settings only count when they are used.
+    """
+    prompts = config.get('prompts') or {}
+    batch_review = config.get('batch_review') or {}
+    return sha256(json.dumps(
+        {
+            'model_id': (config.get('bedrock') or {}).get('model_id'),
+            'review': prompts.get('review'),
+            'test_plan': prompts.get('test_plan'),
+            'triage': prompts.get('triage') if config.get('triage') else None,
+            'batch_review': batch_review if batch_review.get('max_prs', 0) > 1 else None,
+            'group_by_ticket': bool(config.get('group_by_ticket')),
+            'range_depth': config.get('range_depth') if config.get('range_review') else None,
+            'similarity_threshold': config.get('similarity_threshold') or None
+        },
+        sort_keys=True
+    ).encode('utf-8')).hexdigest()
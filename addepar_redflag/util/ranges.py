@@ -0,0 +1,202 @@
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import PurePosixPath
+
+from ..models.structures import ChangedFile, PullRequest, Result
+from .console import (
+    pretty_print,
+    MessageType
+)
+from .filters import CommitFilter
+
+
+# The compare API returns at most 300 files
+COMPARE_MAX_FILES = 300
+MAX_CONCURRENT_REQUESTS = 8
+
+
+def get_component(
+    filename: str,
+    depth: int
+) -> str:
+    """Returns the directory, up to `depth` levels deep, that a file belongs to."""
+    parents = PurePosixPath(filename).parts[:-1]
+    return '/'.join(parents[:depth]) if parents else '.'
+
+
+def group_files_by_component(
+    files: list,
+    depth: int
+) -> dict:
+    components = {}
+    for file in files:
+        components.setdefault(get_component(file.filename, depth), []).append(file)
+
+    return components
+
+
+def get_local_range(
+    local_path: str,
+    from_ref: str,
+    to_ref: str
+) -> tuple[list, dict] | None:
+    """
+    Returns the net changed files between the merge base of `from_ref` and `to_ref`, and a mapping
+    of each file to the SHAs of the commits that touched it, using a local clone. Returns None if
+    the clone doesn't have both refs, or they have no common ancestor.
+    """
+    from git import Repo
+    from git.exc import BadName, GitError
+
+    try:
+        repo = Repo(local_path)
+        bases = repo.merge_base(from_ref, to_ref)
+        head = repo.commit(to_ref)
+    except (BadName, GitError) as e:
+        pretty_print(
+            f'Failed to find {from_ref} and {to_ref} in the local clone {local_path}: {e}',
+            MessageType.WARN
+        )
+        return None
+
+    if not bases:
+        pretty_print(
+            f'{from_ref} and {to_ref} have no common ancestor in the local clone {local_path}',
+            MessageType.WARN
+        )
+        return None
+
+    base = bases[0]
+
+    files = []
+    for diff in base.diff(head, create_patch=True):
+        patch = diff.diff.decode('utf-8', errors='replace') if diff.diff else None
+        lines = patch.splitlines() if patch else []
+        files.append(ChangedFile(
+            filename=diff.b_path or diff.a_path,
+            # `change_type` isn't set on diffs with patches, the flags are
+            status='added' if diff.new_file else 'removed' if diff.deleted_file else 'renamed' if diff.renamed_file else 'modified',
+            additions=sum(1 for line in lines if line.startswith('+') and not line.startswith('+++')),
+            deletions=sum(1 for line in lines if line.startswith('-') and not line.startswith('---')),
+            patch=patch
+        ))
+
+    # One process for the whole range instead of one diff per commit
+    log = repo.git.log(
+        '--name-only',
+        # Each commit starts with a NUL byte followed by its SHA, then the files it touched
+        '--format=%x00%H',
+        f'{base.hexsha}..{head.hexsha}'
+    )
+
+    attribution = {}
+    for entry in log.split('\x00'):
+        lines = [line for line in entry.splitlines() if line]
+        if not lines:
+            continue
+
+        sha, filenames = lines[0], lines[1:]
+        for filename in filenames:
+            attribution.setdefault(filename, []).append(sha)
+
+    return files, attribution
+
+
+def get_github_attribution(
+    repository,
+    components: dict,
+    range_shas: list
+) -> dict:
+    """
+    Maps each component to the SHAs of the range commits that touched it. The comparison doesn't
+    list the files of each commit, so they are fetched once per commit of the range, concurrently.
+    """
+    file_components = {
+        file.filename: component
+        for component, files in components.items()
+        for file in files
+    }
+
+    def get_filenames(sha: str) -> list:
+        return [file.filename for file in repository.get_commit(sha=sha).files]
+
+    attribution = {component: [] for component in components}
+    if not range_shas:
+        return attribution
+
+    with ThreadPoolExecutor(max_workers=min(len(range_shas), MAX_CONCURRENT_REQUESTS)) as executor:
+        for sha, filenames in zip(range_shas, executor.map(get_filenames, range_shas)):
+            # Files changed back by a later commit are not part of the net diff
+            for component in dict.fromkeys(file_components[filename] for filename in filenames if filename in file_components):
+                attribution[component].append(sha)
+
+    return attribution
+
+
+def get_range_results(
+    repository,
+    compare,
+    listed_commits: list,
+    commit_filter: CommitFilter,
+    depth: int,
+    base_ref: str,
+    head_ref: str,
+    local_path: str | None = None
+) -> list:
+    """
+    Builds one result per component (directory) from the net diff of the range, each listing the
+    commits that contributed to it. Components only changed by filtered commits are skipped.
+    """
+    commits = {
+        commit.get('sha'): {'sha': commit.get('sha'), 'title': title, 'url': commit.get('html_url')}
+        for title, _, commit in listed_commits
+    }
+
+    # Falls back to the GitHub comparison if the local clone can't resolve the range
+    local_range = get_local_range(local_path, base_ref, head_ref) if local_path else None
+    if local_range:
+        files, file_attribution = local_range
+        components = group_files_by_component(files, depth)
+        attribution = {
+            component: list(dict.fromkeys(
+                sha
+                for file in component_files
+                for sha in file_attribution.get(file.filename, [])
+            ))
+            for component, component_files in components.items()
+        }
+    else:
+        files = [ChangedFile.from_github(file) for file in compare.files]
+        if len(files) >= COMPARE_MAX_FILES:
+            pretty_print(
+                f'The comparison is limited to {COMPARE_MAX_FILES} files by GitHub, use a local clone to review the full range.',
+                MessageType.WARN
+            )
+
+        components = group_files_by_component(files, depth)
+        attribution = get_github_attribution(
+            repository,
+            components,
+            range_shas=list(commits)
+        )
+
+    results = []
+    for component, component_files in sorted(components.items()):
+        contributors = [commits[sha] for sha in attribution.get(component, []) if sha in commits]
+
+        if attribution.get(component) and not contributors:
+            continue
+
+        if not commit_filter.matches_files(component_files):
+            continue
+
+        pr = PullRequest(
+            repository=repository.full_name,
+            title=f'{component}: net changes from {len(contributors)} commits',
+            message='\n'.join(f'- {commit.get("title")}' for commit in contributors),
+            url=compare.html_url,
+            files=component_files,
+            commits=contributors
+        )
+        results.append(Result(pr=pr))
+
+    return results
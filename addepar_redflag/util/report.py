@@ -0,0 +1,421 @@
+import gzip
+import json
+import os
+import re
+from base64 import b64encode
+from collections import Counter
+from datetime import datetime
+from importlib.resources import files
+from itertools import islice
+from pathlib import Path
+from time import monotonic
+from typing import Generator, Iterable
+from urllib.parse import quote
+
+from .console import (
+    pretty_print,
+    MessageType
+)
+
+
+FSYNC_POLICIES = ['always', 'interval', 'never']
+FSYNC_INTERVAL = 1.0
+
+# `inline` embeds everything in the HTML report, `sharded` writes the results to gzipped shards
+# loaded on demand, and the CSS/JS to a `static` directory shared by the reports
+REPORT_FORMATS = ['inline', 'sharded']
+STATIC_FILES = ['redflag.css', 'redflag.js', 'logo.png']
+
+# Must match the tokenizer of `ReportSearch` in static/redflag.js
+SEARCH_TERM_REGEX = re.compile(r'[a-z0-9]+')
+
+# Replaced by the b64 encoded results while the HTML report is written
+HTML_PLACEHOLDERS = {
+    'in_scope': '__REDFLAG_IN_SCOPE_B64__',
+    'out_of_scope': '__REDFLAG_OUT_OF_SCOPE_B64__'
+}
+
+
+def get_status(result) -> str:
+    """Returns whether a result is in scope, out of scope, or errored."""
+    if not hasattr(result, 'review'):
+        return 'errored'
+
+    if not result.review.result:
+        return 'out_of_scope'
+
+    # Test Plan failed to create
+    return 'in_scope' if hasattr(result, 'test_plan') else 'errored'
+
+
+def split_results(results: list) -> tuple[list, list, list]:
+    """Splits results into (in_scope, out_of_scope, errored)."""
+    statuses = {'in_scope': [], 'out_of_scope': [], 'errored': []}
+    for result in results:
+        statuses[get_status(result)].append(result)
+
+    return statuses['in_scope'], statuses['out_of_scope'], statuses['errored']
+
+
+def get_report_filename(
+    repository_name: str,
+    base_filename: str
+) -> str:
+    return f'{repository_name.replace("/", "_")}-{base_filename.replace("/", "-")}-{datetime.now().strftime("%Y-%m-%d-%H-%M-%S")}'
+
+
+def get_report_pattern(
+    repository_name: str,
+    base_filename: str,
+    extension: str = 'json'
+) -> re.Pattern:
+    """Matches the names of the reports written with `get_report_filename()`, at any time."""
+    prefix = f'{repository_name.replace("/", "_")}-{base_filename.replace("/", "-")}'
+    return re.compile(rf'{re.escape(prefix)}-\d{{4}}(-\d{{2}}){{5}}\.{re.escape(extension)}')
+
+
+class ResultStream:
+    """
+    Appends results to an NDJSON file as soon as they are final, so they are serialized once and
+    the results of an interrupted run are kept. With the `interval` fsync policy, the file is
+    synced at most once per FSYNC_INTERVAL seconds, `always` syncs after every result and `never`
+    leaves it to the OS.
+    """
+    def __init__(
+        self,
+        path: Path,
+        fsync: str = 'interval'
+    ):
+        try:
+            Path(path).parent.mkdir(
+                exist_ok=True,
+                parents=True
+            )
+        except Exception as e:
+            pretty_print(
+                f'Could not create output directory "{Path(path).parent}"',
+                MessageType.FATAL
+            )
+            exit(1)
+
+        self.path = Path(path)
+        self.fsync = fsync or 'interval'
+        self.__file = open(self.path, 'w', encoding='utf-8')
+        self.__synced_at = monotonic()
+        self.__written = set()
+
+    def write(
+        self,
+        result
+    ) -> None:
+        """Appends a result, once."""
+        if id(result) in self.__written:
+            return
+
+        self.__written.add(id(result))
+        self.__file.write(f'{json.dumps(result.to_dict())}\n')
+        self.__file.flush()
+
+        if self.fsync == 'always' or (
+            self.fsync == 'interval' and monotonic() - self.__synced_at >= FSYNC_INTERVAL
+        ):
+            self.__sync()
+
+    def write_all(
+        self,
+        results: Iterable
+    ) -> None:
+        for result in results:
+            self.write(result)
+
+    def __sync(self) -> None:
+        os.fsync(self.__file.fileno())
+        self.__synced_at = monotonic()
+
+    def close(self) -> None:
+        if self.fsync != 'never':
+            self.__sync()
+        self.__file.close()
+
+
+def get_record_status(data: dict) -> str:
+    """`get_status()` for a result serialized with `Result.to_dict()`."""
+    if not data.get('review'):
+        return 'errored'
+
+    if not data.get('review').get('result'):
+        return 'out_of_scope'
+
+    return 'in_scope' if data.get('test_plan') else 'errored'
+
+
+def _read_records(
+    path: Path,
+    statuses: list,
+    status: str
+) -> Generator[bytes, None, None]:
+    """Yields the serialized results with a status, straight from the NDJSON file."""
+    with open(path, 'rb') as f:
+        for index, line in enumerate(line for line in f if line.strip()):
+            if statuses[index] == status:
+                yield line.rstrip(b'\n')
+
+
+def get_search_terms(data: dict) -> set:
+    """The lowercased words of the title, files, Jira ticket and reasoning of a serialized result."""
+    pr = data.get('pr') or {}
+    texts = [
+        pr.get('title') or '',
+        ' '.join(pr.get('file_names') or []),
+        (data.get('ticket') or {}).get('id') or '',
+        (data.get('review') or {}).get('reasoning') or '',
+        (data.get('test_plan') or {}).get('reasoning') or ''
+    ]
+
+    return set(SEARCH_TERM_REGEX.findall(' '.join(texts).lower()))
+
+
+def get_search_index(records: Iterable[bytes]) -> dict:
+    """
+    Builds the search index of a report: the title of each result, to list them without loading
+    them, and the sorted search terms of all results with the ids of the results they appear in.
+    """
+    titles = []
+    postings = {}
+    for id, record in enumerate(records):
+        data = json.loads(record)
+        titles.append((data.get('pr') or {}).get('title') or '')
+        for term in get_search_terms(data):
+            postings.setdefault(term, []).append(id)
+
+    terms = sorted(postings)
+    return {
+        'titles': titles,
+        'terms': terms,
+        'postings': [postings[term] for term in terms]
+    }
+
+
+def _join_array(records: Iterable[bytes]) -> Generator[bytes, None, None]:
+    """Yields the pieces of a JSON array of already serialized records."""
+    yield b'['
+    for index, record in enumerate(records):
+        yield b', ' + record if index else record
+    yield b']'
+
+
+def _write_b64(
+    f,
+    pieces: Iterable[bytes]
+) -> None:
+    """Base64 encodes a stream of bytes, in chunks aligned to 3 bytes so they can be concatenated."""
+    pending = b''
+    for piece in pieces:
+        pending += piece
+        aligned = len(pending) - len(pending) % 3
+        f.write(b64encode(pending[:aligned]).decode('utf-8'))
+        pending = pending[aligned:]
+
+    f.write(b64encode(pending).decode('utf-8'))
+
+
+def _read_static(name: str) -> bytes:
+    return files('addepar_redflag').joinpath('static', name).read_bytes()
+
+
+def write_static_files(output_dir: Path) -> None:
+    """Writes the CSS/JS shared by sharded reports, unless they are already up to date."""
+    static_dir = output_dir / 'static'
+    static_dir.mkdir(
+        exist_ok=True,
+        parents=True
+    )
+
+    for name in STATIC_FILES:
+        content = _read_static(name)
+        path = static_dir / name
+        if not path.exists() or path.read_bytes() != content:
+            path.write_bytes(content)
+
+
+def _batched(
+    records: Iterable[bytes],
+    size: int
+) -> Generator[list, None, None]:
+    iterator = iter(records)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def write_shards(
+    records: Iterable[bytes],
+    status: str,
+    data_dir: Path,
+    shard_size: int
+) -> list:
+    """
+    Writes results to gzipped, b64 encoded shards of `shard_size` results, loaded by the report
+    when one of their results is opened. Shards are scripts calling `ReportData.loadShard()`, as
+    browsers block fetch() on file:// pages. Returns their paths, relative to the HTML report.
+    """
+    return [
+        _write_shard(data_dir, status, page, b''.join(_join_array(batch)))
+        for page, batch in enumerate(_batched(records, shard_size))
+    ]
+
+
+def _write_shard(
+    data_dir: Path,
+    name: str,
+    page: int,
+    data: bytes
+) -> str:
+    """Writes a gzipped, b64 encoded shard. Returns its path, relative to the HTML report."""
+    path = data_dir / f'{name}-{page}.js'
+    path.write_text(f'ReportData.loadShard("{name}", {page}, "{b64encode(gzip.compress(data)).decode("utf-8")}");\n')
+
+    return f'{quote(data_dir.name)}/{quote(path.name)}'
+
+
+def write_reports(
+    stream_path: Path,
+    metadata: dict,
+    filename: str,
+    config: dict
+) -> tuple[int, int, int]:
+    """
+    Writes the HTML report, the JSON output and the errors file to `output_dir` from the NDJSON
+    results, streaming them instead of loading them. Returns the number of in-scope, out-of-scope
+    and errored results.
+    """
+    from jinja2 import Environment, PackageLoader, select_autoescape
+
+    jinja = Environment(
+        loader=PackageLoader("addepar_redflag"),
+        autoescape=select_autoescape()
+    )
+
+    html_template = jinja.get_template('results.html.jinja2')
+
+    # Only the status of each result is kept in memory
+    with open(stream_path, 'rb') as f:
+        statuses = [get_record_status(json.loads(line)) for line in f if line.strip()]
+    counts = Counter(statuses)
+
+    def records(status: str) -> Generator[bytes, None, None]:
+        return _read_records(stream_path, statuses, status)
+
+    pretty_print(
+        'Compiled results',
+        MessageType.SUCCESS
+    )
+
+    output_dir = Path(config.get('output_dir') or '.')
+
+    metadata_b64 = b64encode(json.dumps(metadata).encode('utf-8')).decode('utf-8')
+
+    # Lets the report list and search every result without loading them
+    if config.get('output_html'):
+        search_index = {
+            status: get_search_index(records(status))
+            for status in ('in_scope', 'out_of_scope')
+        }
+
+    # Write a sharded HTML report, loading each page of results from the data directory
+    if config.get('output_html') and config.get('report_format') == 'sharded':
+        write_static_files(output_dir)
+
+        data_dir = output_dir / f'{filename}.data'
+        data_dir.mkdir(exist_ok=True)
+
+        shard_size = max(config.get('shard_size') or 1, 1)
+        manifest = {
+            'page_size': shard_size,
+            'index': _write_shard(data_dir, 'index', 0, json.dumps(search_index).encode('utf-8'))
+        }
+        for status in ('in_scope', 'out_of_scope'):
+            manifest[status] = {
+                'count': counts[status],
+                'shards': write_shards(records(status), status, data_dir, shard_size)
+            }
+
+        html = html_template.render(
+            static={
+                'inline': False,
+                'path': 'static',
+                'logo': 'static/logo.png'
+            },
+            results={
+                'manifest_b64': b64encode(json.dumps(manifest).encode('utf-8')).decode('utf-8'),
+                'metadata_b64': metadata_b64
+            }
+        )
+
+        file_path = output_dir / f'{filename}.html'
+        with open(file_path, 'w') as f:
+            f.write(html)
+
+        pretty_print(
+            f'Wrote HTML report to {file_path}, with its data in {data_dir}',
+            MessageType.SUCCESS
+        )
+
+    # Write HTML output. Results are embedded as b64 to avoid tags like '</script>' from
+    # breaking the page, and encoded in place of placeholders as they are read.
+    elif config.get('output_html'):
+        html = html_template.render(
+            static={
+                'inline': True,
+                'css': _read_static('redflag.css').decode('utf-8'),
+                'js': _read_static('redflag.js').decode('utf-8'),
+                'logo': f'data:image/png;base64,{b64encode(_read_static("logo.png")).decode("utf-8")}'
+            },
+            results={
+                'in_scope_b64': HTML_PLACEHOLDERS['in_scope'],
+                'out_of_scope_b64': HTML_PLACEHOLDERS['out_of_scope'],
+                'index_b64': b64encode(json.dumps(search_index).encode('utf-8')).decode('utf-8'),
+                'metadata_b64': metadata_b64
+            }
+        )
+
+        file_path = output_dir / f'{filename}.html'
+        with open(file_path, 'w') as f:
+            for part in re.split(f'({"|".join(HTML_PLACEHOLDERS.values())})', html):
+                status = next((key for key, value in HTML_PLACEHOLDERS.items() if value == part), None)
+                if status:
+                    _write_b64(f, _join_array(records(status)))
+                else:
+                    f.write(part)
+
+            pretty_print(
+                f'Wrote HTML report to {file_path}',
+                MessageType.SUCCESS
+            )
+
+    # Write JSON output for in-scope items only
+    if config.get('output_json'):
+        if counts['in_scope']:
+            file_path = output_dir / f'{filename}.json'
+            with open(file_path, 'wb') as f:
+                f.write(b'{"in_scope": ')
+                f.writelines(_join_array(records('in_scope')))
+                f.write(b', "out_of_scope": ')
+                f.writelines(_join_array(records('out_of_scope')))
+                f.write(b'}')
+
+                pretty_print(
+                    f'Wrote JSON output to {file_path}',
+                    MessageType.SUCCESS
+                )
+
+    if counts['errored']:
+        file_path = output_dir / f'Errors-{filename}.json'
+        with open(file_path, 'wb') as f:
+            f.writelines(_join_array(records('errored')))
+
+        pretty_print(
+            f'Wrote error information to {file_path}',
+            MessageType.SUCCESS
+        )
+
+    return counts['in_scope'], counts['out_of_scope'], counts['errored']
@@ -0,0 +1,249 @@
+import json
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+
+from ..models.prompts.response_models import Review, TestPlan, Triage
+from ..models.structures import Result
+from .metrics import METRICS
+from .prompts import get_prompt_hash
+from .report import get_status
+
+
+RESULT_MODELS = {
+    'triage': Triage,
+    'review': Review,
+    'test_plan': TestPlan
+}
+
+
+def get_result_key(result: Result) -> str:
+    """Commits are keyed by SHA. Results without one (e.g. range reviews) by URL and title."""
+    return result.pr.sha or f'{result.pr.url}#{result.pr.title}'
+
+
+def restore_result(data: dict) -> Result:
+    """Rebuilds a Result, including its verdict, from `Result.to_dict()`."""
+    result = Result.from_dict(data)
+
+    for key, model in RESULT_MODELS.items():
+        if data.get(key):
+            setattr(result, key, model(**data.get(key)))
+
+    for key in ('token_count', 'decided_by'):
+        if data.get(key) is not None:
+            setattr(result, key, data.get(key))
+
+    return result
+
+
+class ResultsDatabase:
+    """
+    Stores every result with the model and prompts that produced it, so reports can be rendered
+    again without the LLM, and commits already reviewed with the same prompts are not reviewed again.
+    """
+    def __init__(
+        self,
+        path: str,
+        model_id: str,
+        prompt_hash: str
+    ):
+        path = Path(path).expanduser()
+        path.parent.mkdir(
+            exist_ok=True,
+            parents=True
+        )
+
+        self.model_id = model_id
+        self.prompt_hash = prompt_hash
+        self.__connection = sqlite3.connect(path)
+        self.__connection.executescript(
+            'CREATE TABLE IF NOT EXISTS results ('
+            'repository TEXT NOT NULL, '
+            'key TEXT NOT NULL, '
+            'sha TEXT, '
+            'title TEXT, '
+            'url TEXT, '
+            'fingerprint TEXT, '
+            'model_id TEXT, '
+            'prompt_hash TEXT NOT NULL, '
+            'status TEXT NOT NULL, '
+            'duration REAL, '
+            'created_at TEXT NOT NULL, '
+            'data TEXT NOT NULL, '
+            'PRIMARY KEY (repository, key, prompt_hash));'
+            'CREATE INDEX IF NOT EXISTS results_sha ON results (repository, sha);'
+            'CREATE TABLE IF NOT EXISTS tracking ('
+            'repository TEXT NOT NULL, '
+            'branch TEXT NOT NULL, '
+            'base TEXT NOT NULL, '
+            'mark TEXT NOT NULL, '
+            'updated_at TEXT NOT NULL, '
+            'PRIMARY KEY (repository, branch));'
+            'CREATE TABLE IF NOT EXISTS tracked_results ('
+            'repository TEXT NOT NULL, '
+            'branch TEXT NOT NULL, '
+            'key TEXT NOT NULL, '
+            'PRIMARY KEY (repository, branch, key));'
+        )
+        self.__connection.commit()
+
+    @classmethod
+    def from_config(
+        cls,
+        config: dict
+    ) -> 'ResultsDatabase | None':
+        path = config.get('results_db')
+        if not path:
+            return None
+
+        return cls(
+            path,
+            model_id=(config.get('bedrock') or {}).get('model_id'),
+            prompt_hash=get_prompt_hash(config)
+        )
+
+    def restore(
+        self,
+        result: Result
+    ) -> bool:
+        """
+        Copies the verdict of an earlier run with the same model and prompts onto the result.
+        Returns False if there is none, or if it errored.
+        """
+        row = self.__connection.execute(
+            'SELECT data FROM results WHERE repository = ? AND key = ? AND prompt_hash = ? AND status != ?',
+            (result.pr.repository, get_result_key(result), self.prompt_hash, 'errored')
+        ).fetchone()
+
+        if not row:
+            METRICS.count('results_db_misses')
+            return False
+
+        stored = restore_result(json.loads(row[0]))
+        for key in (*RESULT_MODELS, 'decided_by'):
+            if hasattr(stored, key):
+                setattr(result, key, getattr(stored, key))
+
+        METRICS.count('results_db_hits')
+        return True
+
+    def get_latest(
+        self,
+        repository: str,
+        url: str
+    ) -> Result | None:
+        """Returns the latest result for a URL, e.g. the previous review of a PR, with the same model and prompts."""
+        row = self.__connection.execute(
+            'SELECT data FROM results WHERE repository = ? AND url = ? AND prompt_hash = ? AND status != ? '
+            'ORDER BY created_at DESC LIMIT 1',
+            (repository, url, self.prompt_hash, 'errored')
+        ).fetchone()
+
+        return restore_result(json.loads(row[0])) if row else None
+
+    def put(
+        self,
+        result: Result,
+        duration: float | None = None
+    ) -> None:
+        self.__connection.execute(
+            'INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (
+                result.pr.repository,
+                get_result_key(result),
+                result.pr.sha,
+                result.pr.title,
+                result.pr.url,
+                result.pr.fingerprint,
+                self.model_id,
+                self.prompt_hash,
+                get_status(result),
+                duration,
+                datetime.now().isoformat(),
+                json.dumps(result.to_dict())
+            )
+        )
+
+    def select(
+        self,
+        repository: str,
+        shas: list | None = None,
+        keys: list | None = None
+    ) -> list[Result]:
+        """
+        Returns the stored results of a repository, optionally only for the given commits or keys,
+        in their order. When a commit was reviewed with several prompts, the latest result is returned.
+        """
+        rows = self.__connection.execute(
+            'SELECT key, sha, data FROM results WHERE repository = ? ORDER BY created_at',
+            (repository,)
+        ).fetchall()
+
+        for column, values in ((1, shas), (0, keys)):
+            if values is None:
+                continue
+
+            order = {value: index for index, value in enumerate(values)}
+            rows = sorted(
+                (row for row in rows if row[column] in order),
+                key=lambda row: order[row[column]]
+            )
+
+        # Later rows replace earlier ones with the same key
+        latest = {}
+        for key, _, data in rows:
+            latest.pop(key, None)
+            latest[key] = data
+
+        return [restore_result(json.loads(data)) for data in latest.values()]
+
+    def get_tracking(
+        self,
+        repository: str,
+        branch: str
+    ) -> tuple[str, str] | None:
+        """Returns the (base, mark) of a tracked branch: where tracking started and the last processed commit."""
+        return self.__connection.execute(
+            'SELECT base, mark FROM tracking WHERE repository = ? AND branch = ?',
+            (repository, branch)
+        ).fetchone()
+
+    def track(
+        self,
+        repository: str,
+        branch: str,
+        base: str,
+        mark: str,
+        results: list
+    ) -> None:
+        """Moves the mark of a tracked branch and adds the results of this run to it."""
+        self.__connection.execute(
+            'INSERT OR REPLACE INTO tracking VALUES (?, ?, ?, ?, ?)',
+            (repository, branch, base, mark, datetime.now().isoformat())
+        )
+        self.__connection.executemany(
+            'INSERT OR IGNORE INTO tracked_results VALUES (?, ?, ?)',
+            [(repository, branch, get_result_key(result)) for result in results]
+        )
+
+    def get_tracked_keys(
+        self,
+        repository: str,
+        branch: str
+    ) -> list:
+        return [
+            row[0]
+            for row in self.__connection.execute(
+                'SELECT key FROM tracked_results WHERE repository = ? AND branch = ? ORDER BY rowid',
+                (repository, branch)
+            )
+        ]
+
+    def commit(self) -> None:
+        """Makes the results written so far visible to other processes, e.g. `render`."""
+        self.__connection.commit()
+
+    def close(self) -> None:
+        self.__connection.commit()
+        self.__connection.close()
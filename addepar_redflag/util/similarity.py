@@ -0,0 +1,198 @@
+import re
+from hashlib import blake2b
+
+from ..models.prompts.response_models import Review, TestPlan
+from ..models.structures import Result
+
+
+NUM_HASHES = 128
+SHINGLE_SIZE = 5
+TOKEN_REGEX = re.compile(r'\w+|[^\w\s]')
+# Bin values are below 2 ** 57, a rotation offset keeps densified bins apart from real ones
+ROTATION_OFFSET = 1 << 57
+
+
+def get_shingles(pr) -> set:
+    """Returns the token shingles of the added and removed lines, regardless of the file they are in."""
+    tokens = []
+    for file in pr.files:
+        for line in (getattr(file, 'patch', None) or '').splitlines():
+            if line[:1] in ('+', '-'):
+                tokens.append(line[0])
+                tokens.extend(TOKEN_REGEX.findall(line[1:]))
+
+    if len(tokens) < SHINGLE_SIZE:
+        return {' '.join(tokens)} if tokens else set()
+
+    return {
+        ' '.join(tokens[index:index + SHINGLE_SIZE])
+        for index in range(len(tokens) - SHINGLE_SIZE + 1)
+    }
+
+
+def get_signature(shingles: set) -> tuple | None:
+    """
+    One permutation MinHash: each shingle is hashed once into one of NUM_HASHES bins, and each bin
+    keeps its minimum. Empty bins borrow the next non-empty bin. This is linear in the patch size,
+    unlike computing NUM_HASHES independent hashes per shingle.
+    """
+    if not shingles:
+        return None
+
+    bins = [None] * NUM_HASHES
+    for shingle in shingles:
+        value = int.from_bytes(blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'big')
+        index, value = value % NUM_HASHES, value // NUM_HASHES
+        if bins[index] is None or value < bins[index]:
+            bins[index] = value
+
+    signature = []
+    for index in range(NUM_HASHES):
+        distance = 0
+        while bins[(index + distance) % NUM_HASHES] is None:
+            distance += 1
+        signature.append(bins[(index + distance) % NUM_HASHES] + distance * ROTATION_OFFSET)
+
+    return tuple(signature)
+
+
+def get_similarity(
+    signature: tuple,
+    other: tuple
+) -> float:
+    """Estimates the Jaccard similarity of two shingle sets from their signatures."""
+    return sum(1 for a, b in zip(signature, other) if a == b) / NUM_HASHES
+
+
+def get_bands(threshold: float) -> tuple[int, int]:
+    """
+    Returns the (bands, rows) split of the signature with the highest LSH threshold at or below
+    `threshold`. Candidates are verified, so erring low only costs a few extra comparisons.
+    """
+    splits = [
+        (bands, NUM_HASHES // bands)
+        for bands in range(1, NUM_HASHES + 1)
+        if NUM_HASHES % bands == 0
+    ]
+
+    return max(
+        (split for split in splits if (1 / split[0]) ** (1 / split[1]) <= threshold),
+        key=lambda split: (1 / split[0]) ** (1 / split[1]),
+        default=(NUM_HASHES, 1)
+    )
+
+
+class SimilarityIndex:
+    """An in-memory LSH index over MinHash signatures."""
+    def __init__(
+        self,
+        threshold: float
+    ):
+        self.threshold = threshold
+        self.bands, self.rows = get_bands(threshold)
+        self.__buckets = [{} for _ in range(self.bands)]
+        self.__signatures = {}
+
+    def __band_keys(
+        self,
+        signature: tuple
+    ) -> list:
+        return [
+            signature[band * self.rows:(band + 1) * self.rows]
+            for band in range(self.bands)
+        ]
+
+    def add(
+        self,
+        key,
+        signature: tuple
+    ) -> None:
+        self.__signatures[key] = signature
+        for buckets, band_key in zip(self.__buckets, self.__band_keys(signature)):
+            buckets.setdefault(band_key, []).append(key)
+
+    def query(
+        self,
+        signature: tuple
+    ) -> tuple | None:
+        """Returns the (key, similarity) of the most similar entry above the threshold, if any."""
+        candidates = {
+            key
+            for buckets, band_key in zip(self.__buckets, self.__band_keys(signature))
+            for key in buckets.get(band_key, [])
+        }
+
+        best = None
+        for key in candidates:
+            similarity = get_similarity(signature, self.__signatures[key])
+            if similarity >= self.threshold and (not best or similarity > best[1]):
+                best = (key, similarity)
+
+        return best
+
+
+def group_results_by_similarity(
+    results: list,
+    threshold: float
+) -> tuple[list[tuple[Result, list]], dict]:
+    """
+    Clusters results whose patches are near-duplicates, such as mechanical migrations applied to
+    several services. Returns (unit, members) pairs, where the unit is the first result of its
+    cluster, and the similarity of each member to its unit, keyed by member id.
+    """
+    index = SimilarityIndex(threshold)
+    clusters = {}
+    units = []
+    scores = {}
+
+    for result in results:
+        signature = get_signature(get_shingles(result.pr)) if result.pr.patches_loaded else None
+        if not signature:
+            units.append((result, [result]))
+            continue
+
+        match = index.query(signature)
+        if match:
+            key, similarity = match
+            clusters[key].append(result)
+            scores[id(result)] = similarity
+            continue
+
+        members = [result]
+        clusters[id(result)] = members
+        index.add(id(result), signature)
+        units.append((result, members))
+
+    return units, scores
+
+
+def inherit_verdict(
+    unit: Result,
+    member: Result,
+    decided_by: dict
+) -> None:
+    """
+    Copies the verdict of a representative to a near-duplicate. Unlike identical patches, the
+    member changes other files, so it keeps its own file names and the file-specific test plan
+    is replaced by a pointer to the representative's.
+    """
+    if hasattr(unit, 'triage'):
+        member.triage = unit.triage
+
+    if hasattr(unit, 'review'):
+        member.review = Review(
+            result=unit.review.result,
+            reasoning=unit.review.reasoning,
+            files=list(member.pr.file_names) if unit.review.result else []
+        )
+
+    if hasattr(unit, 'test_plan'):
+        member.test_plan = TestPlan(
+            test_plan=(
+                f'This PR is a near-duplicate of {unit.pr.title} ({unit.pr.url}). '
+                'Apply the test plan of that PR to the files changed here.'
+            ),
+            reasoning='Inherited through patch similarity.'
+        )
+
+    member.decided_by = decided_by
@@ -0,0 +1,338 @@
+import json
+import secrets
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from threading import Lock
+from time import monotonic, time_ns
+from typing import Generator
+
+from .console import (
+    pretty_print,
+    MessageType
+)
+from .report import get_status
+
+
+# The span being run by the current task or thread. Tasks, `asyncio.to_thread()` and LangChain's
+# executors copy the context, so the calls they make are children of the span that started them.
+CURRENT_SPAN = ContextVar('current_span', default=None)
+
+# https://opentelemetry.io/docs/specs/otel/trace/api/#spankind
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_CLIENT = 3
+
+# https://opentelemetry.io/docs/specs/otel/trace/api/#set-status
+STATUS_CODE_OK = 1
+STATUS_CODE_ERROR = 2
+
+# Finished spans are exported in batches, or after this many seconds for long-running servers
+MAX_BUFFERED_SPANS = 512
+FLUSH_INTERVAL = 10
+
+
+def _to_any_value(value) -> dict:
+    """Converts an attribute value to an OTLP AnyValue."""
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        # 64-bit integers are strings in OTLP JSON
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    if isinstance(value, (list, tuple)):
+        return {'arrayValue': {'values': [_to_any_value(item) for item in value]}}
+
+    return {'stringValue': str(value)}
+
+
+def _to_attributes(attributes: dict) -> list:
+    return [
+        {'key': key, 'value': _to_any_value(value)}
+        for key, value in attributes.items()
+        if value is not None
+    ]
+
+
+class Tracer:
+    """
+    Records spans of the calls made for each result (GitHub hydration, Jira lookups, chain
+    invocations, LLM calls and their retries) and exports them in the OTLP JSON format, appended
+    to a file or posted to a collector. Only records once started.
+    """
+    def __init__(self):
+        self.__lock = Lock()
+        self.enabled = False
+        self.destination = None
+        self.resource = {}
+        self.__spans = []
+        self.__roots = {}
+        self.__flushed_at = monotonic()
+
+    def start(
+        self,
+        destination: str,
+        resource: dict
+    ) -> None:
+        self.enabled = True
+        self.destination = destination
+        self.resource = resource
+        self.__spans = []
+        self.__roots = {}
+        self.__flushed_at = monotonic()
+
+    def start_span(
+        self,
+        name: str,
+        trace_id: str | None = None,
+        kind: int = SPAN_KIND_INTERNAL,
+        links: list | None = None,
+        **attributes
+    ) -> dict | None:
+        """
+        Starts a span, child of the current span. With `trace_id`, the span is part of that trace
+        instead, under its root if there is one. Without either, the span starts a new trace.
+        """
+        if not self.enabled:
+            return None
+
+        parent = self.current_span()
+        if trace_id and (not parent or parent.get('traceId') != trace_id):
+            parent = self.__roots.get(trace_id)
+
+        span = {
+            'traceId': trace_id or (parent.get('traceId') if parent else secrets.token_hex(16)),
+            'spanId': secrets.token_hex(8),
+            'name': name,
+            'kind': kind,
+            'startTimeUnixNano': time_ns(),
+            'attributes': attributes,
+            'parent': parent
+        }
+        if links:
+            span['links'] = [
+                {'traceId': root.get('traceId'), 'spanId': root.get('spanId')}
+                for root in (self.__roots.get(link) for link in links)
+                if root
+            ]
+
+        return span
+
+    def end_span(
+        self,
+        span: dict | None,
+        error: BaseException | None = None
+    ) -> None:
+        if not span:
+            return
+
+        span['endTimeUnixNano'] = time_ns()
+        span['status'] = {'code': STATUS_CODE_OK}
+        if error:
+            span['status'] = {'code': STATUS_CODE_ERROR, 'message': str(error)}
+
+        with self.__lock:
+            self.__spans.append(span)
+            flush = len(self.__spans) >= MAX_BUFFERED_SPANS or monotonic() - self.__flushed_at > FLUSH_INTERVAL
+
+        if flush:
+            self.flush()
+
+    @contextmanager
+    def span(
+        self,
+        name: str,
+        trace_id: str | None = None,
+        kind: int = SPAN_KIND_INTERNAL,
+        links: list | None = None,
+        **attributes
+    ) -> Generator[dict | None, None, None]:
+        span = self.start_span(name, trace_id, kind, links, **attributes)
+        if not span:
+            yield None
+            return
+
+        token = CURRENT_SPAN.set(span)
+        error = None
+        try:
+            yield span
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            CURRENT_SPAN.reset(token)
+            self.end_span(span, error)
+
+    def start_trace(
+        self,
+        name: str,
+        **attributes
+    ) -> str | None:
+        """
+        Starts the trace of a result, with a root span lasting until `end_trace()`. Returns its ID,
+        to pass to `span()` for the calls made for the result outside of its review task.
+        """
+        root = self.start_span(name, trace_id=secrets.token_hex(16), **attributes)
+        if not root:
+            return None
+
+        with self.__lock:
+            self.__roots[root.get('traceId')] = root
+
+        return root.get('traceId')
+
+    def end_trace(
+        self,
+        trace_id: str | None,
+        **attributes
+    ) -> None:
+        with self.__lock:
+            root = self.__roots.pop(trace_id, None)
+
+        if root:
+            root['attributes'].update(attributes)
+            self.end_span(root)
+
+    def activate(self, span: dict | None) -> None:
+        """
+        Makes a span started outside of `span()` current in the context of the caller until it
+        ends. For spans started by callbacks, which can't wrap the code they are called for. Each
+        task or thread has its own context, so concurrent calls under the same parent don't mix.
+        """
+        if span:
+            CURRENT_SPAN.set(span)
+
+    def current_span(self) -> dict | None:
+        # Activated spans stay in the context once ended, their parent is current again
+        span = CURRENT_SPAN.get()
+        while span and 'endTimeUnixNano' in span:
+            span = span.get('parent')
+
+        return span
+
+    def current_trace_id(self) -> str | None:
+        span = self.current_span()
+        return span.get('traceId') if span else None
+
+    def set_attributes(self, **attributes) -> None:
+        """Sets attributes of the current span, if any."""
+        span = self.current_span()
+        if span:
+            span['attributes'].update(attributes)
+
+    def add_to_attribute(
+        self,
+        name: str,
+        value: int
+    ) -> None:
+        """Adds to a numeric attribute of the current span, e.g. the tokens of its LLM calls."""
+        span = self.current_span()
+        if span:
+            span['attributes'][name] = span['attributes'].get(name, 0) + value
+
+    def __to_otlp(self, spans: list) -> dict:
+        return {
+            'resourceSpans': [{
+                'resource': {'attributes': _to_attributes(self.resource)},
+                'scopeSpans': [{
+                    'scope': {'name': 'addepar_redflag'},
+                    'spans': [
+                        {
+                            'traceId': span.get('traceId'),
+                            'spanId': span.get('spanId'),
+                            'parentSpanId': span.get('parent').get('spanId') if span.get('parent') else '',
+                            'name': span.get('name'),
+                            'kind': span.get('kind'),
+                            'startTimeUnixNano': str(span.get('startTimeUnixNano')),
+                            'endTimeUnixNano': str(span.get('endTimeUnixNano')),
+                            'attributes': _to_attributes(span.get('attributes')),
+                            'links': span.get('links', []),
+                            'status': span.get('status')
+                        }
+                        for span in spans
+                    ]
+                }]
+            }]
+        }
+
+    def flush(self) -> None:
+        """Exports the finished spans. Failures are reported but never fail the run."""
+        with self.__lock:
+            spans, self.__spans = self.__spans, []
+            self.__flushed_at = monotonic()
+
+        if not spans or not self.destination:
+            return
+
+        payload = json.dumps(self.__to_otlp(spans))
+        try:
+            if self.destination.startswith(('http://', 'https://')):
+                import requests
+
+                url = self.destination
+                if not url.rstrip('/').endswith('/v1/traces'):
+                    url = f'{url.rstrip("/")}/v1/traces'
+
+                response = requests.post(
+                    url,
+                    data=payload,
+                    headers={'Content-Type': 'application/json'},
+                    timeout=10
+                )
+                response.raise_for_status()
+            else:
+                # One ExportTraceServiceRequest per line, as read by the collector's otlpjsonfile receiver
+                path = Path(self.destination).expanduser()
+                path.parent.mkdir(
+                    exist_ok=True,
+                    parents=True
+                )
+                with open(path, 'a') as f:
+                    f.write(f'{payload}\n')
+        except Exception as e:
+            pretty_print(
+                f'Failed to export {len(spans)} spans to {self.destination}: {e}',
+                MessageType.WARN
+            )
+
+    def shutdown(self) -> None:
+        """Ends the traces still open, e.g. of results that were filtered, and exports every span."""
+        with self.__lock:
+            trace_ids = list(self.__roots)
+
+        for trace_id in trace_ids:
+            self.end_trace(trace_id)
+
+        self.flush()
+        self.enabled = False
+
+
+def get_trace_attributes(result) -> dict:
+    """Returns the attributes of the root span of a result, to find the trace of a commit."""
+    attributes = {
+        'redflag.commit.sha': result.pr.sha,
+        'redflag.pr.url': result.pr.url,
+        'redflag.pr.title': result.pr.title,
+        'redflag.status': get_status(result)
+    }
+    if hasattr(result, 'decided_by'):
+        attributes['redflag.decided_by'] = result.decided_by.get('reason')
+
+    return attributes
+
+
+@contextmanager
+def trace_run(
+    destination: str,
+    resource: dict
+) -> Generator[None, None, None]:
+    """Records the spans of the code run inside and exports them to `destination` as it goes."""
+    TRACER.start(destination, resource)
+    try:
+        yield
+    finally:
+        TRACER.shutdown()
+
+
+# Shared by the CLI, the commands and the LLM callbacks of a process
+TRACER = Tracer()
@@ -0,0 +1,131 @@
+import json
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+
+from ..models.prompts.response_models import Review, TestPlan
+from ..models.structures import Result
+from .metrics import METRICS
+from .prompts import get_prompt_hash
+
+
+class VerdictStore:
+    """
+    Persists the verdicts of reviewed PRs by patch fingerprint, so identical changes seen in a
+    later run (e.g. a cherry-pick onto a release branch) reuse the earlier review and test plan.
+    Verdicts are scoped to the model and prompts that produced them.
+    """
+    def __init__(
+        self,
+        path: str,
+        context: str
+    ):
+        path = Path(path).expanduser()
+        path.parent.mkdir(
+            exist_ok=True,
+            parents=True
+        )
+
+        self.context = context
+        self.hits = 0
+        self.__connection = sqlite3.connect(path)
+        self.__connection.execute(
+            'CREATE TABLE IF NOT EXISTS verdicts ('
+            'fingerprint TEXT NOT NULL, '
+            'context TEXT NOT NULL, '
+            'review TEXT NOT NULL, '
+            'test_plan TEXT, '
+            'title TEXT, '
+            'url TEXT, '
+            'created_at TEXT NOT NULL, '
+            'PRIMARY KEY (fingerprint, context))'
+        )
+        self.__connection.commit()
+
+    @classmethod
+    def from_config(
+        cls,
+        config: dict
+    ) -> 'VerdictStore | None':
+        path = config.get('verdict_cache')
+        if not path:
+            return None
+
+        return cls(path, get_prompt_hash(config))
+
+    def get(
+        self,
+        fingerprint: str
+    ) -> dict | None:
+        row = self.__connection.execute(
+            'SELECT review, test_plan, title, url FROM verdicts WHERE fingerprint = ? AND context = ?',
+            (fingerprint, self.context)
+        ).fetchone()
+
+        if not row:
+            return None
+
+        review, test_plan, title, url = row
+        return {
+            'review': json.loads(review),
+            'test_plan': json.loads(test_plan) if test_plan else None,
+            'title': title,
+            'url': url
+        }
+
+    def apply(
+        self,
+        result: Result
+    ) -> bool:
+        """Applies a stored verdict to the result. Returns False if there is none."""
+        fingerprint = result.pr.fingerprint
+        verdict = self.get(fingerprint) if fingerprint else None
+        if not verdict:
+            METRICS.count('verdict_cache_misses')
+            return False
+
+        result.review = Review(**verdict.get('review'))
+        if verdict.get('test_plan'):
+            result.test_plan = TestPlan(**verdict.get('test_plan'))
+
+        result.decided_by = {
+            'reason': 'fingerprint',
+            'url': verdict.get('url'),
+            'title': verdict.get('title')
+        }
+        self.hits += 1
+        METRICS.count('verdict_cache_hits')
+        return True
+
+    def put(
+        self,
+        result: Result
+    ) -> None:
+        """Stores the verdict of a reviewed result. Incomplete verdicts are not stored."""
+        fingerprint = result.pr.fingerprint
+        if not fingerprint or not hasattr(result, 'review'):
+            return
+
+        if result.review.result and not hasattr(result, 'test_plan'):
+            return
+
+        self.__connection.execute(
+            'INSERT OR REPLACE INTO verdicts VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (
+                fingerprint,
+                self.context,
+                json.dumps(result.review.dict()),
+                json.dumps(result.test_plan.dict()) if hasattr(result, 'test_plan') else None,
+                result.pr.title,
+                result.pr.url,
+                datetime.now().isoformat()
+            )
+        )
+
+    def commit(self) -> None:
+        """Makes the verdicts stored so far visible to other processes."""
+        self.__connection.commit()
+
+    def close(self) -> None:
+        self.__connection.commit()
+        self.__connection.close()
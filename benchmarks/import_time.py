@@ -0,0 +1,98 @@
+"""
+Measures how long the RedFlag CLI takes to import, using `python -X importtime`, and fails if it
+exceeds a budget or if a heavy dependency is imported before a command needs it.
+
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --runs 10 --budget-ms 300 --top 20
+"""
+import argparse
+import re
+import subprocess
+import sys
+from statistics import median
+from time import perf_counter
+
+
+# Only the commands that call the LLM, GitHub or Jira may import these
+HEAVY_MODULES = [
+    'atlassian',
+    'boto3',
+    'botocore',
+    'github',
+    'jinja2',
+    'langchain',
+    'langchain_community',
+    'langchain_core'
+]
+IMPORTTIME_REGEX = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$')
+
+
+def get_import_times(module: str) -> dict:
+    """Returns the cumulative import time, in microseconds, of every module imported by `module`."""
+    process = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        capture_output=True,
+        text=True,
+        check=True
+    )
+
+    times = {}
+    for line in process.stderr.splitlines():
+        match = IMPORTTIME_REGEX.match(line)
+        if match:
+            times[match.group(4)] = int(match.group(2))
+
+    return times
+
+
+def get_help_time() -> float:
+    """Returns the wall time, in milliseconds, of `redflag --help` in a new interpreter."""
+    start = perf_counter()
+    subprocess.run(
+        [sys.executable, '-m', 'addepar_redflag', '--help'],
+        capture_output=True,
+        check=True
+    )
+
+    return (perf_counter() - start) * 1000
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='RedFlag CLI import time benchmark')
+    parser.add_argument('--module', default='addepar_redflag.util.cli', help='The module to import. (default: addepar_redflag.util.cli)')
+    parser.add_argument('--runs', type=int, default=5, help='The number of runs, the median is reported. (default: 5)')
+    parser.add_argument('--budget-ms', type=float, default=500, help='Fail if the median import time is above this. (default: 500)')
+    parser.add_argument('--top', type=int, default=10, help='The number of slowest modules to list. (default: 10)')
+    args = parser.parse_args()
+
+    runs = [get_import_times(args.module) for _ in range(args.runs)]
+    import_ms = median(run.get(args.module, 0) for run in runs) / 1000
+    help_ms = median(get_help_time() for _ in range(args.runs))
+
+    print(f'{args.module}: {import_ms:.1f} ms (median of {args.runs} runs)')
+    print(f'redflag --help: {help_ms:.1f} ms (median of {args.runs} runs)')
+
+    print(f'\nSlowest {args.top} modules (cumulative):')
+    slowest = sorted(runs[-1].items(), key=lambda item: item[1], reverse=True)
+    for name, microseconds in slowest[:args.top]:
+        print(f'  {microseconds / 1000:8.1f} ms  {name}')
+
+    failed = False
+    heavy = sorted({
+        name
+        for name in runs[-1]
+        if name.split('.')[0] in HEAVY_MODULES
+    })
+    if heavy:
+        print(f'\nFAIL: heavy modules imported at startup: {", ".join(heavy)}')
+        failed = True
+
+    if import_ms > args.budget_ms:
+        print(f'\nFAIL: {import_ms:.1f} ms is above the budget of {args.budget_ms:.0f} ms')
+        failed = True
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,504 @@
+"""
+Measures the throughput of RedFlag without Bedrock, GitHub or Jira. A local server stands in for
+the GitHub compare/commits and Jira issue APIs, and a fake chat model with a configurable latency,
+throttling rate and malformed JSON rate stands in for Bedrock. Each scenario runs `redflag()` or
+`do_evaluations()` on synthetic commits in a new process, reports the wall time, peak RSS and
+calls per result, and fails if it regressed against the stored baselines.
+
+    python benchmarks/offline.py
+    python benchmarks/offline.py --scenario review-1000 --scenario eval-100
+    python benchmarks/offline.py --latency-ms 200 --throttle-rate 0.1 --malformed-rate 0.05
+    python benchmarks/offline.py --update-baselines
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import re
+import resource
+import sys
+import tempfile
+from collections import Counter
+from contextlib import redirect_stdout
+from hashlib import sha1
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from random import Random
+from threading import Lock
+from time import perf_counter, sleep, time
+from urllib.parse import parse_qs, urlparse
+
+
+BASELINES_PATH = Path(__file__).parent / 'baselines.json'
+SCENARIOS = {
+    'review-100': ('review', 100),
+    'review-1000': ('review', 1000),
+    'review-10000': ('review', 10000),
+    'eval-100': ('eval', 100),
+    'eval-1000': ('eval', 1000),
+    'eval-10000': ('eval', 10000)
+}
+REPOSITORY = 'benchmark/redflag'
+PAGE_SIZE = 100
+# Commits of the same ticket come in runs of this size, so most Jira lookups hit the cache
+COMMITS_PER_TICKET = 5
+
+
+def get_sha(index: int) -> str:
+    # The index is encoded in the SHA so the server can rebuild the commit from it
+    return f'{index:08x}{sha1(str(index).encode("utf-8")).hexdigest()[:32]}'
+
+
+def get_commit(
+    index: int,
+    base_url: str
+) -> dict:
+    """Builds a synthetic commit, the same every time for the same index."""
+    rng = Random(index)
+    sha = get_sha(index)
+    module = f'module{rng.randrange(50)}'
+    key = f'BENCH-{index // COMMITS_PER_TICKET}' if index % 10 else None
+
+    files = []
+    for number in range(rng.randint(1, 4)):
+        lines = rng.randint(5, 60)
+        files.append({
+            'sha': sha1(f'{sha}{number}'.encode('utf-8')).hexdigest(),
+            'filename': f'src/{module}/file{number}.py',
+            'status': 'modified',
+            'additions': lines,
+            'deletions': lines // 3,
+            'changes': lines + lines // 3,
+            'patch': '@@ -1,5 +1,5 @@\n' + '\n'.join(
+                f'+    value_{line} = compute({line}, "{module}")'
+                for line in range(lines)
+            )
+        })
+
+    title = f'{key}: Update {module} ({index})' if key else f'Update {module} ({index})'
+    return {
+        'sha': sha,
+        'url': f'{base_url}/repos/{REPOSITORY}/commits/{sha}',
+        'html_url': f'https://github.com/{REPOSITORY}/commit/{sha}',
+        'commit': {
+            'message': f'{title}\n\nChanges the way {module} computes its values.',
+            'author': {'name': 'Benchmark', 'email': 'benchmark@example.com', 'date': '2024-01-01T00:00:00Z'}
+        },
+        'files': files
+    }
+
+
+class FakeAPIHandler(BaseHTTPRequestHandler):
+    """Serves the GitHub and Jira endpoints RedFlag calls, counting the requests by API."""
+    def _respond(
+        self,
+        status: int,
+        body: dict,
+        links: str | None = None
+    ) -> None:
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.send_header('X-RateLimit-Limit', '5000')
+        self.send_header('X-RateLimit-Remaining', '5000')
+        self.send_header('X-RateLimit-Reset', str(int(time()) + 3600))
+        if links:
+            self.send_header('Link', links)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _count(self, api: str) -> None:
+        with self.server.lock:
+            self.server.counts[api] += 1
+
+    def do_POST(self):
+        if self.path == '/_reset':
+            with self.server.lock:
+                self.server.counts.clear()
+            self._respond(200, {})
+        else:
+            self._respond(404, {'message': 'Not Found'})
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        base_url = f'http://127.0.0.1:{self.server.server_port}'
+        repository = f'/repos/{REPOSITORY}'
+
+        if url.path == '/_stats':
+            with self.server.lock:
+                self._respond(200, dict(self.server.counts))
+        elif url.path == '/rate_limit':
+            limit = {'limit': 5000, 'remaining': 5000, 'reset': int(time()) + 3600, 'used': 0}
+            self._respond(200, {'resources': {'core': limit, 'search': limit, 'graphql': limit}, 'rate': limit})
+        elif url.path == repository:
+            self._count('github')
+            self._respond(200, {
+                'name': REPOSITORY.split('/')[1],
+                'full_name': REPOSITORY,
+                'url': f'{base_url}{repository}',
+                'html_url': f'https://github.com/{REPOSITORY}',
+                'owner': {'login': REPOSITORY.split('/')[0]}
+            })
+        elif url.path.startswith(f'{repository}/contents'):
+            # No PR templates
+            self._count('github')
+            self._respond(404, {'message': 'Not Found'})
+        elif url.path.startswith(f'{repository}/compare/'):
+            # The head ref is `head-<number of commits>`
+            self._count('github')
+            count = int(url.path.rsplit('-', 1)[1])
+            page = int(parse_qs(url.query).get('page', ['1'])[0])
+            start = (page - 1) * PAGE_SIZE
+
+            links = None
+            if start + PAGE_SIZE < count:
+                links = f'<{base_url}{url.path}?page={page + 1}&per_page={PAGE_SIZE}>; rel="next"'
+
+            self._respond(
+                200,
+                {
+                    'url': f'{base_url}{url.path}',
+                    'html_url': f'https://github.com/{REPOSITORY}/compare/{url.path.rsplit("/", 1)[1]}',
+                    'status': 'ahead',
+                    'ahead_by': count,
+                    'behind_by': 0,
+                    'total_commits': count,
+                    'commits': [
+                        {key: value for key, value in get_commit(index, base_url).items() if key != 'files'}
+                        for index in range(start, min(start + PAGE_SIZE, count))
+                    ],
+                    'files': []
+                },
+                links=links
+            )
+        elif url.path.startswith(f'{repository}/commits/'):
+            self._count('github')
+            page = int(parse_qs(url.query).get('page', ['1'])[0])
+            commit = get_commit(int(url.path.rsplit('/', 1)[1][:8], 16), base_url)
+            if page > 1:
+                commit['files'] = []
+            self._respond(200, commit)
+        elif url.path.startswith('/rest/api/2/issue/'):
+            self._count('jira')
+            key = url.path.rsplit('/', 1)[1]
+            self._respond(200, {
+                'key': key,
+                'fields': {
+                    'summary': f'Summary of {key}',
+                    'description': f'The changes of {key} update how values are computed.'
+                }
+            })
+        else:
+            self._respond(404, {'message': 'Not Found'})
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_fake_apis(port_queue) -> None:
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeAPIHandler)
+    server.daemon_threads = True
+    server.lock = Lock()
+    server.counts = Counter()
+    port_queue.put(server.server_port)
+    server.serve_forever()
+
+
+def get_fake_chat_model(
+    latency: float,
+    throttle_rate: float,
+    malformed_rate: float,
+    callbacks: list
+):
+    """
+    Builds a chat model answering every RedFlag prompt with valid JSON, after `latency` seconds.
+    Throttled calls are retried after a backoff, as botocore does, and some answers are malformed
+    to exercise the output fixing parser. Answers only depend on the prompt, so runs are repeatable.
+    """
+    from langchain_core.language_models.chat_models import BaseChatModel
+    from langchain_core.messages import AIMessage
+    from langchain_core.outputs import ChatGeneration, ChatResult
+
+    from addepar_redflag.util.metrics import METRICS
+
+    def answer(
+        prompt: str,
+        rng: Random
+    ) -> str:
+        # Only answers parsed as JSON can be malformed, fixes are always valid
+        fix = 'the Completion did not satisfy the constraints' in prompt
+        if '"properties"' in prompt and not fix and rng.random() < malformed_rate:
+            return '{"result": tru'
+
+        if '"properties": {"reviews"' in prompt:
+            ids = re.findall(r'<pr id="(\d+)">', prompt)
+            return json.dumps({'reviews': [
+                {'id': int(id), 'result': rng.random() < 0.3, 'reasoning': 'Synthetic reasoning.', 'files': []}
+                for id in ids
+            ]})
+        if '"properties": {"decision"' in prompt:
+            return json.dumps({'decision': rng.choice(['yes', 'maybe', 'no']), 'reasoning': 'Synthetic reasoning.'})
+        if '"properties": {"test_plan"' in prompt:
+            return json.dumps({'test_plan': '1. Run the synthetic tests.', 'reasoning': 'Synthetic reasoning.'})
+        if '"properties": {"result"' in prompt:
+            return json.dumps({'result': rng.random() < 0.3, 'reasoning': 'Synthetic reasoning.', 'files': []})
+        if 'STUDENT ANSWER' in prompt:
+            return 'The student answer matches the true answer.\nGRADE: CORRECT'
+
+        return 'Synthetic answer.'
+
+    calls = Counter()
+    lock = Lock()
+
+    class FakeChatModel(BaseChatModel):
+        @property
+        def calls(self) -> Counter:
+            return calls
+
+        @property
+        def _llm_type(self) -> str:
+            return 'fake-bedrock'
+
+        def get_num_tokens(self, text: str) -> int:
+            # Roughly the ratio of the Anthropic tokenizer on code
+            return len(text) // 4
+
+        def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+            prompt = '\n'.join(str(message.content) for message in messages)
+            rng = Random(prompt)
+
+            attempt = 0
+            while attempt < 10 and rng.random() < throttle_rate:
+                with lock:
+                    calls['throttles'] += 1
+                METRICS.count('throttles')
+                sleep(min(0.05 * 2 ** attempt, 2))
+                attempt += 1
+
+            sleep(latency * rng.uniform(0.5, 1.5))
+            with lock:
+                calls['llm'] += 1
+
+            return ChatResult(generations=[ChatGeneration(message=AIMessage(content=answer(prompt, rng)))])
+
+    return FakeChatModel(callbacks=callbacks)
+
+
+def run_scenario(
+    kind: str,
+    count: int,
+    base_url: str,
+    options: dict,
+    result_queue
+) -> None:
+    """Runs a scenario in this process, which is new, so the peak RSS is its own."""
+    from atlassian import Jira
+    from github import Github
+
+    from addepar_redflag.evaluate import do_evaluations
+    from addepar_redflag.redflag import redflag
+    from addepar_redflag.util.config import get_default_config
+    from addepar_redflag.util.credentials import GitHubCredential, GitHubPool
+    from addepar_redflag.util.llm import MetricsCallbackHandler
+
+    credential = GitHubCredential(
+        name='Benchmark',
+        auth=None
+    )
+    credential.client = Github(
+        base_url=base_url,
+        per_page=PAGE_SIZE
+    )
+    github = GitHubPool([credential])
+    jira = Jira(
+        url=base_url,
+        username='benchmark',
+        password='benchmark'
+    )
+    llm = get_fake_chat_model(
+        latency=options.get('latency_ms') / 1000,
+        throttle_rate=options.get('throttle_rate'),
+        malformed_rate=options.get('malformed_rate'),
+        callbacks=[MetricsCallbackHandler()]
+    )
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        config = get_default_config()
+        config.update({
+            'repo': REPOSITORY,
+            'from': 'base',
+            'to': f'head-{count}',
+            'output_dir': output_dir,
+            'progress_bar': False
+        })
+        config['jira'].update({'url': base_url, 'user': 'benchmark', 'token': 'benchmark'})
+
+        output = sys.stdout if options.get('verbose') else open(os.devnull, 'w')
+        start = perf_counter()
+        try:
+            with redirect_stdout(output):
+                if kind == 'review':
+                    asyncio.run(redflag(
+                        github=github,
+                        jira=jira,
+                        config=config,
+                        llm=llm
+                    ))
+                else:
+                    dataset = Path(output_dir) / 'dataset.json'
+                    dataset.write_text(json.dumps([
+                        {
+                            'repository': REPOSITORY,
+                            'commit': get_sha(index),
+                            'should_review': index % 3 == 0,
+                            'reference': 'The change updates how values are computed.'
+                        }
+                        for index in range(count)
+                    ]))
+                    asyncio.run(do_evaluations(
+                        github=github,
+                        jira=jira,
+                        dataset=dataset,
+                        config=config,
+                        llm=llm
+                    ))
+        except SystemExit as e:
+            if e.code:
+                result_queue.put({'error': f'exited with code {e.code}'})
+                return
+
+        result_queue.put({
+            'wall_seconds': round(perf_counter() - start, 2),
+            # Kilobytes on Linux
+            'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+            'llm_calls': llm.calls.get('llm', 0),
+            'throttles': llm.calls.get('throttles', 0)
+        })
+
+
+def get_stats(base_url: str) -> dict:
+    import requests
+
+    return requests.get(f'{base_url}/_stats').json()
+
+
+def compare(
+    name: str,
+    measured: dict,
+    baseline: dict,
+    tolerance: float,
+    calls_tolerance: float
+) -> list:
+    """Returns the regressions of a scenario against its baseline."""
+    regressions = []
+    for metric in ('wall_seconds', 'peak_rss_mb'):
+        if measured.get(metric) > baseline.get(metric) * (1 + tolerance):
+            regressions.append(f'{name}: {metric} is {measured.get(metric)}, the baseline is {baseline.get(metric)}')
+
+    for api, calls in measured.get('calls_per_result').items():
+        expected = baseline.get('calls_per_result', {}).get(api)
+        if expected is not None and calls > expected * (1 + calls_tolerance):
+            regressions.append(f'{name}: {calls} {api} calls per result, the baseline is {expected}')
+
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='RedFlag offline benchmark')
+    parser.add_argument('--scenario', action='append', choices=list(SCENARIOS), help='A scenario to run, can be repeated. (default: all)')
+    parser.add_argument('--latency-ms', type=float, default=50, help='The mean latency of the fake chat model. (default: 50)')
+    parser.add_argument('--throttle-rate', type=float, default=0.02, help='The share of fake chat model calls that are throttled, then retried. (default: 0.02)')
+    parser.add_argument('--malformed-rate', type=float, default=0.05, help='The share of fake chat model answers that are malformed JSON. (default: 0.05)')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Fail if the wall time or peak RSS is this much above the baseline. (default: 0.25)')
+    parser.add_argument('--calls-tolerance', type=float, default=0.05, help='Fail if the calls per result are this much above the baseline. (default: 0.05)')
+    parser.add_argument('--update-baselines', action='store_true', help='Store the measurements as the new baselines.')
+    parser.add_argument('--verbose', action='store_true', help='Show the output of RedFlag.')
+    args = parser.parse_args()
+
+    options = {
+        'latency_ms': args.latency_ms,
+        'throttle_rate': args.throttle_rate,
+        'malformed_rate': args.malformed_rate
+    }
+    baselines = json.loads(BASELINES_PATH.read_text()) if BASELINES_PATH.exists() else {}
+    # Baselines only apply to runs with the same fake model
+    comparable = baselines.get('options') == options
+
+    # Each scenario starts from a new interpreter, without the modules of the others
+    context = multiprocessing.get_context('spawn')
+    port_queue = context.Queue()
+    server = context.Process(target=serve_fake_apis, args=(port_queue,), daemon=True)
+    server.start()
+    base_url = f'http://127.0.0.1:{port_queue.get()}'
+
+    import requests
+
+    measurements = {}
+    failed = False
+    print(f'{"Scenario":<14} {"Wall (s)":>9} {"Peak RSS (MB)":>14} {"GitHub/result":>14} {"Jira/result":>12} {"LLM/result":>11} {"Throttles":>10}')
+    for name in args.scenario or list(SCENARIOS):
+        kind, count = SCENARIOS.get(name)
+        requests.post(f'{base_url}/_reset')
+
+        result_queue = context.Queue()
+        process = context.Process(
+            target=run_scenario,
+            args=(kind, count, base_url, {**options, 'verbose': args.verbose}, result_queue)
+        )
+        process.start()
+        process.join()
+
+        # The result is small enough for the queue not to block the process from exiting
+        measured = result_queue.get() if not result_queue.empty() else {'error': f'crashed with code {process.exitcode}'}
+
+        if measured.get('error'):
+            print(f'{name:<14} FAIL: {measured.get("error")}')
+            failed = True
+            continue
+
+        stats = get_stats(base_url)
+        measured['calls_per_result'] = {
+            'github': round(stats.get('github', 0) / count, 2),
+            'jira': round(stats.get('jira', 0) / count, 2),
+            'llm': round(measured.pop('llm_calls') / count, 2)
+        }
+        measurements[name] = measured
+
+        calls = measured.get('calls_per_result')
+        print(
+            f'{name:<14} {measured.get("wall_seconds"):>9} {measured.get("peak_rss_mb"):>14} '
+            f'{calls.get("github"):>14} {calls.get("jira"):>12} {calls.get("llm"):>11} {measured.get("throttles"):>10}'
+        )
+
+    server.terminate()
+
+    if args.update_baselines:
+        scenarios = baselines.get('scenarios', {}) if comparable else {}
+        scenarios.update({
+            name: {key: value for key, value in measured.items() if key != 'throttles'}
+            for name, measured in measurements.items()
+        })
+        BASELINES_PATH.write_text(json.dumps({'options': options, 'scenarios': scenarios}, indent=2) + '\n')
+        print(f'\nStored the baselines in {BASELINES_PATH}')
+        return 1 if failed else 0
+
+    if not comparable:
+        print('\nThe fake model options differ from those of the baselines, skipping the comparison.')
+        return 1 if failed else 0
+
+    regressions = []
+    for name, measured in measurements.items():
+        baseline = baselines.get('scenarios', {}).get(name)
+        if baseline:
+            regressions.extend(compare(name, measured, baseline, args.tolerance, args.calls_tolerance))
+
+    for regression in regressions:
+        print(f'\nFAIL: {regression}')
+
+    return 1 if failed or regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
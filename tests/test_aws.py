@@ -0,0 +1,51 @@
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from addepar_redflag.util import aws
+
+
+class FakeSession:
+    calls = 0
+    expiry = None
+
+    def __init__(self, profile_name=None):
+        pass
+
+    def client(self, service: str):
+        def get_caller_identity():
+            FakeSession.calls += 1
+
+        return SimpleNamespace(get_caller_identity=get_caller_identity)
+
+    def get_credentials(self):
+        return SimpleNamespace(_expiry_time=FakeSession.expiry)
+
+
+def setup(monkeypatch, tmp_path) -> None:
+    monkeypatch.setattr(aws, 'VALIDATION_CACHE_PATH', tmp_path / 'aws-credentials.json')
+    monkeypatch.setattr(aws, 'Session', FakeSession)
+    monkeypatch.setattr(FakeSession, 'calls', 0)
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'ASIAEXAMPLE')
+    monkeypatch.setenv('AWS_SESSION_TOKEN', 'token-1')
+
+
+def test_renewed_session_token_is_validated_again(monkeypatch, tmp_path):
+    setup(monkeypatch, tmp_path)
+
+    aws.validate_aws_credentials('', ttl=900)
+    aws.validate_aws_credentials('', ttl=900)
+    assert FakeSession.calls == 1
+
+    # Renewed temporary credentials keep their access key ID
+    monkeypatch.setenv('AWS_SESSION_TOKEN', 'token-2')
+    aws.validate_aws_credentials('', ttl=900)
+    assert FakeSession.calls == 2
+
+
+def test_validation_is_cached_until_the_credentials_expire(monkeypatch, tmp_path):
+    setup(monkeypatch, tmp_path)
+    monkeypatch.setattr(FakeSession, 'expiry', datetime(2024, 1, 1, tzinfo=timezone.utc))
+
+    aws.validate_aws_credentials('', ttl=900)
+    aws.validate_aws_credentials('', ttl=900)
+    assert FakeSession.calls == 2
@@ -0,0 +1,111 @@
+import json
+from io import BytesIO
+from types import SimpleNamespace
+
+import pytest
+import requests
+from botocore.response import StreamingBody
+from requests import Response
+
+from addepar_redflag.util.cassette import Cassette, CassetteMissError
+
+
+def get_fake_send(bodies: list):
+    """A `requests.Session.send` answering with the given bodies in order."""
+    sent = []
+
+    def send(session, request, **kwargs):
+        sent.append(request.url)
+        response = Response()
+        response.status_code = 200
+        response.reason = 'OK'
+        response.headers['Content-Type'] = 'application/json'
+        response.headers['Date'] = 'Mon, 01 Jan 2024 00:00:00 GMT'
+        response._content = bodies[len(sent) - 1]
+        return response
+
+    return send, sent
+
+
+def test_requests_are_replayed_in_order(tmp_path, monkeypatch):
+    path = tmp_path / 'cassette.json.gz'
+    send, sent = get_fake_send([b'{"page": 1}', b'{"page": 2}'])
+    monkeypatch.setattr(requests.Session, 'send', send)
+
+    cassette = Cassette()
+    cassette.start(record=str(path))
+    with requests.Session() as session:
+        session.get('https://api.github.com/repos/org/repo', headers={'Authorization': 'token secret'})
+        session.get('https://api.github.com/repos/org/repo')
+    cassette.stop(record=str(path))
+    assert len(sent) == 2
+
+    # Replays don't go to the network
+    def offline(session, request, **kwargs):
+        raise AssertionError(f'{request.url} went to the network')
+
+    monkeypatch.setattr(requests.Session, 'send', offline)
+    cassette.start(replay=str(path))
+    with requests.Session() as session:
+        assert session.get('https://api.github.com/repos/org/repo').json() == {'page': 1}
+        assert session.get('https://api.github.com/repos/org/repo').json() == {'page': 2}
+        with pytest.raises(CassetteMissError):
+            session.get('https://api.github.com/repos/org/other')
+    cassette.stop()
+
+    assert requests.Session.send is offline
+    assert b'secret' not in path.read_bytes()
+
+
+def test_passthrough_requests_are_not_recorded(tmp_path, monkeypatch):
+    path = tmp_path / 'cassette.json'
+    send, sent = get_fake_send([b'{}', b'{}'])
+    monkeypatch.setattr(requests.Session, 'send', send)
+
+    cassette = Cassette()
+    cassette.start(record=str(path), passthrough=('http://localhost:4318',))
+    with requests.Session() as session:
+        session.post('http://localhost:4318/v1/traces', data=b'{}')
+        session.get('https://jira.example.com/rest/api/2/issue/SEC-1')
+    cassette.stop(record=str(path))
+
+    interactions = json.loads(path.read_text()).get('interactions')
+    assert list(interactions) == ['GET https://jira.example.com/rest/api/2/issue/SEC-1']
+    assert 'Date' not in interactions.popitem()[1][0].get('headers')
+
+
+def test_bedrock_calls_are_replayed(tmp_path):
+    path = tmp_path / 'cassette.json'
+    params = {
+        'method': 'POST',
+        'url': 'https://bedrock-runtime.us-east-1.amazonaws.com/model/claude/invoke',
+        'body': b'{"prompt": "Review this PR"}'
+    }
+    body = b'{"completion": "{\\"result\\": false}"}'
+
+    cassette = Cassette()
+    cassette.start(record=str(path))
+    context = {}
+    assert cassette.before_bedrock_call(params, context) is None
+    parsed = {
+        'body': StreamingBody(BytesIO(body), len(body)),
+        'contentType': 'application/json',
+        'ResponseMetadata': {'RequestId': 'abc', 'HTTPStatusCode': 200, 'HTTPHeaders': {}}
+    }
+    cassette.after_bedrock_call(
+        http_response=SimpleNamespace(status_code=200, headers={'content-type': 'application/json'}),
+        parsed=parsed,
+        context=context
+    )
+    # The body is still readable by the caller
+    assert parsed.get('body').read() == body
+    cassette.stop(record=str(path))
+
+    cassette.start(replay=str(path))
+    http, replayed = cassette.before_bedrock_call(params, {})
+    cassette.stop()
+
+    assert http.status_code == 200
+    assert replayed.get('contentType') == 'application/json'
+    assert replayed.get('body').read() == body
+    assert 'RequestId' not in replayed.get('ResponseMetadata')
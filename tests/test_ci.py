@@ -0,0 +1,46 @@
+import json
+
+from addepar_redflag.ci import get_latest_report, load_in_scope_results
+from addepar_redflag.util.report import get_report_filename
+
+
+def write(path, data) -> None:
+    path.write_text(json.dumps(data))
+
+
+def write_results(path, records: list) -> None:
+    path.write_text(''.join(f'{json.dumps(record)}\n' for record in records))
+
+
+IN_SCOPE = {'title': 'Add login form', 'review': {'result': True}, 'test_plan': {'test_plan': 'Log in.'}}
+OUT_OF_SCOPE = {'title': 'Fix typo', 'review': {'result': False}}
+
+
+def test_only_the_latest_review_of_the_pr_is_loaded(tmp_path):
+    report = get_report_filename('org/repo', '1234')
+    write_results(tmp_path / 'org_repo-1234-2024-01-01-00-00-00.ndjson', [IN_SCOPE])
+    write_results(tmp_path / f'{report}.ndjson', [OUT_OF_SCOPE])
+
+    # Other files of the output directory, none of which are results of the PR
+    write(tmp_path / f'{report}.json', {'in_scope': [IN_SCOPE], 'out_of_scope': []})
+    write(tmp_path / f'Errors-{report}.json', [{'title': 'Errored'}])
+    write(tmp_path / 'Trace-review-2024-01-01-00-00-00.json', {'traceEvents': []})
+    write_results(tmp_path / f'{get_report_filename("org/repo", "99")}.ndjson', [IN_SCOPE])
+    write_results(tmp_path / f'{get_report_filename("org/repo", "12345")}.ndjson', [IN_SCOPE])
+
+    latest = get_latest_report(str(tmp_path), repository_name='org/repo', number='1234')
+
+    # The earlier in-scope review of the PR isn't published again
+    assert latest.name == f'{report}.ndjson'
+    assert load_in_scope_results(latest) == []
+
+
+def test_in_scope_results_of_the_review_are_loaded(tmp_path):
+    path = tmp_path / 'results.ndjson'
+    write_results(path, [IN_SCOPE, OUT_OF_SCOPE, {'title': 'Errored'}])
+
+    assert load_in_scope_results(path) == [IN_SCOPE]
+
+
+def test_no_review_of_the_pr(tmp_path):
+    assert get_latest_report(str(tmp_path), repository_name='org/repo', number=1234) is None
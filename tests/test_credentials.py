@@ -0,0 +1,92 @@
+from time import time
+from types import SimpleNamespace
+
+from addepar_redflag.util.credentials import GitHubCredential, GitHubPool
+
+
+def get_credential(
+    name: str,
+    remaining: int = -1,
+    limit: int = -1,
+    reset: int = 0
+) -> GitHubCredential:
+    credential = GitHubCredential(
+        name=name,
+        auth=None
+    )
+    # Only the requester is read, any other call on the client would be a request
+    credential.client = SimpleNamespace(requester=SimpleNamespace(
+        rate_limiting=(remaining, limit),
+        rate_limiting_resettime=reset
+    ))
+    return credential
+
+
+def test_unused_client_is_not_synced():
+    credential = get_credential('Unused')
+
+    credential.sync()
+
+    assert credential.remaining is None
+    assert credential.available
+
+
+def test_stale_window_does_not_exhaust_credential():
+    reset = int(time()) + 3600
+    credential = get_credential('PAT', remaining=0, limit=5000, reset=reset - 3600)
+    credential.update({'X-RateLimit-Remaining': '4999', 'X-RateLimit-Reset': str(reset)})
+
+    credential.sync()
+
+    assert credential.remaining == 4999
+    assert credential.available
+
+
+def test_lowest_remaining_wins_within_a_window():
+    reset = int(time()) + 3600
+    credential = get_credential('PAT', remaining=4000, limit=5000, reset=reset)
+    credential.update({'X-RateLimit-Remaining': '4500', 'X-RateLimit-Reset': str(reset)})
+
+    credential.sync()
+
+    assert credential.remaining == 4000
+
+
+def test_pool_picks_the_credential_with_the_most_quota():
+    reset = int(time()) + 3600
+    low = get_credential('Low', remaining=10, limit=5000, reset=reset)
+    high = get_credential('High', remaining=4000, limit=5000, reset=reset)
+    empty = get_credential('Empty', remaining=0, limit=5000, reset=reset)
+    pool = GitHubPool([low, high, empty])
+
+    assert pool.acquire() is high
+    assert high.requests == 1
+
+
+def test_repository_calls_rotate_credentials():
+    calls = []
+
+    def get_client(name: str):
+        def get_repo(full_name, lazy=False):
+            return SimpleNamespace(
+                full_name=full_name,
+                compare=lambda base, head: calls.append((name, 'compare')),
+                get_pull=lambda number: calls.append((name, 'get_pull'))
+            )
+
+        return SimpleNamespace(
+            requester=SimpleNamespace(rate_limiting=(-1, -1), rate_limiting_resettime=0),
+            get_repo=get_repo
+        )
+
+    first, second = get_credential('First'), get_credential('Second')
+    first.client, second.client = get_client('First'), get_client('Second')
+    pool = GitHubPool([first, second])
+
+    repository = pool.get_repo('org/repo', lazy=True)
+    repository.compare('v1', 'v2')
+    repository.get_pull(1)
+
+    assert repository.full_name == 'org/repo'
+    # Without known quotas, the least used credential is picked
+    assert calls == [('Second', 'compare'), ('First', 'get_pull')]
@@ -0,0 +1,91 @@
+import re
+
+import pytest
+
+from addepar_redflag.models.structures import ChangedFile
+from addepar_redflag.util.filters import CommitFilter
+
+
+def get_file(
+    filename: str,
+    additions: int = 1,
+    deletions: int = 0
+) -> ChangedFile:
+    return ChangedFile.from_dict({
+        'filename': filename,
+        'additions': additions,
+        'deletions': deletions,
+        'patch': '+line'
+    })
+
+
+def get_commit(
+    message: str,
+    email: str = 'dev@example.com',
+    login: str = 'dev'
+) -> dict:
+    return {
+        'commit': {'message': message, 'author': {'email': email}},
+        'author': {'login': login}
+    }
+
+
+def test_titles_keep_their_inline_flags():
+    commit_filter = CommitFilter(titles=['(?i)^bump ', r'^(\w+): \1'])
+
+    assert commit_filter.matches_title('BUMP requests to 2.32')
+    assert commit_filter.matches_title('docs: docs')
+    assert not commit_filter.matches_title('docs: readme')
+    assert not commit_filter.matches_title('Fix the login form')
+
+
+def test_invalid_title_is_reported_on_its_own():
+    with pytest.raises(re.error) as error:
+        CommitFilter(titles=['^ok', '(unclosed'])
+
+    assert error.value.pattern == '(unclosed'
+
+
+def test_filter_commits_skips_titles_and_users():
+    commit_filter = CommitFilter(titles=['^Merge '], users=['Bot@Example.com'])
+    commits = [
+        get_commit('Merge branch main'),
+        get_commit('Update dependencies', email='bot@example.com'),
+        get_commit('Add login form\n\nWith a password field.')
+    ]
+
+    assert list(commit_filter.filter_commits(commits)) == [
+        ('Add login form', 'With a password field.', commits[2])
+    ]
+    assert commit_filter.summary() == 'title: 1, user: 1'
+
+
+def test_files_can_be_a_lazy_iterable():
+    # PyGithub's PaginatedList has no len(), a generator doesn't either
+    commit_filter = CommitFilter(max_files=2)
+
+    assert commit_filter.matches_files(get_file(name) for name in ['a.py', 'b.py'])
+    assert not commit_filter.matches_files(get_file(name) for name in ['a.py', 'b.py', 'c.py'])
+    assert not commit_filter.matches_files(iter([]))
+    assert commit_filter.counts == {'size': 1, 'empty': 1}
+
+
+def test_files_only_matching_ignored_paths_are_skipped():
+    commit_filter = CommitFilter(paths=['docs/*', '*.md'])
+
+    assert not commit_filter.matches_files([get_file('docs/index.rst'), get_file('README.md')])
+    assert commit_filter.matches_files([get_file('docs/index.rst'), get_file('src/app.py')])
+
+
+def test_size_limits():
+    commit_filter = CommitFilter(min_changes=5, max_changes=100)
+
+    assert not commit_filter.matches_files([get_file('a.py', additions=2, deletions=2)])
+    assert commit_filter.matches_files([get_file('a.py', additions=3, deletions=2)])
+    assert not commit_filter.matches_files([get_file('a.py', additions=101)])
+
+
+def test_needs_files_only_with_path_or_size_rules():
+    assert not CommitFilter(titles=['^Merge'], users=['bot@example.com']).needs_files
+    assert CommitFilter(paths=['docs/*']).needs_files
+    assert CommitFilter(max_files=10).needs_files
@@ -0,0 +1,112 @@
+import json
+from types import SimpleNamespace
+
+from requests import Response
+
+from addepar_redflag.util import github
+from addepar_redflag.util.filters import CommitFilter
+
+
+class FakeCredential:
+    name = 'Fake'
+    token = None
+
+    def update(self, headers: dict) -> None:
+        pass
+
+
+def get_response(
+    status: int,
+    body: bytes = b'{}'
+) -> Response:
+    response = Response()
+    response.status_code = status
+    response._content = body
+    return response
+
+
+def test_failed_graphql_query_falls_back_to_unhydrated_commits(monkeypatch):
+    requests = []
+
+    def request(method, url, **kwargs):
+        requests.append(url)
+        return get_response(502)
+
+    monkeypatch.setattr(github, 'request', request)
+    credentials = SimpleNamespace(acquire=FakeCredential)
+    commits = [
+        (f'Commit {index}', '', {'sha': f'{index:040x}'})
+        for index in range(150)
+    ]
+
+    hydrated = list(github.hydrate_commits(
+        commits=commits,
+        repository='org/repo',
+        credentials=credentials
+    ))
+
+    assert [title for title, _, _ in hydrated] == [title for title, _, _ in commits]
+    assert all(commit.get('graphql') is None for _, _, commit in hydrated)
+    # Hydration stops after the first failure
+    assert requests == [github.GITHUB_GRAPHQL_URL]
+
+
+def get_graphql_body(
+    sha: str,
+    merge_commit: str,
+    title: str = 'Add login'
+) -> bytes:
+    return json.dumps({'data': {'repository': {'c0': {
+        'oid': sha,
+        'message': 'wip',
+        'additions': 3,
+        'deletions': 1,
+        'changedFilesIfAvailable': 1,
+        'author': None,
+        'associatedPullRequests': {'nodes': [{
+            'number': 7,
+            'title': title,
+            'body': 'Adds a login form.',
+            'url': 'u',
+            'labels': {'nodes': [{'name': 'auth'}]},
+            'mergeCommit': {'oid': merge_commit}
+        }]}
+    }}}}).encode()
+
+
+def hydrate(
+    monkeypatch,
+    body: bytes,
+    commit_filter: CommitFilter | None = None
+) -> list:
+    monkeypatch.setattr(github, 'request', lambda method, url, **kwargs: get_response(200, body))
+
+    return list(github.hydrate_commits(
+        commits=[('wip', 'Work in progress', {'sha': 'a' * 40})],
+        repository='org/repo',
+        credentials=SimpleNamespace(acquire=FakeCredential),
+        commit_filter=commit_filter
+    ))
+
+
+def test_pull_request_replaces_the_title_of_its_merge_commit(monkeypatch):
+    [(title, message, commit)] = hydrate(monkeypatch, get_graphql_body('a' * 40, merge_commit='a' * 40))
+
+    assert (title, message) == ('Add login', 'Adds a login form.')
+    assert commit.get('graphql').get('additions') == 3
+    assert commit.get('graphql').get('pull_request').get('labels') == ['auth']
+
+
+def test_other_commits_of_the_pull_request_keep_their_title(monkeypatch):
+    # A commit of a PR merged with a merge commit
+    [(title, message, commit)] = hydrate(monkeypatch, get_graphql_body('a' * 40, merge_commit='b' * 40))
+
+    assert (title, message) == ('wip', 'Work in progress')
+    assert commit.get('graphql').get('pull_request').get('number') == 7
+
+
+def test_title_filters_apply_to_the_pull_request_title(monkeypatch):
+    commit_filter = CommitFilter(titles=['^Bump '])
+
+    assert hydrate(monkeypatch, get_graphql_body('a' * 40, merge_commit='a' * 40, title='Bump requests'), commit_filter) == []
+    assert commit_filter.counts == {'title': 1}
@@ -0,0 +1,88 @@
+from addepar_redflag.models.prompts import response_models
+from addepar_redflag.models.structures import ChangedFile, PullRequest, Result
+from addepar_redflag.util.grouping import group_results_by_ticket, share_verdict
+from addepar_redflag.util.results_db import ResultsDatabase
+
+
+def get_result(
+    title: str,
+    sha: str,
+    filename: str = 'app.py',
+    patch: str = '@@ -1 +1 @@\n-old\n+new'
+) -> Result:
+    return Result(pr=PullRequest(
+        repository='org/repo',
+        title=title,
+        message='',
+        url=f'https://github.com/org/repo/commit/{sha}',
+        files=[ChangedFile(
+            filename=filename,
+            status='modified',
+            additions=1,
+            deletions=1,
+            patch=patch
+        )],
+        sha=sha
+    ))
+
+
+def test_commits_are_grouped_by_jira_key():
+    results = [
+        get_result('SEC-1: Add login form', 'a' * 40),
+        get_result('Bump version', 'b' * 40),
+        get_result('SEC-1: Validate login input', 'c' * 40, patch='@@ -1 +1 @@\n-a\n+b'),
+        get_result('SEC-2: Log out', 'd' * 40)
+    ]
+
+    units = group_results_by_ticket(results)
+
+    assert [len(members) for _, members in units] == [2, 1, 1]
+    merged, members = units[0]
+    assert merged.pr.title == 'SEC-1: 2 commits'
+    assert merged.pr.sha is None
+    assert [commit.get('sha') for commit in merged.pr.commits] == ['a' * 40, 'c' * 40]
+    # Both commits changed the same file, their patches are concatenated
+    assert merged.pr.file_names == ('app.py',)
+    assert merged.pr.files[0].additions == 2
+    assert units[1][0] is results[1]
+    assert units[2][0] is results[3]
+
+
+def test_ticket_verdict_is_restored_for_each_commit(tmp_path):
+    results = [
+        get_result('SEC-1: Add login form', 'a' * 40),
+        get_result('SEC-1: Validate login input', 'c' * 40)
+    ]
+    [(merged, members)] = group_results_by_ticket(results)
+    merged.review = response_models.Review(
+        result=True,
+        reasoning='Adds authentication.',
+        files=['app.py']
+    )
+    merged.test_plan = response_models.TestPlan(
+        test_plan='Try to log in with a malformed username.',
+        reasoning='The input is validated.'
+    )
+    share_verdict(
+        merged,
+        members,
+        decided_by={'reason': 'ticket', 'key': 'SEC-1'}
+    )
+
+    results_db = ResultsDatabase(
+        tmp_path / 'results.db',
+        model_id='model',
+        prompt_hash='hash'
+    )
+    for result in members:
+        results_db.put(result)
+
+    # The next run lists the same commits, they are not reviewed again
+    for result in [get_result('SEC-1: Add login form', 'a' * 40), get_result('SEC-1: Validate login input', 'c' * 40)]:
+        assert results_db.restore(result)
+        assert result.review.reasoning == 'Adds authentication.'
+        assert result.test_plan.test_plan == 'Try to log in with a malformed username.'
+        assert result.decided_by == {'reason': 'ticket', 'key': 'SEC-1'}
+
+    assert not results_db.restore(get_result('SEC-1: Follow-up', 'e' * 40))
+    results_db.close()
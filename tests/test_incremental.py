@@ -0,0 +1,108 @@
+import asyncio
+from types import SimpleNamespace
+
+from addepar_redflag import redflag
+from addepar_redflag.models.prompts import response_models
+from addepar_redflag.models.structures import ChangedFile, PullRequest, Result
+from addepar_redflag.util.incremental import get_incremental_files
+
+
+class FakeRepository:
+    def __init__(
+        self,
+        files: list,
+        status: str = 'ahead'
+    ):
+        self.files = files
+        self.status = status
+        self.compared = []
+
+    def compare(self, base: str, head: str):
+        self.compared.append((base, head))
+        return SimpleNamespace(
+            status=self.status,
+            files=[
+                SimpleNamespace(
+                    filename=filename,
+                    status='modified',
+                    additions=additions,
+                    deletions=0,
+                    patch='@@ -1 +1 @@\n+change'
+                )
+                for filename, additions in self.files
+            ]
+        )
+
+
+def get_previous(
+    in_scope: bool,
+    flagged: list | None = None
+) -> Result:
+    previous = Result(pr=PullRequest(
+        repository='org/repo',
+        title='Add login form',
+        message='',
+        url='https://github.com/org/repo/pull/1',
+        files=[
+            ChangedFile(filename=filename, status='modified', additions=1, deletions=0)
+            for filename in ('app/views.py', 'docs/login.md')
+        ],
+        sha='a' * 40
+    ))
+    previous.review = response_models.Review(
+        result=in_scope,
+        reasoning='Reviewed.',
+        files=flagged or []
+    )
+    return previous
+
+
+def test_out_of_scope_pr_only_reviews_new_changes():
+    repository = FakeRepository([('docs/login.md', 200)])
+
+    files = get_incremental_files(repository, get_previous(in_scope=False), head_sha='b' * 40, max_changes=50)
+
+    assert [file.filename for file in files] == ['docs/login.md']
+    assert repository.compared == [('a' * 40, 'b' * 40)]
+
+
+def test_large_changes_to_new_files_get_a_full_review():
+    repository = FakeRepository([('app/auth.py', 200)])
+
+    assert get_incremental_files(repository, get_previous(in_scope=False), head_sha='b' * 40, max_changes=50) is None
+
+
+def test_in_scope_pr_only_reviews_changes_to_other_files():
+    repository = FakeRepository([('docs/login.md', 1)])
+
+    files = get_incremental_files(repository, get_previous(in_scope=True, flagged=['app/views.py']), head_sha='b' * 40, max_changes=50)
+
+    assert [file.filename for file in files] == ['docs/login.md']
+
+
+def test_changes_to_flagged_files_get_a_full_review():
+    repository = FakeRepository([('app/views.py', 1)])
+
+    assert get_incremental_files(repository, get_previous(in_scope=True, flagged=['app/views.py']), head_sha='b' * 40, max_changes=50) is None
+
+
+def test_in_scope_pr_keeps_its_verdict_and_test_plan(monkeypatch):
+    async def review_pr(result, llm, prompts):
+        raise AssertionError('reviewed')
+
+    monkeypatch.setattr(redflag, 'review_pr', review_pr)
+    previous = get_previous(in_scope=True, flagged=['app/views.py'])
+    previous.test_plan = response_models.TestPlan(test_plan='Log in.', reasoning='Login changed.')
+    result = Result(pr=previous.pr)
+
+    asyncio.run(redflag.review_incremental(result, previous, files=[], llm=None, prompts={}))
+
+    assert result.review is previous.review
+    assert result.test_plan is previous.test_plan
+    assert result.decided_by['reason'] == 'incremental'
+
+
+def test_force_push_gets_a_full_review():
+    repository = FakeRepository([('docs/login.md', 1)], status='diverged')
+
+    assert get_incremental_files(repository, get_previous(in_scope=False), head_sha='b' * 40, max_changes=50) is None
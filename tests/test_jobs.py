@@ -0,0 +1,75 @@
+from addepar_redflag.util.jobs import JobQueue
+
+
+def test_claim_supersedes_older_events_of_the_pr(tmp_path):
+    queue = JobQueue(tmp_path / 'jobs.db')
+    assert queue.enqueue('d1', 'org/repo', 1, 'a' * 40)
+    assert queue.enqueue('d2', 'org/repo', 2, 'b' * 40)
+    assert queue.enqueue('d3', 'org/repo', 1, 'c' * 40)
+    # GitHub redelivered the first event
+    assert not queue.enqueue('d1', 'org/repo', 1, 'a' * 40)
+
+    job = queue.claim()
+    assert (job.number, job.sha, job.attempts) == (1, 'c' * 40, 1)
+    assert queue.counts() == {'queued': 1, 'running': 1, 'superseded': 1}
+
+    queue.complete(job)
+    assert queue.claim().number == 2
+    assert queue.claim() is None
+    queue.close()
+
+
+def test_failed_jobs_are_retried_until_given_up(tmp_path):
+    queue = JobQueue(tmp_path / 'jobs.db')
+    queue.enqueue('d1', 'org/repo', 1, 'a' * 40)
+
+    job = queue.claim()
+    queue.fail(job, 'Throttled', retry=True)
+    job = queue.claim()
+    assert job.attempts == 2
+
+    queue.fail(job, 'Throttled', retry=False)
+    assert queue.claim() is None
+    assert queue.counts() == {'failed': 1}
+    queue.close()
+
+
+def test_retried_job_is_superseded_by_a_newer_event(tmp_path):
+    queue = JobQueue(tmp_path / 'jobs.db')
+    queue.enqueue('d1', 'org/repo', 1, 'a' * 40)
+    job = queue.claim()
+
+    queue.enqueue('d2', 'org/repo', 1, 'b' * 40)
+    queue.fail(job, 'Throttled', retry=True)
+
+    assert queue.claim().sha == 'b' * 40
+    assert queue.counts() == {'running': 1, 'superseded': 1}
+    queue.close()
+
+
+def test_running_jobs_are_recovered_after_a_restart(tmp_path):
+    queue = JobQueue(tmp_path / 'jobs.db')
+    queue.enqueue('d1', 'org/repo', 1, 'a' * 40)
+    queue.claim()
+    queue.close()
+
+    queue = JobQueue(tmp_path / 'jobs.db')
+    assert queue.recover() == 1
+    assert queue.claim().attempts == 2
+    queue.close()
+
+
+def test_pr_is_reviewed_by_one_worker_at_a_time(tmp_path):
+    queue = JobQueue(tmp_path / 'jobs.db')
+    queue.enqueue('d1', 'org/repo', 1, 'a' * 40)
+    running = queue.claim()
+
+    # A push while the PR is being reviewed waits, other PRs don't
+    queue.enqueue('d2', 'org/repo', 1, 'b' * 40)
+    queue.enqueue('d3', 'org/repo', 2, 'c' * 40)
+    assert queue.claim().number == 2
+    assert queue.claim() is None
+
+    queue.complete(running)
+    assert queue.claim().sha == 'b' * 40
+    queue.close()
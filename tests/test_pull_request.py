@@ -0,0 +1,56 @@
+from addepar_redflag.models.structures import ChangedFile, PullRequest
+
+
+def get_pr(patches_loaded: bool = True) -> PullRequest:
+    return PullRequest(
+        repository='org/repo',
+        title='Add login form',
+        message='',
+        url='https://github.com/org/repo/pull/1',
+        files=[ChangedFile(
+            filename='app.py',
+            status='modified',
+            additions=1,
+            deletions=1,
+            patch=None if not patches_loaded else '@@ -1 +1 @@\n-old\n+new'
+        )],
+        sha='a' * 40,
+        patches_loaded=patches_loaded
+    )
+
+
+def test_patches_loaded_can_be_set():
+    pr = get_pr(patches_loaded=False)
+    assert pr.fingerprint is None
+
+    pr.files = get_pr().files
+    pr.patches_loaded = True
+
+    assert pr.patches_loaded
+    assert pr.commits == []
+    assert pr.fingerprint == get_pr().fingerprint
+
+
+def test_github_files_are_converted():
+    from github.File import File
+
+    class Wrapper:
+        """Not a PyGithub file, even though it has the same name."""
+        def __init__(self, filename: str):
+            self.filename = filename
+
+    Wrapper.__name__ = 'File'
+    wrapped = Wrapper('docs.md')
+    pr = get_pr()
+    pr.files = [
+        File(
+            requester=None,
+            headers={},
+            attributes={'filename': 'app.py', 'status': 'added', 'additions': 2, 'deletions': 0, 'patch': '@@ -0,0 +1,2 @@\n+a\n+b'}
+        ),
+        wrapped
+    ]
+
+    assert isinstance(pr.files[0], ChangedFile)
+    assert pr.files[0].to_dict()['filename'] == 'app.py'
+    assert pr.files[1] is wrapped
@@ -0,0 +1,70 @@
+from types import SimpleNamespace
+
+from git import Actor, Repo
+
+from addepar_redflag.models.structures import ChangedFile
+from addepar_redflag.util.ranges import get_github_attribution, get_local_range, group_files_by_component
+
+
+AUTHOR = Actor('Test', 'test@example.com')
+
+
+def commit_file(
+    repo: Repo,
+    filename: str,
+    content: str
+) -> str:
+    path = repo.working_tree_dir + '/' + filename
+    with open(path, 'w') as f:
+        f.write(content)
+    repo.index.add([filename])
+    return repo.index.commit(
+        f'Update {filename}',
+        author=AUTHOR,
+        committer=AUTHOR
+    ).hexsha
+
+
+def test_local_range_lists_net_changes_and_commits(tmp_path):
+    repo = Repo.init(tmp_path)
+    base = commit_file(repo, 'app.py', 'print("a")\n')
+    first = commit_file(repo, 'app.py', 'print("b")\n')
+    second = commit_file(repo, 'auth.py', 'login()\n')
+
+    files, attribution = get_local_range(str(tmp_path), base, second)
+
+    assert sorted(file.filename for file in files) == ['app.py', 'auth.py']
+    assert {file.filename: file.status for file in files} == {'app.py': 'modified', 'auth.py': 'added'}
+    assert attribution == {'app.py': [first], 'auth.py': [second]}
+
+
+def test_local_range_without_the_refs_is_skipped(tmp_path):
+    repo = Repo.init(tmp_path)
+    head = commit_file(repo, 'app.py', 'print("a")\n')
+
+    assert get_local_range(str(tmp_path), 'release-1.0', head) is None
+    assert get_local_range(str(tmp_path / 'missing'), head, head) is None
+
+
+def test_github_attribution_uses_the_files_of_each_commit():
+    commit_files = {
+        'a' * 40: ['billing/api/views.py', 'README.md'],
+        'b' * 40: ['billing/api/urls.py'],
+        # Reverted later, not part of the net diff
+        'c' * 40: ['ledger/models.py']
+    }
+    repository = SimpleNamespace(get_commit=lambda sha: SimpleNamespace(
+        files=[SimpleNamespace(filename=filename) for filename in commit_files[sha]]
+    ))
+    components = group_files_by_component(
+        [
+            ChangedFile(filename=filename, status='modified', additions=1, deletions=0)
+            for filename in ('billing/api/views.py', 'billing/api/urls.py', 'README.md')
+        ],
+        depth=2
+    )
+
+    assert get_github_attribution(repository, components, range_shas=list(commit_files)) == {
+        'billing/api': ['a' * 40, 'b' * 40],
+        '.': ['a' * 40]
+    }
@@ -0,0 +1,141 @@
+import asyncio
+
+from addepar_redflag import redflag
+from addepar_redflag.models.structures import ChangedFile, PullRequest, Result
+
+
+def get_result(files: list | None = None) -> Result:
+    return Result(pr=PullRequest(
+        repository='org/repo',
+        title='Update docs',
+        message='',
+        url='https://github.com/org/repo/commit/abc',
+        files=files or [],
+        sha='a' * 40,
+        patches_loaded=False
+    ))
+
+
+def get_file(filename: str) -> ChangedFile:
+    return ChangedFile.from_dict({
+        'filename': filename,
+        'status': 'modified',
+        'additions': 1,
+        'deletions': 1,
+        'patch': '@@ -1 +1 @@\n-old\n+new'
+    })
+
+
+def test_triaged_out_commit_never_fetches_its_files(monkeypatch):
+    async def triage_pr(result, llm, prompts):
+        return False
+
+    def file_loader(pr):
+        raise AssertionError('The files of a commit triaged as "no" were fetched')
+
+    monkeypatch.setattr(redflag, 'triage_pr', triage_pr)
+
+    asyncio.run(redflag.query_model(
+        get_result(),
+        llm=None,
+        progress=None,
+        progress_task_id=0,
+        prompts={},
+        triage=True,
+        file_loader=file_loader
+    ))
+
+
+def test_deferred_files_are_fetched_before_the_review(monkeypatch):
+    reviewed = []
+
+    async def triage_pr(result, llm, prompts):
+        return True
+
+    async def review_pr(result, llm, prompts):
+        reviewed.append([file.filename for file in result.pr.files])
+
+    monkeypatch.setattr(redflag, 'triage_pr', triage_pr)
+    monkeypatch.setattr(redflag, 'review_pr', review_pr)
+
+    result = get_result()
+    asyncio.run(redflag.query_model(
+        result,
+        llm=None,
+        progress=None,
+        progress_task_id=0,
+        prompts={},
+        triage=True,
+        file_loader=lambda pr: [get_file('app/views.py')]
+    ))
+
+    assert reviewed == [['app/views.py']]
+    assert result.pr.patches_loaded
+
+
+def test_deferred_commit_without_files_is_not_reviewed(monkeypatch):
+    async def triage_pr(result, llm, prompts):
+        return True
+
+    async def review_pr(result, llm, prompts):
+        raise AssertionError('A commit without changed files was reviewed')
+
+    monkeypatch.setattr(redflag, 'triage_pr', triage_pr)
+    monkeypatch.setattr(redflag, 'review_pr', review_pr)
+
+    result = get_result()
+    asyncio.run(redflag.query_model(
+        result,
+        llm=None,
+        progress=None,
+        progress_task_id=0,
+        prompts={},
+        triage=True,
+        file_loader=lambda pr: []
+    ))
+
+    assert result.review.result is False
+
+
+def test_batches_are_triaged_before_the_review(monkeypatch):
+    reviewed = []
+
+    async def triage_pr(result, llm, prompts):
+        return result.pr.title != 'Fix typo'
+
+    async def review_batch(results, llm, prompts):
+        reviewed.extend(result.pr.title for result in results)
+
+    monkeypatch.setattr(redflag, 'triage_pr', triage_pr)
+    monkeypatch.setattr(redflag, 'review_batch', review_batch)
+
+    batch = [get_result(), get_result()]
+    batch[1].pr.title = 'Fix typo'
+
+    asyncio.run(redflag.query_model_batch(
+        batch,
+        llm=None,
+        progress=None,
+        progress_task_id=0,
+        prompts={},
+        triage=True
+    ))
+
+    assert reviewed == ['Update docs']
+
+
+def test_tracking_mark_stops_before_the_first_errored_commit():
+    processed = ['a' * 40, 'b' * 40, 'c' * 40]
+    errored = get_result()
+    errored.pr.sha = 'b' * 40
+
+    assert redflag._get_tracking_mark(processed, [errored], target='head', previous_mark='base') == 'a' * 40
+    assert redflag._get_tracking_mark(processed, [], target='head', previous_mark='base') == 'head'
+    assert redflag._get_tracking_mark(processed, [], target='head', previous_mark='base', cut_short=True) == 'c' * 40
+
+    # The first commit, a result without a listed commit, or a range review, keep the previous mark
+    errored.pr.sha = 'a' * 40
+    assert redflag._get_tracking_mark(processed, [errored], target='head', previous_mark='base') == 'base'
+    errored.pr.sha = None
+    assert redflag._get_tracking_mark(processed, [errored], target='head', previous_mark='base') == 'base'
+    assert redflag._get_tracking_mark([], [errored], target='head', previous_mark='base', range_review=True) == 'base'
@@ -0,0 +1,114 @@
+from addepar_redflag.models.prompts import response_models
+from addepar_redflag.models.structures import ChangedFile, PullRequest, Result
+from addepar_redflag.util.prompts import get_prompt_hash
+from addepar_redflag.util.results_db import ResultsDatabase
+
+
+def get_result(
+    sha: str,
+    title: str = 'Add login form'
+) -> Result:
+    return Result(pr=PullRequest(
+        repository='org/repo',
+        title=title,
+        message='Adds a login form.',
+        url=f'https://github.com/org/repo/commit/{sha}',
+        files=[ChangedFile(
+            filename='app.py',
+            status='modified',
+            additions=1,
+            deletions=1,
+            patch='@@ -1 +1 @@\n-old\n+new'
+        )],
+        labels=['auth'],
+        sha=sha
+    ))
+
+
+def review(
+    result: Result,
+    in_scope: bool
+) -> Result:
+    result.token_count = 120
+    result.review = response_models.Review(
+        result=in_scope,
+        reasoning='Adds authentication.' if in_scope else 'Only docs.',
+        files=['app.py'] if in_scope else []
+    )
+    if in_scope:
+        result.test_plan = response_models.TestPlan(
+            test_plan='Try to log in with a malformed username.',
+            reasoning='The input is validated.'
+        )
+    return result
+
+
+def test_results_round_trip(tmp_path):
+    results_db = ResultsDatabase(tmp_path / 'results.db', model_id='model', prompt_hash='hash')
+    stored = [
+        review(get_result('a' * 40), in_scope=True),
+        review(get_result('b' * 40, title='Update docs'), in_scope=False),
+        get_result('c' * 40, title='Errored')
+    ]
+    for result in stored:
+        results_db.put(result, duration=1.5)
+
+    in_scope = get_result('a' * 40)
+    assert results_db.restore(in_scope)
+    assert in_scope.review == stored[0].review
+    assert in_scope.test_plan == stored[0].test_plan
+    assert results_db.restore(get_result('b' * 40))
+
+    # Errored results are reviewed again, and so are results of other prompts
+    assert not results_db.restore(get_result('c' * 40))
+    assert not ResultsDatabase(tmp_path / 'results.db', model_id='model', prompt_hash='other').restore(get_result('a' * 40))
+
+    selected = results_db.select('org/repo', shas=['b' * 40, 'a' * 40])
+    assert [result.pr.sha for result in selected] == ['b' * 40, 'a' * 40]
+    assert selected[1].pr.labels == ['auth']
+    assert selected[1].pr.fingerprint == stored[0].pr.fingerprint
+    assert selected[1].token_count == 120
+    assert results_db.get_latest('org/repo', stored[1].pr.url).review == stored[1].review
+    results_db.close()
+
+
+def test_tracked_branch_round_trip(tmp_path):
+    results_db = ResultsDatabase(tmp_path / 'results.db', model_id='model', prompt_hash='hash')
+    results_db.track('org/repo', branch='main', base='v1.0', mark='a' * 40, results=[get_result('a' * 40)])
+    results_db.track('org/repo', branch='main', base='v1.0', mark='b' * 40, results=[get_result('a' * 40), get_result('b' * 40)])
+
+    assert results_db.get_tracking('org/repo', 'main') == ('v1.0', 'b' * 40)
+    assert results_db.get_tracked_keys('org/repo', 'main') == ['a' * 40, 'b' * 40]
+    assert results_db.get_tracking('org/repo', 'release') is None
+    results_db.close()
+
+
+def test_prompt_hash_covers_triage_and_batch_review():
+    config = {
+        'bedrock': {'model_id': 'model'},
+        'prompts': {'review': {'question': 'Review?'}, 'triage': {'question': 'Triage?'}}
+    }
+    prompt_hash = get_prompt_hash(config)
+
+    # Unused settings don't change it
+    assert get_prompt_hash({**config, 'batch_review': {'max_prs': 0}}) == prompt_hash
+
+    triage_hash = get_prompt_hash({**config, 'triage': True})
+    assert triage_hash != prompt_hash
+    assert get_prompt_hash({
+        **config,
+        'triage': True,
+        'prompts': {**config.get('prompts'), 'triage': {'question': 'Other?'}}
+    }) != triage_hash
+    assert get_prompt_hash({**config, 'batch_review': {'max_prs': 5, 'max_tokens': 8000}}) != prompt_hash
+
+
+def test_prompt_hash_covers_shared_verdicts():
+    config = {'bedrock': {'model_id': 'model'}, 'prompts': {}}
+    prompt_hash = get_prompt_hash(config)
+
+    assert get_prompt_hash({**config, 'range_depth': 2, 'similarity_threshold': 0}) == prompt_hash
+    assert get_prompt_hash({**config, 'group_by_ticket': True}) != prompt_hash
+    assert get_prompt_hash({**config, 'range_review': True, 'range_depth': 2}) != prompt_hash
+    assert get_prompt_hash({**config, 'range_review': True, 'range_depth': 3}) != get_prompt_hash({**config, 'range_review': True, 'range_depth': 2})
+    assert get_prompt_hash({**config, 'similarity_threshold': 0.9}) != prompt_hash
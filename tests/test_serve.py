@@ -0,0 +1,67 @@
+import asyncio
+from types import SimpleNamespace
+
+from addepar_redflag import serve
+from addepar_redflag.models.prompts import response_models
+from addepar_redflag.models.structures import ChangedFile, PullRequest, Result
+from addepar_redflag.util.jobs import JobQueue
+from addepar_redflag.util.results_db import ResultsDatabase
+from addepar_redflag.util.verdicts import VerdictStore
+
+
+def get_pull(sha: str) -> SimpleNamespace:
+    return SimpleNamespace(
+        title='Add login form',
+        body='Adds a login form.',
+        html_url='https://github.com/org/repo/pull/1',
+        labels=[],
+        head=SimpleNamespace(sha=sha),
+        get_files=lambda: [ChangedFile(
+            filename='app.py',
+            status='modified',
+            additions=1,
+            deletions=1,
+            patch='@@ -1 +1 @@\n-old\n+new'
+        )]
+    )
+
+
+def test_served_results_are_committed_per_job(tmp_path, monkeypatch):
+    async def query_model(result, **kwargs):
+        result.review = response_models.Review(
+            result=False,
+            reasoning='Only a label changed.',
+            files=[]
+        )
+
+    monkeypatch.setattr(serve, 'query_model', query_model)
+    monkeypatch.setattr(serve, 'publish_result', lambda pull, result, config: False)
+
+    queue = JobQueue(tmp_path / 'jobs.db')
+    queue.enqueue('d1', 'org/repo', 1, 'a' * 40)
+    context = {
+        'github': SimpleNamespace(get_repo=lambda name, lazy=False: SimpleNamespace(get_pull=lambda number: get_pull('a' * 40))),
+        'jira': None,
+        'llm': None,
+        'config': {'prompts': {}},
+        'jira_cache': {},
+        'verdict_store': VerdictStore(tmp_path / 'verdicts.db', context='hash'),
+        'results_db': ResultsDatabase(tmp_path / 'results.db', model_id='model', prompt_hash='hash')
+    }
+
+    asyncio.run(serve.process_job('worker-1', queue.claim(), queue, context))
+    assert queue.counts() == {'done': 1}
+
+    # Another process, e.g. `render`, sees the result and the verdict while the server still runs
+    result = Result(pr=PullRequest(
+        repository='org/repo',
+        title='Add login form',
+        message='',
+        url='https://github.com/org/repo/pull/1',
+        files=get_pull('a' * 40).get_files(),
+        sha='a' * 40
+    ))
+    assert ResultsDatabase(tmp_path / 'results.db', model_id='model', prompt_hash='hash').restore(result)
+    assert result.review.reasoning == 'Only a label changed.'
+    assert VerdictStore(tmp_path / 'verdicts.db', context='hash').get(result.pr.fingerprint)
+    queue.close()
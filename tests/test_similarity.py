@@ -0,0 +1,93 @@
+from addepar_redflag.models.prompts import response_models
+from addepar_redflag.models.structures import ChangedFile, PullRequest, Result
+from addepar_redflag.util.similarity import (
+    get_bands,
+    get_shingles,
+    get_signature,
+    get_similarity,
+    group_results_by_similarity,
+    inherit_verdict
+)
+
+
+def get_patch(service: str, extra: int = 0) -> str:
+    lines = [f'-    client = LegacyClient(config.{service}_url, timeout=30)']
+    lines += [f'+    client = HttpClient(config.{service}_url, timeout=30, retries={index})' for index in range(20)]
+    lines += [f'+    log.info("migrated {service} {index}")' for index in range(extra)]
+    return '\n'.join(['@@ -1,1 +1,20 @@', *lines])
+
+
+def get_result(
+    filename: str,
+    patch: str,
+    sha: str
+) -> Result:
+    return Result(pr=PullRequest(
+        repository='org/repo',
+        title=f'Migrate {filename}',
+        message='',
+        url=f'https://github.com/org/repo/commit/{sha}',
+        files=[ChangedFile(
+            filename=filename,
+            status='modified',
+            additions=20,
+            deletions=1,
+            patch=patch
+        )],
+        sha=sha
+    ))
+
+
+def test_signatures_estimate_similarity():
+    signature = get_signature(get_shingles(get_result('a.py', get_patch('billing'), 'a' * 40).pr))
+
+    assert get_similarity(signature, signature) == 1
+    assert get_signature(set()) is None
+    # Unrelated patches share almost no bins
+    other = get_signature({f'token {index}' for index in range(100)})
+    assert get_similarity(signature, other) < 0.2
+
+
+def test_bands_stay_below_the_threshold():
+    bands, rows = get_bands(0.9)
+    assert bands * rows == 128
+    assert (1 / bands) ** (1 / rows) <= 0.9
+
+
+def test_near_duplicates_are_grouped_with_the_first_result():
+    results = [
+        get_result('billing/client.py', get_patch('billing'), 'a' * 40),
+        get_result('billing/views.py', '@@ -1 +1 @@\n-return render(request)\n+return redirect(login_url)', 'b' * 40),
+        get_result('ledger/client.py', get_patch('billing', extra=1), 'c' * 40)
+    ]
+
+    units, scores = group_results_by_similarity(results, threshold=0.8)
+
+    assert [(unit.pr.sha, [member.pr.sha for member in members]) for unit, members in units] == [
+        ('a' * 40, ['a' * 40, 'c' * 40]),
+        ('b' * 40, ['b' * 40])
+    ]
+    assert 0.8 <= scores[id(results[2])] < 1
+
+
+def test_members_keep_their_own_files():
+    unit = get_result('billing/client.py', get_patch('billing'), 'a' * 40)
+    member = get_result('ledger/client.py', get_patch('ledger'), 'c' * 40)
+    unit.review = response_models.Review(
+        result=True,
+        reasoning='Changes how the client authenticates.',
+        files=['billing/client.py']
+    )
+    unit.test_plan = response_models.TestPlan(
+        test_plan='Call billing/client.py without a token.',
+        reasoning='Authentication changed.'
+    )
+
+    inherit_verdict(unit, member, decided_by={'reason': 'similarity', 'url': unit.pr.url})
+
+    assert member.review.result
+    assert member.review.reasoning == unit.review.reasoning
+    assert member.review.files == ['ledger/client.py']
+    assert unit.test_plan.test_plan not in member.test_plan.test_plan
+    assert unit.pr.url in member.test_plan.test_plan
+    assert member.decided_by == {'reason': 'similarity', 'url': unit.pr.url}
@@ -0,0 +1,33 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from threading import Barrier
+
+from addepar_redflag.util.tracing import Tracer
+
+
+def test_concurrent_calls_keep_their_own_span():
+    tracer = Tracer()
+    tracer.start(destination=None, resource={})
+    barrier = Barrier(2)
+
+    def call(name: str) -> tuple:
+        # As the LLM callbacks do, in the task or thread making the call
+        span = tracer.start_span(name)
+        tracer.activate(span)
+        barrier.wait()
+        tracer.set_attributes(**{'redflag.call': name})
+        current = tracer.current_span()
+        tracer.end_span(span)
+        return span, current, tracer.current_span()
+
+    with tracer.span('chain.review') as parent, ThreadPoolExecutor(2) as executor:
+        futures = [executor.submit(copy_context().run, call, name) for name in ('first', 'second')]
+        calls = [future.result() for future in futures]
+
+    for span, current, after in calls:
+        assert current is span
+        assert span['parent'] is parent
+        assert span['attributes'] == {'redflag.call': span['name']}
+        assert after is parent
+
+    assert 'redflag.call' not in parent['attributes']
@@ -0,0 +1,73 @@
+from addepar_redflag.models.prompts import response_models
+from addepar_redflag.models.structures import ChangedFile, PullRequest, Result
+from addepar_redflag.util.verdicts import VerdictStore
+
+
+def get_result(
+    patch: str,
+    sha: str = 'a' * 40,
+    filename: str = 'app.py'
+) -> Result:
+    return Result(pr=PullRequest(
+        repository='org/repo',
+        title='Add login form',
+        message='',
+        url=f'https://github.com/org/repo/commit/{sha}',
+        files=[ChangedFile(
+            filename=filename,
+            status='modified',
+            additions=1,
+            deletions=1,
+            patch=patch
+        )],
+        sha=sha
+    ))
+
+
+def test_fingerprint_ignores_line_numbers_and_whitespace():
+    fingerprint = get_result('@@ -1,2 +1,2 @@\n context\n-check(user)\n+check(user, role)').pr.fingerprint
+
+    # A backport of the same change to another line, reindented
+    assert get_result('@@ -40,2 +42,2 @@\n other\n-  check(user)\n+  check(user,  role)').pr.fingerprint == fingerprint
+    assert get_result('@@ -1 +1 @@\n-check(user)\n+check(admin)').pr.fingerprint != fingerprint
+    assert get_result('@@ -1 +1 @@\n-check(user)\n+check(user, role)', filename='auth.py').pr.fingerprint != fingerprint
+
+
+def test_verdicts_are_reused_for_the_same_patch(tmp_path):
+    store = VerdictStore(tmp_path / 'verdicts.db', context='hash')
+    reviewed = get_result('@@ -1 +1 @@\n-check(user)\n+check(user, role)')
+    reviewed.review = response_models.Review(
+        result=True,
+        reasoning='Changes an authorization check.',
+        files=['app.py']
+    )
+    reviewed.test_plan = response_models.TestPlan(
+        test_plan='Call the route without the role.',
+        reasoning='The role is now checked.'
+    )
+    store.put(reviewed)
+
+    cherry_pick = get_result('@@ -9 +9 @@\n-check(user)\n+check(user, role)', sha='b' * 40)
+    assert store.apply(cherry_pick)
+    assert cherry_pick.review == reviewed.review
+    assert cherry_pick.test_plan == reviewed.test_plan
+    assert cherry_pick.decided_by.get('url') == reviewed.pr.url
+
+    # Verdicts are scoped to the prompts that produced them
+    assert not VerdictStore(tmp_path / 'verdicts.db', context='other').apply(cherry_pick)
+    store.close()
+
+
+def test_incomplete_verdicts_are_not_stored(tmp_path):
+    store = VerdictStore(tmp_path / 'verdicts.db', context='hash')
+    reviewed = get_result('@@ -1 +1 @@\n-a\n+b')
+    reviewed.review = response_models.Review(
+        result=True,
+        reasoning='In scope.',
+        files=[]
+    )
+    store.put(reviewed)
+
+    assert not store.apply(get_result('@@ -1 +1 @@\n-a\n+b'))
+    store.close()
+